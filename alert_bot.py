@@ -10,6 +10,8 @@ from pathlib import Path
 from typing import Dict, List, Optional
 
 from aiogram import Bot, Dispatcher, types
+from aiogram.client.session.aiohttp import AiohttpSession
+from aiogram.client.telegram import TelegramAPIServer
 from aiogram.filters import Command, CommandStart
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from aiogram.webhook.aiohttp_server import SimpleRequestHandler, setup_application
@@ -26,21 +28,88 @@ sys.path.append(str(Path(__file__).parent))
 from config.settings import Settings
 from utils.database import DatabaseManager
 from utils.alert_manager import AlertManager
+from utils.alert_queue import QueueFullError
 from utils.logger import setup_logging
+from utils.metrics import instrument_database, metrics_middleware, register_pipeline_collector, render_latest
 from handlers import register_handlers
 
-# Настройка логирования
-logger = setup_logging()
+# Настройка логирования (LOG_LEVEL и LOG_FILE из настроек)
+_log_settings = Settings()
+logger = setup_logging(_log_settings.LOG_LEVEL, _log_settings.LOG_FILE)
 
 class TeBiumAlertBot:
     """Основной класс бота для отправки алертов"""
     
     def __init__(self):
         self.settings = Settings()
-        self.bot = Bot(token=self.settings.BOT_TOKEN)
+        self.bot = Bot(token=self.settings.BOT_TOKEN, session=self._create_session())
         self.dp = Dispatcher()
-        self.db = DatabaseManager(self.settings.DATABASE_URL)
-        self.alert_manager = AlertManager(self.bot, self.db)
+        self.db = DatabaseManager(
+            self.settings.DATABASE_URL,
+            pool_readers=self.settings.DB_POOL_READERS,
+            busy_timeout=self.settings.DB_BUSY_TIMEOUT,
+            mmap_size=self.settings.DB_MMAP_SIZE,
+            batch_interval_ms=self.settings.DB_BATCH_INTERVAL_MS,
+            batch_max_size=self.settings.DB_BATCH_MAX_SIZE,
+            node_id=self.settings.NODE_ID,
+            archive_dir=self.settings.ALERT_ARCHIVE_DIR if self.settings.ALERT_ARCHIVE_ENABLED else None
+        )
+        if self.settings.METRICS_ENABLED:
+            # До создания AlertManager: компоненты получают уже обернутые методы
+            instrument_database(self.db)
+        self.alert_manager = AlertManager(
+            self.bot,
+            self.db,
+            delivery_workers=self.settings.DELIVERY_WORKERS,
+            global_rate=self.settings.TELEGRAM_GLOBAL_RATE,
+            chat_rate=self.settings.TELEGRAM_CHAT_RATE,
+            group_rate_per_minute=self.settings.TELEGRAM_GROUP_RATE_PER_MINUTE,
+            max_retries=self.settings.MAX_RETRIES,
+            retry_delay=self.settings.RETRY_DELAY,
+            retry_max_delay=self.settings.RETRY_MAX_DELAY,
+            queue_memory_size=self.settings.QUEUE_MEMORY_SIZE,
+            queue_max_pending=self.settings.QUEUE_MAX_PENDING,
+            queue_retry_after=self.settings.QUEUE_RETRY_AFTER,
+            queue_lane_weights=self.settings.QUEUE_LANE_WEIGHTS,
+            queue_lane_capacity=self.settings.QUEUE_LANE_CAPACITY,
+            queue_shed_at=self.settings.QUEUE_SHED_AT,
+            max_alerts_per_hour=self.settings.MAX_ALERTS_PER_HOUR,
+            alert_cooldown=self.settings.ALERT_COOLDOWN,
+            rate_limit_rules=self.settings.RATE_LIMIT_RULES,
+            rate_limit_max_keys=self.settings.RATE_LIMIT_MAX_KEYS,
+            rate_limit_snapshot_interval=self.settings.RATE_LIMIT_SNAPSHOT_INTERVAL,
+            alert_cache_size=self.settings.ALERT_CACHE_SIZE,
+            retention_days=self.settings.ALERT_RETENTION_DAYS,
+            status_retention_days=self.settings.MODULE_STATUS_RETENTION_DAYS,
+            compaction_interval=self.settings.COMPACTION_INTERVAL,
+            compaction_chunk_size=self.settings.COMPACTION_CHUNK_SIZE,
+            health_endpoints=self.settings.HEALTH_CHECK_URLS,
+            health_check_interval=self.settings.HEALTH_CHECK_INTERVAL,
+            health_check_timeout=self.settings.HEALTH_CHECK_TIMEOUT,
+            health_check_concurrency=self.settings.HEALTH_CHECK_CONCURRENCY,
+            health_check_jitter=self.settings.HEALTH_CHECK_JITTER,
+            health_window=self.settings.HEALTH_WINDOW,
+            health_degraded_after=self.settings.HEALTH_DEGRADED_AFTER,
+            health_down_after=self.settings.HEALTH_DOWN_AFTER,
+            health_recover_after=self.settings.HEALTH_RECOVER_AFTER,
+            health_flap_threshold=self.settings.HEALTH_FLAP_THRESHOLD,
+            health_flap_interval=self.settings.HEALTH_FLAP_INTERVAL,
+            latency_slo_p95_ms=self.settings.LATENCY_SLO_P95_MS,
+            latency_slo=self.settings.LATENCY_SLO,
+            latency_slo_window=self.settings.LATENCY_SLO_WINDOW,
+            latency_slo_min_samples=self.settings.LATENCY_SLO_MIN_SAMPLES,
+            dedup_window=self.settings.DEDUP_WINDOW,
+            dedup_max_entries=self.settings.DEDUP_MAX_ENTRIES,
+            dedup_data_keys=self.settings.DEDUP_DATA_KEYS,
+            edit_in_place=self.settings.ALERT_EDIT_IN_PLACE,
+            edit_interval=self.settings.ALERT_EDIT_INTERVAL,
+            digest_interval=self.settings.DIGEST_INTERVAL,
+            digest_top_messages=self.settings.DIGEST_TOP_MESSAGES
+        )
+        self.background_tasks: List[asyncio.Task] = []
+        self.monitoring_runner: Optional[web.AppRunner] = None
+        if self.settings.METRICS_ENABLED:
+            register_pipeline_collector(self.alert_manager)
         
         # Регистрируем обработчики
         register_handlers(self.dp, self.alert_manager)
@@ -48,6 +117,13 @@ class TeBiumAlertBot:
         # Webhook URL для получения алертов от других модулей
         self.webhook_url = f"/webhook/{self.settings.WEBHOOK_SECRET}"
         
+    def _create_session(self) -> Optional[AiohttpSession]:
+        """Сессия Bot API: свой сервер из TELEGRAM_API_URL или api.telegram.org"""
+        if not self.settings.TELEGRAM_API_URL:
+            return None
+        logger.info(f"🤖 Bot API: {self.settings.TELEGRAM_API_URL}")
+        return AiohttpSession(api=TelegramAPIServer.from_base(self.settings.TELEGRAM_API_URL))
+    
     async def start_polling(self):
         """Запуск бота в режиме polling"""
         try:
@@ -55,6 +131,10 @@ class TeBiumAlertBot:
             
             # Инициализация базы данных
             await self.db.init_database()
+            self.start_background_tasks()
+            
+            # /health и /metrics на отдельном порту (в polling нет своего HTTP-сервера)
+            await self.start_monitoring_server()
             
             # Запуск бота
             await self.dp.start_polling(self.bot)
@@ -62,6 +142,8 @@ class TeBiumAlertBot:
         except Exception as e:
             logger.error(f"❌ Ошибка при запуске бота: {e}")
             raise
+        finally:
+            await self.shutdown()
     
     async def start_webhook(self, webhook_url: str, webhook_path: str):
         """Запуск бота в режиме webhook"""
@@ -70,6 +152,7 @@ class TeBiumAlertBot:
             
             # Инициализация базы данных
             await self.db.init_database()
+            self.start_background_tasks()
             
             # Установка webhook
             await self.bot.set_webhook(
@@ -78,7 +161,7 @@ class TeBiumAlertBot:
             )
             
             # Настройка webhook сервера
-            app = web.Application()
+            app = web.Application(middlewares=[metrics_middleware] if self.settings.METRICS_ENABLED else [])
             webhook_requests_handler = SimpleRequestHandler(
                 dispatcher=self.dp,
                 bot=self.bot,
@@ -88,7 +171,7 @@ class TeBiumAlertBot:
             setup_application(app, self.dp, bot=self.bot)
             
             # Добавляем endpoint для получения алертов
-            app.router.add_post(self.webhook_url, self.handle_alert_webhook)
+            self.add_api_routes(app)
             
             # Запуск сервера
             runner = web.AppRunner(app)
@@ -109,6 +192,56 @@ class TeBiumAlertBot:
         except Exception as e:
             logger.error(f"❌ Ошибка при запуске webhook: {e}")
             raise
+        finally:
+            await self.shutdown()
+    
+    def add_api_routes(self, app: web.Application):
+        """Маршруты приема алертов, статуса и мониторинга"""
+        app.router.add_post(self.webhook_url, self.handle_alert_webhook, name="alert")
+        app.router.add_post(f"{self.webhook_url}/batch", self.handle_alert_batch_webhook, name="alert_batch")
+        app.router.add_get("/alerts/{alert_id}", self.handle_alert_status, name="alert_status")
+        self.add_monitoring_routes(app)
+    
+    def add_monitoring_routes(self, app: web.Application):
+        """Маршруты /health и /metrics"""
+        app.router.add_get("/health", self.handle_health, name="health")
+        if self.settings.METRICS_ENABLED:
+            app.router.add_get("/metrics", self.handle_metrics, name="metrics")
+    
+    async def start_monitoring_server(self):
+        """Отдельный HTTP-сервер мониторинга для режима polling"""
+        if not self.settings.METRICS_PORT:
+            return
+        app = web.Application(middlewares=[metrics_middleware] if self.settings.METRICS_ENABLED else [])
+        self.add_monitoring_routes(app)
+        
+        self.monitoring_runner = web.AppRunner(app)
+        await self.monitoring_runner.setup()
+        site = web.TCPSite(self.monitoring_runner, '0.0.0.0', self.settings.METRICS_PORT)
+        await site.start()
+        logger.info(f"📈 Сервер мониторинга запущен на порту {self.settings.METRICS_PORT}")
+    
+    def start_background_tasks(self):
+        """Запуск фоновых задач: обработчик очереди алертов"""
+        self.background_tasks.append(
+            asyncio.create_task(self.alert_manager.start_alert_processor())
+        )
+    
+    async def shutdown(self):
+        """Корректная остановка: запись накопленных данных и закрытие БД"""
+        logger.info("🛑 Остановка TeBium Alert Bot...")
+        
+        for task in self.background_tasks:
+            task.cancel()
+        await asyncio.gather(*self.background_tasks, return_exceptions=True)
+        self.background_tasks = []
+        
+        if self.monitoring_runner is not None:
+            await self.monitoring_runner.cleanup()
+            self.monitoring_runner = None
+        
+        await self.alert_manager.stop()
+        await self.db.close()
     
     async def handle_alert_webhook(self, request):
         """Обработка входящих алертов через webhook"""
@@ -121,15 +254,119 @@ class TeBiumAlertBot:
             data = await request.json()
             logger.info(f"📨 Получен алерт: {data.get('type', 'unknown')}")
             
+            if self.settings.WEBHOOK_FAST_ACK:
+                # Ответ сразу после проверок, запись в БД - в фоне
+                result = self.alert_manager.accept_alert(data)
+                if result['status'] == 'invalid':
+                    return web.json_response(result, status=400)
+                return web.json_response(result, status=202 if 'alert_id' in result else 200)
+            
             # Обработка алерта
             await self.alert_manager.process_alert(data)
             
             return web.Response(status=200, text="OK")
             
+        except QueueFullError as e:
+            return web.Response(
+                status=503,
+                text="Alert queue is full",
+                headers={'Retry-After': str(e.retry_after)}
+            )
         except Exception as e:
             logger.error(f"❌ Ошибка обработки webhook: {e}")
             return web.Response(status=500, text="Internal Server Error")
     
+    async def handle_health(self, request):
+        """Проверка живости для docker healthcheck и балансировщиков"""
+        processor_alive = any(not task.done() for task in self.background_tasks)
+        body = {
+            'status': 'ok' if processor_alive else 'error',
+            'alert_processor': processor_alive,
+            'queue_pending': self.alert_manager.alert_queue.pending,
+            'deliveries_pending': self.alert_manager.delivery.pending()
+        }
+        return web.json_response(body, status=200 if processor_alive else 503)
+    
+    async def handle_metrics(self, request):
+        """Метрики в формате Prometheus"""
+        body, content_type = render_latest()
+        return web.Response(body=body, headers={'Content-Type': content_type})
+    
+    async def handle_alert_status(self, request):
+        """Статус доставки алерта по идентификатору"""
+        try:
+            if request.headers.get('Authorization') != f"Bearer {self.settings.WEBHOOK_SECRET}":
+                return web.Response(status=401, text="Unauthorized")
+            
+            status = await self.alert_manager.get_alert_status(request.match_info['alert_id'])
+            if status is None:
+                return web.Response(status=404, text="Not Found")
+            
+            return web.json_response(status)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статуса алерта: {e}")
+            return web.Response(status=500, text="Internal Server Error")
+    
+    async def handle_alert_batch_webhook(self, request):
+        """Обработка пачки алертов: JSON-массив или NDJSON (один алерт на строку)"""
+        try:
+            if request.headers.get('Authorization') != f"Bearer {self.settings.WEBHOOK_SECRET}":
+                return web.Response(status=401, text="Unauthorized")
+            
+            max_size = self.settings.WEBHOOK_BATCH_MAX_SIZE
+            alerts = await self._read_alert_batch(request, max_size)
+            if alerts is None:
+                return web.Response(status=400, text="Bad Request")
+            if len(alerts) > max_size:
+                return web.Response(status=413, text=f"Batch is limited to {max_size} alerts")
+            
+            results = await self.alert_manager.process_alerts_batch(alerts)
+            accepted = sum(1 for result in results if result['status'] == 'queued')
+            body = {
+                'accepted': accepted,
+                'rejected': len(results) - accepted,
+                'results': results
+            }
+            
+            # Ни один алерт не принят из-за переполнения - источнику нужно повторить позже
+            if results and all(result['status'] == 'queue_full' for result in results):
+                return web.json_response(
+                    body,
+                    status=503,
+                    headers={'Retry-After': str(self.alert_manager.alert_queue.retry_after)}
+                )
+            
+            return web.json_response(body)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки пачки алертов: {e}")
+            return web.Response(status=500, text="Internal Server Error")
+    
+    async def _read_alert_batch(self, request, max_size: int) -> Optional[List]:
+        """Чтение пачки алертов; NDJSON читается построчно без загрузки всего тела"""
+        if request.content_type != 'application/x-ndjson':
+            try:
+                data = await request.json()
+            except ValueError:
+                return None
+            return data if isinstance(data, list) else None
+        
+        alerts = []
+        async for line in request.content:
+            line = line.strip()
+            if not line:
+                continue
+            if len(alerts) >= max_size:
+                # Лимит превышен - дальше не разбираем
+                alerts.append(None)
+                break
+            try:
+                alerts.append(json.loads(line))
+            except ValueError:
+                alerts.append(None)
+        return alerts
+    
     async def send_system_alert(self, alert_type: str, message: str, 
                               priority: str = "info", module: str = "system",
                               data: Optional[Dict] = None):
@@ -151,7 +388,7 @@ class TeBiumAlertBot:
     
     async def get_module_status(self) -> Dict:
         """Получение статуса всех модулей"""
-        return await self.db.get_module_status()
+        return await self.alert_manager.get_module_status()
 
 async def main():
     """Главная функция запуска бота"""
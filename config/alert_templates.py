@@ -2,8 +2,9 @@
 Шаблоны сообщений для алертов
 """
 
-from typing import Dict, Any
 from datetime import datetime
+from functools import lru_cache
+from typing import Any, Dict, List
 
 class AlertTemplates:
     """Шаблоны форматирования алертов"""
@@ -23,6 +24,12 @@ class AlertTemplates:
         "bot": "🤖"
     }
     
+    # Ограничение Telegram на длину сообщения (в кодовых единицах UTF-16)
+    MAX_MESSAGE_LENGTH = 4096
+    
+    # Спецсимволы Markdown, экранируемые в пользовательском тексте
+    MARKDOWN_SPECIAL = "_*`["
+    
     # Цвета для разных приоритетов (для будущего использования)
     COLOR_MAP = {
         "info": "#3498db",      # Синий
@@ -34,47 +41,55 @@ class AlertTemplates:
     @staticmethod
     def format_alert(alert_data: Dict[str, Any]) -> str:
         """Форматирование алерта в сообщение"""
-        emoji = AlertTemplates.EMOJI_MAP.get(alert_data.get("type", "info"), "ℹ️")
-        priority_emoji = AlertTemplates.EMOJI_MAP.get(alert_data.get("priority", "info"), "ℹ️")
-        
-        # Заголовок
-        title = f"{priority_emoji} **{alert_data.get('type', 'Alert').upper()}**"
-        
-        # Модуль
-        module = alert_data.get("module", "unknown")
-        module_emoji = AlertTemplates.EMOJI_MAP.get(module.split("-")[0].lower(), "🔧")
+        # Заголовок и модуль (неизменны для пары тип/приоритет и модуля)
+        header = AlertTemplates._alert_header(
+            alert_data.get("type", "Alert"),
+            alert_data.get("priority", "info"),
+            alert_data.get("module", "unknown")
+        )
         
         # Время
-        timestamp = alert_data.get("timestamp", datetime.now().isoformat())
-        if isinstance(timestamp, str):
-            try:
-                dt = datetime.fromisoformat(timestamp.replace('Z', '+00:00'))
-                time_str = dt.strftime("%H:%M:%S")
-            except:
-                time_str = timestamp
-        else:
-            time_str = timestamp.strftime("%H:%M:%S")
+        time_str = AlertTemplates._format_time(alert_data.get("timestamp"))
         
         # Основное сообщение
-        message = alert_data.get("message", "No message")
+        message = AlertTemplates.escape_markdown(alert_data.get("message", "No message"))
         
         # Дополнительные данные
         data = alert_data.get("data", {})
         data_str = ""
         if data:
-            data_str = "\n\n**Детали:**\n"
-            for key, value in data.items():
-                data_str += f"• {key}: `{value}`\n"
+            code = AlertTemplates.escape_code
+            data_str = "\n\n**Детали:**\n" + "".join(
+                f"• {AlertTemplates.escape_markdown(key)}: `{code(value)}`\n" for key, value in data.items()
+            )
         
         # Формируем итоговое сообщение
-        formatted_message = f"""
-{title}
-{emoji} **Модуль:** {module_emoji} `{module}`
-🕐 **Время:** `{time_str}`
-📝 **Сообщение:** {message}{data_str}
-        """.strip()
-        
-        return formatted_message
+        return f"{header}\n🕐 **Время:** `{time_str}`\n📝 **Сообщение:** {message}{data_str}".rstrip()
+    
+    @staticmethod
+    @lru_cache(maxsize=4096)
+    def _alert_header(alert_type: str, priority: str, module: str) -> str:
+        """Заголовок и строка модуля алерта (кэшируются)"""
+        emoji = AlertTemplates.EMOJI_MAP.get(alert_type, "ℹ️")
+        priority_emoji = AlertTemplates.EMOJI_MAP.get(priority, "ℹ️")
+        module_emoji = AlertTemplates.EMOJI_MAP.get(module.split("-")[0].lower(), "🔧")
+        return (f"{priority_emoji} **{AlertTemplates.escape_markdown(str(alert_type).upper())}**\n"
+                f"{emoji} **Модуль:** {module_emoji} `{AlertTemplates.escape_code(module)}`")
+    
+    @staticmethod
+    def _format_time(timestamp: Any) -> str:
+        """Время алерта ЧЧ:ММ:СС"""
+        if timestamp is None:
+            return datetime.now().strftime("%H:%M:%S")
+        if not isinstance(timestamp, str):
+            return timestamp.strftime("%H:%M:%S")
+        # ISO 8601 без разбора: время - символы 11-19
+        if len(timestamp) >= 19 and timestamp[10] in "T " and timestamp[13] == ":" and timestamp[16] == ":":
+            return timestamp[11:19]
+        try:
+            return datetime.fromisoformat(timestamp.replace('Z', '+00:00')).strftime("%H:%M:%S")
+        except ValueError:
+            return AlertTemplates.escape_code(timestamp)
     
     @staticmethod
     def format_system_status(status_data: Dict[str, Any]) -> str:
@@ -140,3 +155,91 @@ class AlertTemplates:
         """.strip()
         
         return message
+    
+    @staticmethod
+    def escape_markdown(text: str) -> str:
+        """Экранирование пользовательского текста для parse_mode='Markdown'"""
+        text = str(text)
+        # Отсутствующие в тексте символы пропускаются - так быстрее, чем translate и re.sub
+        for char in AlertTemplates.MARKDOWN_SPECIAL:
+            if char in text:
+                text = text.replace(char, "\\" + char)
+        return text
+    
+    @staticmethod
+    def escape_code(text: Any) -> str:
+        """Текст внутри `...`: экранирование там не работает, обратные кавычки заменяются"""
+        return str(text).replace("`", "'")
+    
+    @staticmethod
+    def format_digest(digest: Dict[str, Any]) -> List[str]:
+        """Форматирование дайджеста: модули по числу алертов, у каждого - самые частые сообщения.
+        
+        Возвращает одно или несколько сообщений в пределах MAX_MESSAGE_LENGTH.
+        """
+        escape = AlertTemplates.escape_markdown
+        modules = digest.get("modules", [])
+        
+        header = (
+            f"📬 **Дайджест алертов за {digest.get('interval', 0)} мин**\n"
+            f"📊 **Всего:** {digest.get('total', 0)} в {len(modules)} модулях"
+        )
+        
+        blocks = []
+        for module in modules:
+            priorities = ", ".join(
+                f"{AlertTemplates.EMOJI_MAP.get(priority, 'ℹ️')} {count}"
+                for priority, count in module.get("priorities", {}).items()
+            )
+            lines = [f"🔧 `{AlertTemplates.escape_code(module['module'])}` - **{module['count']}** ({priorities})"]
+            for message, count in module.get("top", []):
+                repeat = f" ×{count}" if count > 1 else ""
+                lines.append(f"• {escape(message[:200])}{repeat}")
+            hidden = module.get("other_messages", 0)
+            if hidden:
+                lines.append(f"• _и еще {hidden}_")
+            blocks.append("\n".join(lines))
+        
+        return AlertTemplates.split_message(header, blocks)
+    
+    @staticmethod
+    def split_message(header: str, blocks: List[str], limit: int = MAX_MESSAGE_LENGTH) -> List[str]:
+        """Разбиение на сообщения не длиннее limit: по границам блоков, длинный блок - по строкам.
+        
+        Заголовок повторяется в каждой части с номером части.
+        """
+        def length(text: str) -> int:
+            # Telegram считает длину в кодовых единицах UTF-16 (эмодзи - две)
+            return len(text.encode("utf-16-le")) // 2
+        
+        budget = limit - length(header) - 20  # место под " (часть i/n)" и переносы
+        
+        pieces: List[str] = []
+        for block in blocks:
+            if length(block) <= budget:
+                pieces.append(block)
+                continue
+            # Блок длиннее сообщения: части по строкам, слишком длинные строки обрезаются
+            current = ""
+            for line in block.split("\n"):
+                while length(line) > budget:
+                    line = line[:len(line) - (length(line) - budget) - 1] + "…"
+                if current and length(current) + 1 + length(line) > budget:
+                    pieces.append(current)
+                    current = line
+                else:
+                    current = f"{current}\n{line}" if current else line
+            if current:
+                pieces.append(current)
+        
+        bodies: List[str] = []
+        for piece in pieces:
+            if bodies and length(bodies[-1]) + 2 + length(piece) <= budget:
+                bodies[-1] += "\n\n" + piece
+            else:
+                bodies.append(piece)
+        
+        if len(bodies) <= 1:
+            return [f"{header}\n\n{bodies[0]}" if bodies else header]
+        return [f"{header} (часть {number}/{len(bodies)})\n\n{body}"
+                for number, body in enumerate(bodies, 1)]
@@ -3,7 +3,8 @@
 """
 
 import os
-from typing import List
+import json
+from typing import Dict, List
 from pydantic import BaseSettings
 
 class Settings(BaseSettings):
@@ -11,11 +12,30 @@ class Settings(BaseSettings):
     
     # Telegram Bot настройки
     BOT_TOKEN: str = os.getenv("BOT_TOKEN", "")
+    TELEGRAM_API_URL: str = os.getenv("TELEGRAM_API_URL", "")  # свой Bot API сервер или заглушка, пусто - api.telegram.org
     WEBHOOK_SECRET: str = os.getenv("WEBHOOK_SECRET", "your-secret-key")
     WEBHOOK_PORT: int = int(os.getenv("WEBHOOK_PORT", "8082"))
+    WEBHOOK_BATCH_MAX_SIZE: int = int(os.getenv("WEBHOOK_BATCH_MAX_SIZE", "1000"))  # алертов в одном запросе /batch
+    WEBHOOK_FAST_ACK: bool = os.getenv("WEBHOOK_FAST_ACK", "false").lower() == "true"  # 202 до записи в БД
+    
+    # Мониторинг: /metrics (Prometheus) и /health
+    METRICS_ENABLED: bool = os.getenv("METRICS_ENABLED", "true").lower() == "true"
+    METRICS_PORT: int = int(os.getenv("METRICS_PORT", os.getenv("WEBHOOK_PORT", "8082")))  # polling, 0 - отключено
     
     # База данных
     DATABASE_URL: str = os.getenv("DATABASE_URL", "sqlite:///data/alerts.db")
+    DB_POOL_READERS: int = int(os.getenv("DB_POOL_READERS", "4"))
+    DB_BUSY_TIMEOUT: int = int(os.getenv("DB_BUSY_TIMEOUT", "5000"))  # миллисекунды
+    DB_MMAP_SIZE: int = int(os.getenv("DB_MMAP_SIZE", str(64 * 1024 * 1024)))  # байты
+    DB_BATCH_INTERVAL_MS: int = int(os.getenv("DB_BATCH_INTERVAL_MS", "20"))
+    DB_BATCH_MAX_SIZE: int = int(os.getenv("DB_BATCH_MAX_SIZE", "200"))
+    NODE_ID: int = int(os.getenv("NODE_ID", "0"))  # 0..1023, уникален для каждого экземпляра бота
+    ALERT_RETENTION_DAYS: int = int(os.getenv("ALERT_RETENTION_DAYS", "30"))
+    ALERT_ARCHIVE_ENABLED: bool = os.getenv("ALERT_ARCHIVE_ENABLED", "true").lower() == "true"
+    ALERT_ARCHIVE_DIR: str = os.getenv("ALERT_ARCHIVE_DIR", "data/archive")  # алерты старше срока хранения
+    MODULE_STATUS_RETENTION_DAYS: int = int(os.getenv("MODULE_STATUS_RETENTION_DAYS", "7"))
+    COMPACTION_INTERVAL: int = int(os.getenv("COMPACTION_INTERVAL", "3600"))  # секунды, 0 - отключено
+    COMPACTION_CHUNK_SIZE: int = int(os.getenv("COMPACTION_CHUNK_SIZE", "500"))  # строк за транзакцию
     
     # Настройки алертов
     ALERT_CHAT_ID: str = os.getenv("ALERT_CHAT_ID", "")
@@ -30,10 +50,47 @@ class Settings(BaseSettings):
         "Telegram-Bot-Tebium", 
         "TeBium-Alert-Bot"
     ]
+    # health-эндпоинты модулей в JSON: {"Модуль": "http://host:port/health"}
+    HEALTH_CHECK_URLS: Dict[str, str] = json.loads(os.getenv("HEALTH_CHECK_URLS", json.dumps({
+        "TeBium-Analytics-Server": "http://localhost:8081/health",
+        "Telegram-Bot-Tebium": "http://localhost:8080/health"
+    })))
+    HEALTH_CHECK_INTERVAL: int = int(os.getenv("HEALTH_CHECK_INTERVAL", "60"))  # секунды, 0 - отключено
+    HEALTH_CHECK_TIMEOUT: float = float(os.getenv("HEALTH_CHECK_TIMEOUT", "10"))  # секунды
+    HEALTH_CHECK_CONCURRENCY: int = int(os.getenv("HEALTH_CHECK_CONCURRENCY", "50"))
+    HEALTH_CHECK_JITTER: float = float(os.getenv("HEALTH_CHECK_JITTER", "0.1"))  # доля интервала
+    # Состояния модулей: из HEALTH_WINDOW последних проверок N неудачных -> degraded/down
+    HEALTH_WINDOW: int = int(os.getenv("HEALTH_WINDOW", "5"))
+    HEALTH_DEGRADED_AFTER: int = int(os.getenv("HEALTH_DEGRADED_AFTER", "2"))
+    HEALTH_DOWN_AFTER: int = int(os.getenv("HEALTH_DOWN_AFTER", "3"))
+    HEALTH_RECOVER_AFTER: int = int(os.getenv("HEALTH_RECOVER_AFTER", "3"))  # успешных подряд
+    HEALTH_FLAP_THRESHOLD: int = int(os.getenv("HEALTH_FLAP_THRESHOLD", "4"))  # переходов за интервал
+    HEALTH_FLAP_INTERVAL: int = int(os.getenv("HEALTH_FLAP_INTERVAL", "900"))  # секунды
+    # SLO по времени ответа: p95 за LATENCY_SLO_WINDOW минут, мс (0 - отключено)
+    LATENCY_SLO_P95_MS: float = float(os.getenv("LATENCY_SLO_P95_MS", "1000"))
+    LATENCY_SLO: Dict[str, float] = json.loads(os.getenv("LATENCY_SLO", "{}"))  # модуль -> p95, мс
+    LATENCY_SLO_WINDOW: int = int(os.getenv("LATENCY_SLO_WINDOW", "5"))
+    LATENCY_SLO_MIN_SAMPLES: int = int(os.getenv("LATENCY_SLO_MIN_SAMPLES", "3"))
     
     # Настройки уведомлений
     ALERT_COOLDOWN: int = int(os.getenv("ALERT_COOLDOWN", "60"))  # секунды
     MAX_ALERTS_PER_HOUR: int = int(os.getenv("MAX_ALERTS_PER_HOUR", "100"))
+    # Правила лимитов в JSON: {"priority=critical": {"per_hour": 1000, "cooldown": 0}}
+    RATE_LIMIT_RULES: Dict[str, Dict[str, float]] = json.loads(os.getenv("RATE_LIMIT_RULES", "{}"))
+    RATE_LIMIT_MAX_KEYS: int = int(os.getenv("RATE_LIMIT_MAX_KEYS", "10000"))
+    RATE_LIMIT_SNAPSHOT_INTERVAL: int = int(os.getenv("RATE_LIMIT_SNAPSHOT_INTERVAL", "30"))  # секунды
+    ALERT_CACHE_SIZE: int = int(os.getenv("ALERT_CACHE_SIZE", "1000"))  # недавние алерты для кнопок
+    # Схлопывание повторов: окно агрегации в секундах (0 - отключено)
+    DEDUP_WINDOW: int = int(os.getenv("DEDUP_WINDOW", "300"))
+    DEDUP_MAX_ENTRIES: int = int(os.getenv("DEDUP_MAX_ENTRIES", "10000"))
+    # Ключи data, входящие в отпечаток алерта (JSON-список)
+    DEDUP_DATA_KEYS: List[str] = json.loads(os.getenv("DEDUP_DATA_KEYS", "[]"))
+    # Повторы открытого инцидента правят отправленное сообщение вместо сводки
+    ALERT_EDIT_IN_PLACE: bool = os.getenv("ALERT_EDIT_IN_PLACE", "false").lower() == "true"
+    ALERT_EDIT_INTERVAL: int = int(os.getenv("ALERT_EDIT_INTERVAL", "10"))  # секунды между правками
+    # Дайджесты: период по умолчанию для /subscribe digest=... и число примеров на модуль
+    DIGEST_INTERVAL: int = int(os.getenv("DIGEST_INTERVAL", "15"))  # минуты
+    DIGEST_TOP_MESSAGES: int = int(os.getenv("DIGEST_TOP_MESSAGES", "3"))
     
     # Настройки форматирования
     ENABLE_EMOJI: bool = os.getenv("ENABLE_EMOJI", "true").lower() == "true"
@@ -47,9 +104,27 @@ class Settings(BaseSettings):
     ANALYTICS_SERVER_URL: str = os.getenv("ANALYTICS_SERVER_URL", "http://localhost:8081")
     MAIN_BOT_URL: str = os.getenv("MAIN_BOT_URL", "http://localhost:8080")
     
+    # Настройки доставки (лимиты Telegram)
+    DELIVERY_WORKERS: int = int(os.getenv("DELIVERY_WORKERS", "8"))
+    TELEGRAM_GLOBAL_RATE: float = float(os.getenv("TELEGRAM_GLOBAL_RATE", "30"))  # сообщений/с
+    TELEGRAM_CHAT_RATE: float = float(os.getenv("TELEGRAM_CHAT_RATE", "1"))  # сообщений/с в чат
+    TELEGRAM_GROUP_RATE_PER_MINUTE: float = float(os.getenv("TELEGRAM_GROUP_RATE_PER_MINUTE", "20"))
+    
+    # Настройки очереди алертов
+    QUEUE_MEMORY_SIZE: int = int(os.getenv("QUEUE_MEMORY_SIZE", "1000"))  # алертов в памяти
+    QUEUE_MAX_PENDING: int = int(os.getenv("QUEUE_MAX_PENDING", "10000"))  # порог backpressure
+    QUEUE_RETRY_AFTER: int = int(os.getenv("QUEUE_RETRY_AFTER", "5"))  # секунды
+    # Полосы приоритетов: веса выборки, пределы полос и доля заполнения для отказа младшим
+    QUEUE_LANE_WEIGHTS: Dict[str, int] = json.loads(os.getenv(
+        "QUEUE_LANE_WEIGHTS", '{"critical": 8, "error": 4, "warning": 2, "info": 1}'
+    ))
+    QUEUE_LANE_CAPACITY: Dict[str, int] = json.loads(os.getenv("QUEUE_LANE_CAPACITY", "{}"))
+    QUEUE_SHED_AT: Dict[str, float] = json.loads(os.getenv("QUEUE_SHED_AT", '{"warning": 0.9, "info": 0.8}'))
+    
     # Настройки retry
     MAX_RETRIES: int = int(os.getenv("MAX_RETRIES", "3"))
     RETRY_DELAY: int = int(os.getenv("RETRY_DELAY", "5"))
+    RETRY_MAX_DELAY: int = int(os.getenv("RETRY_MAX_DELAY", "300"))
     
     class Config:
         env_file = "config.env"
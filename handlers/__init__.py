@@ -8,6 +8,8 @@ from .system_handlers import register_system_handlers
 
 def register_handlers(dp, alert_manager):
     """Регистрация всех обработчиков"""
+    # alert_manager передается в обработчики как аргумент через данные диспетчера
+    dp["alert_manager"] = alert_manager
     register_admin_handlers(dp, alert_manager)
     register_alert_handlers(dp, alert_manager)
     register_system_handlers(dp, alert_manager)
\ No newline at end of file
@@ -35,6 +35,13 @@ def register_admin_handlers(dp: Dispatcher, alert_manager):
             [
                 InlineKeyboardButton(text="📋 История", callback_data="admin_history"),
                 InlineKeyboardButton(text="🔄 Проверить модули", callback_data="admin_check_modules")
+            ],
+            [
+                InlineKeyboardButton(text="☠️ Недоставленные", callback_data="admin_dead_letters"),
+                InlineKeyboardButton(text="🗜️ Очистка БД", callback_data="admin_compaction")
+            ],
+            [
+                InlineKeyboardButton(text="⏱️ Время ответа", callback_data="admin_latency")
             ]
         ])
         
@@ -50,12 +57,14 @@ def register_admin_handlers(dp: Dispatcher, alert_manager):
         """Показать статистику алертов"""
         try:
             stats = await alert_manager.get_alert_statistics()
+            windows = stats.get('windows', {})
             
             message = f"""
 📊 **Статистика алертов**
 
 📈 **Общее количество:** {stats.get('total_alerts', 0)}
 🕐 **За последний час:** {stats.get('recent_alerts', 0)}
+🗓 **За 24ч / 7д / 30д:** {windows.get('24h', 0)} / {windows.get('7d', 0)} / {windows.get('30d', 0)}
 
 📋 **По типам:**
 """
@@ -80,16 +89,17 @@ def register_admin_handlers(dp: Dispatcher, alert_manager):
     async def show_modules_status(callback: CallbackQuery, alert_manager):
         """Показать статус модулей"""
         try:
-            status_data = await alert_manager.db.get_module_status()
+            status_data = await alert_manager.get_module_status()
             
             message = "🔧 **Статус модулей**\n\n"
             
             for module_name, module_info in status_data.get('modules', {}).items():
-                status_emoji = "✅" if module_info['status'] == 'online' else "❌"
+                status_emoji = {'online': "✅", 'degraded': "⚠️"}.get(module_info['status'], "❌")
                 response_time = module_info.get('response_time', 'N/A')
                 
                 message += f"{status_emoji} **{module_name}**\n"
-                message += f"   Статус: `{module_info['status']}`\n"
+                message += f"   Статус: `{module_info['status']}`"
+                message += " (флаппинг)\n" if module_info.get('flapping') else "\n"
                 message += f"   Время ответа: `{response_time}ms`\n"
                 message += f"   Последняя проверка: `{module_info['last_check']}`\n\n"
             
@@ -146,16 +156,18 @@ def register_admin_handlers(dp: Dispatcher, alert_manager):
         try:
             await callback.answer("🔄 Проверяю модули...")
             
-            # Список модулей для проверки
-            modules_to_check = [
-                ("TeBium-Analytics-Server", "http://localhost:8081/health"),
-                ("Telegram-Bot-Tebium", "http://localhost:8080/health"),
-            ]
+            # Все модули из HEALTH_CHECK_URLS проверяются параллельно
+            results = await alert_manager.health_checker.check_all()
             
-            for module_name, health_url in modules_to_check:
-                await alert_manager.check_module_health(module_name, health_url)
+            message = "✅ Проверка модулей завершена\n\n"
+            for module_name, (status, response_time, details) in results.items():
+                status_emoji = "✅" if status == 'online' else "❌"
+                message += f"{status_emoji} {module_name}: `{status}`"
+                if response_time is not None:
+                    message += f" ({response_time * 1000:.0f}ms)"
+                message += "\n"
             
-            await callback.message.edit_text("✅ Проверка модулей завершена")
+            await callback.message.edit_text(message, parse_mode='Markdown')
             
         except Exception as e:
             logger.error(f"❌ Ошибка проверки модулей: {e}")
@@ -187,6 +199,90 @@ def register_admin_handlers(dp: Dispatcher, alert_manager):
             logger.error(f"❌ Ошибка получения истории: {e}")
             await callback.answer("❌ Ошибка получения истории")
     
+    @dp.callback_query(F.data == "admin_dead_letters")
+    async def show_dead_letters(callback: CallbackQuery, alert_manager):
+        """Показать недоставленные сообщения"""
+        try:
+            dead_letters = await alert_manager.db.get_dead_letters(10)
+            retry_stats = alert_manager.retry_scheduler.stats
+            
+            message = "☠️ **Недоставленные сообщения**\n\n"
+            message += f"🔁 Ожидают повтора: {alert_manager.retry_scheduler.pending()}\n"
+            message += f"⏳ Flood-wait: {retry_stats['flood_waits']}\n\n"
+            
+            if not dead_letters:
+                message += "✅ Недоставленных сообщений нет"
+            
+            for letter in dead_letters:
+                message += f"🆔 `{letter['alert_id']}` → `{letter['chat_id']}`\n"
+                message += f"   Попыток: {letter['attempts']}\n"
+                error_text = (letter['last_error'] or '')[:80].replace('`', "'")
+                message += f"   Ошибка: `{error_text}`\n"
+                message += f"   `{str(letter['failed_at'])[:19]}`\n\n"
+            
+            await callback.message.edit_text(message, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения dead letters: {e}")
+            await callback.answer("❌ Ошибка получения недоставленных сообщений")
+    
+    @dp.callback_query(F.data == "admin_compaction")
+    async def show_compaction(callback: CallbackQuery, alert_manager):
+        """Показать состояние очистки БД"""
+        try:
+            stats = alert_manager.compaction.get_stats()
+            progress = stats['progress']
+            
+            message = "🗜️ **Очистка БД**\n\n"
+            if stats['running']:
+                message += f"⏳ Выполняется: `{progress['stage']}` ({progress['processed']})\n\n"
+            message += f"🔄 Запусков: {stats['runs']}\n"
+            message += f"📅 Последний: `{str(stats['last_run_at'])[:19]}` ({stats['last_duration']} с)\n"
+            message += f"📦 Алертов свернуто: {stats['alerts_compacted']}\n"
+            message += f"🔧 Проверок модулей удалено: {stats['status_rows_deleted']}\n"
+            message += f"⏱️ Гистограмм удалено: {stats['latency_rows_deleted']}\n"
+            message += f"📊 Счетчиков свернуто: {stats['rollup_rows_compacted']}\n"
+            message += f"💾 Освобождено: {stats['reclaimed_bytes'] // 1024} КБ\n"
+            if alert_manager.db.archive:
+                archive_stats = alert_manager.db.archive.stats()
+                message += f"🗄️ В архиве: {archive_stats['alerts']} алертов за {archive_stats['days']} дн.\n"
+            if stats['last_error']:
+                error_text = stats['last_error'][:80].replace('`', "'")
+                message += f"\n❌ Ошибка: `{error_text}`\n"
+            
+            await callback.message.edit_text(message, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения состояния очистки: {e}")
+            await callback.answer("❌ Ошибка получения состояния очистки")
+    
+    @dp.callback_query(F.data == "admin_latency")
+    async def show_latency(callback: CallbackQuery, alert_manager):
+        """Показать перцентили времени ответа модулей"""
+        try:
+            modules = alert_manager.latency.modules()
+            
+            message = "⏱️ **Время ответа модулей за час** (p50 / p95 / p99)\n\n"
+            if not modules:
+                message += "Данных пока нет"
+            
+            for module_name in modules:
+                summary = alert_manager.get_latency_summary(module_name, 60)
+                if not summary['count']:
+                    continue
+                emoji = "🐢" if summary['breached'] else "✅"
+                message += (f"{emoji} {module_name}: `{summary['p50']:.0f}` / "
+                            f"`{summary['p95']:.0f}` / `{summary['p99']:.0f}` ms "
+                            f"({summary['count']} проверок)\n")
+                if summary['slo']:
+                    message += f"   SLO p95: `{summary['slo']:.0f}` ms\n"
+            
+            await callback.message.edit_text(message, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения времени ответа: {e}")
+            await callback.answer("❌ Ошибка получения времени ответа")
+    
     @dp.callback_query(F.data == "admin_settings")
     async def show_settings(callback: CallbackQuery):
         """Показать настройки"""
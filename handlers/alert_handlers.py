@@ -2,6 +2,7 @@
 Обработчики алертов для TeBium Alert Bot
 """
 
+import json
 import logging
 from aiogram import Dispatcher, F
 from aiogram.types import CallbackQuery, InlineKeyboardMarkup, InlineKeyboardButton
@@ -90,9 +91,8 @@ def register_alert_handlers(dp: Dispatcher, alert_manager):
         alert_id = callback.data.replace("details_", "")
         
         try:
-            # Получаем детали алерта из базы данных
-            history = await alert_manager.db.get_alert_history(1000)
-            alert = next((a for a in history if a['alert_id'] == alert_id), None)
+            # Получаем детали алерта из кэша или по индексу в базе данных
+            alert = await alert_manager.get_alert(alert_id)
             
             if not alert:
                 await callback.answer("❌ Алерт не найден")
@@ -113,7 +113,7 @@ def register_alert_handlers(dp: Dispatcher, alert_manager):
             """
             
             if alert['data']:
-                details += f"\n\n📊 **Дополнительные данные:**\n{alert['data']}"
+                details += f"\n\n📊 **Дополнительные данные:**\n{json.dumps(alert['data'], ensure_ascii=False)}"
             
             await callback.message.edit_text(details, parse_mode='Markdown')
             
@@ -4,7 +4,7 @@
 
 import logging
 from aiogram import Dispatcher
-from aiogram.filters import Command, CommandStart
+from aiogram.filters import Command, CommandObject, CommandStart
 from aiogram.types import Message, InlineKeyboardMarkup, InlineKeyboardButton
 from datetime import datetime
 
@@ -49,6 +49,9 @@ def register_system_handlers(dp: Dispatcher, alert_manager):
 • `/help` - Эта справка
 • `/status` - Статус системы
 • `/stats` - Статистика алертов
+• `/subscribe` - Подписаться на алерты (фильтры: `type=`, `module=`, `priority=`; дайджест: `digest=`, `every=`)
+• `/unsubscribe` - Отписаться от алертов
+• `/latency <модуль>` - Время ответа модуля (p50/p95/p99)
 • `/admin` - Панель администратора
 
 **Что делает бот:**
@@ -77,7 +80,7 @@ def register_system_handlers(dp: Dispatcher, alert_manager):
     async def status_command(message: Message, alert_manager):
         """Обработчик команды /status"""
         try:
-            status_data = await alert_manager.db.get_module_status()
+            status_data = await alert_manager.get_module_status()
             
             message_text = AlertTemplates.format_system_status(status_data)
             
@@ -99,12 +102,14 @@ def register_system_handlers(dp: Dispatcher, alert_manager):
         """Обработчик команды /stats"""
         try:
             stats = await alert_manager.get_alert_statistics()
+            windows = stats.get('windows', {})
             
             message_text = f"""
 📊 **Статистика алертов**
 
 📈 **Общее количество:** {stats.get('total_alerts', 0)}
 🕐 **За последний час:** {stats.get('recent_alerts', 0)}
+🗓 **За 24ч / 7д / 30д:** {windows.get('24h', 0)} / {windows.get('7d', 0)} / {windows.get('30d', 0)}
 
 📋 **По типам:**
 """
@@ -134,6 +139,102 @@ def register_system_handlers(dp: Dispatcher, alert_manager):
             logger.error(f"❌ Ошибка получения статистики: {e}")
             await message.answer("❌ Ошибка получения статистики")
     
+    @dp.message(Command("subscribe"))
+    async def subscribe_command(message: Message, command: CommandObject, alert_manager):
+        """Обработчик команды /subscribe [type=a,b] [module=x] [priority=error,critical]
+        [digest=info,warning] [every=15]"""
+        try:
+            filters = {'type': [], 'module': [], 'priority': [], 'digest': []}
+            interval = alert_manager.digest_interval
+            for arg in (command.args or "").split():
+                key, _, values = arg.partition("=")
+                if key == 'every' and values.isdigit() and int(values) > 0:
+                    interval = int(values)
+                    continue
+                if key not in filters or not values:
+                    await message.answer(
+                        "❌ Неверный формат. Используйте:\n"
+                        "`/subscribe type=error module=TeBium-Analytics-Server priority=error,critical`\n"
+                        "Дайджест: `/subscribe digest=info,warning every=15`",
+                        parse_mode='Markdown'
+                    )
+                    return
+                filters[key].extend(v.strip() for v in values.split(",") if v.strip())
+            
+            await alert_manager.db.add_subscription(
+                str(message.chat.id),
+                alert_types=filters['type'],
+                modules=filters['module'],
+                priority_levels=filters['priority'],
+                digest_priorities=filters['digest'],
+                digest_interval=interval
+            )
+            
+            description = "\n".join(
+                f"• {key}: `{', '.join(values) if values else 'все'}`"
+                for key, values in filters.items() if key != 'digest'
+            )
+            if filters['digest']:
+                description += (f"\n• дайджест: `{', '.join(filters['digest'])}` "
+                                f"раз в {interval} мин")
+            await message.answer(f"🔔 **Подписка оформлена**\n\n{description}", parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка оформления подписки: {e}")
+            await message.answer("❌ Ошибка оформления подписки")
+    
+    @dp.message(Command("unsubscribe"))
+    async def unsubscribe_command(message: Message, alert_manager):
+        """Обработчик команды /unsubscribe"""
+        try:
+            removed = await alert_manager.db.remove_subscriptions(str(message.chat.id))
+            await message.answer(f"🔕 Подписки отменены: {removed}")
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка отмены подписки: {e}")
+            await message.answer("❌ Ошибка отмены подписки")
+    
+    @dp.message(Command("latency"))
+    async def latency_command(message: Message, command: CommandObject, alert_manager):
+        """Обработчик команды /latency <модуль>"""
+        try:
+            module_name = (command.args or "").strip()
+            if not module_name:
+                modules = alert_manager.latency.modules()
+                text = "⏱️ Использование: `/latency <модуль>`"
+                if modules:
+                    text += "\n\nМодули: " + ", ".join(f"`{m}`" for m in modules)
+                await message.answer(text, parse_mode='Markdown')
+                return
+            
+            message_text = f"⏱️ **Время ответа** `{module_name}`\n\n"
+            has_data = False
+            for title, minutes in (("5 мин", 5), ("1 час", 60), ("24 часа", 24 * 60)):
+                summary = alert_manager.get_latency_summary(module_name, minutes)
+                if not summary['count']:
+                    continue
+                has_data = True
+                message_text += (
+                    f"**{title}** ({summary['count']} проверок)\n"
+                    f"p50 `{summary['p50']:.0f}` · p95 `{summary['p95']:.0f}` · "
+                    f"p99 `{summary['p99']:.0f}` · max `{summary['max']:.0f}` ms\n\n"
+                )
+            
+            if not has_data:
+                await message.answer(f"❓ Нет данных о времени ответа `{module_name}`", parse_mode='Markdown')
+                return
+            
+            summary = alert_manager.get_latency_summary(module_name, alert_manager.latency_slo_window)
+            if summary['slo']:
+                status = "🐢 нарушен" if summary['breached'] else "✅ соблюдается"
+                message_text += f"🎯 SLO p95 `{summary['slo']:.0f}` ms: {status}"
+            
+            await message.answer(message_text, parse_mode='Markdown')
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения времени ответа: {e}")
+            await message.answer("❌ Ошибка получения времени ответа")
+    
     @dp.message(Command("ping"))
     async def ping_command(message: Message):
         """Обработчик команды /ping"""
@@ -0,0 +1,120 @@
+#!/usr/bin/env python3
+"""
+Микро-бенчмарк форматирования алертов: текст сообщения и клавиатура
+
+Замеряет, сколько алертов в секунду форматирует AlertTemplates и сколько
+сообщений (текст + клавиатура) в секунду готовится при рассылке алерта
+нескольким получателям. Результат сохраняется в JSON для сравнения версий:
+
+    python scripts/bench/render_bench.py --save bench_results/render-old.json
+    python scripts/bench/render_bench.py --compare bench_results/render-old.json
+"""
+
+import argparse
+import json
+import random
+import sys
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Any, Callable, Dict, List
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT))
+
+from config.alert_templates import AlertTemplates
+from utils.rendering import AlertRenderer
+
+MODULES = ("TeBium-Analytics-Server", "Telegram-Bot-Tebium", "api-gateway", "db-primary", "web")
+TYPES = ("error", "warning", "performance", "database", "info")
+PRIORITIES = ("critical", "error", "warning", "info")
+
+def make_alerts(count: int, seed: int = 1) -> List[Dict[str, Any]]:
+    """Алерты с реалистичными текстами (в том числе со спецсимволами Markdown)"""
+    rng = random.Random(seed)
+    started = datetime(2024, 1, 1, 12, 0, 0)
+    return [
+        {
+            'type': rng.choice(TYPES),
+            'priority': rng.choice(PRIORITIES),
+            'module': rng.choice(MODULES),
+            'message': f"Request to /api/v1/users_{i} failed: *timeout* after {rng.randint(1, 900)}ms",
+            'timestamp': (started + timedelta(seconds=i)).isoformat(),
+            'data': {'host': f"10.0.{i % 8}.{i % 250}", 'status_code': 504, 'retry_count': i % 5}
+        }
+        for i in range(count)
+    ]
+
+def measure(operation: Callable[[], int], min_seconds: float) -> float:
+    """Операций в секунду (operation возвращает число выполненных операций)"""
+    done = 0
+    started = time.perf_counter()
+    while True:
+        done += operation()
+        elapsed = time.perf_counter() - started
+        if elapsed >= min_seconds:
+            return round(done / elapsed)
+
+def run(alerts: List[Dict[str, Any]], recipients: int, min_seconds: float) -> Dict[str, Any]:
+    ids = [f"bench-{i}" for i in range(len(alerts))]
+
+    def format_all() -> int:
+        for alert in alerts:
+            AlertTemplates.format_alert(alert)
+        return len(alerts)
+
+    def keyboards() -> int:
+        for alert_id in ids:
+            AlertRenderer.build_keyboard(alert_id)
+        return len(ids)
+
+    def fan_out() -> int:
+        # Рассылка одного алерта получателям: форматирование один раз
+        renderer = AlertRenderer(cache_size=len(alerts))
+        for alert_id, alert in zip(ids, alerts):
+            for _ in range(recipients):
+                renderer.render(alert_id, alert)
+        return len(alerts) * recipients
+
+    return {
+        'format_alert_per_sec': measure(format_all, min_seconds),
+        'keyboard_per_sec': measure(keyboards, min_seconds),
+        'messages_per_sec': measure(fan_out, min_seconds),
+    }
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Изменения относительно сохраненного прогона (все метрики - больше лучше)"""
+    print(f"\n📊 Сравнение с {baseline.get('timestamp', '')[:19]}")
+    for key, new in current['results'].items():
+        old = baseline['results'].get(key)
+        if not old:
+            continue
+        print(f"  {key:<22} {old:>10} → {new:>10} ({(new - old) / old * 100:+.1f}%)")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Микро-бенчмарк форматирования алертов")
+    parser.add_argument("--alerts", type=int, default=1000, help="число разных алертов")
+    parser.add_argument("--recipients", type=int, default=20, help="получателей на алерт")
+    parser.add_argument("--seconds", type=float, default=2, help="минимальное время замера")
+    parser.add_argument("--save", type=Path, help="сохранить результат в JSON")
+    parser.add_argument("--compare", type=Path, help="сравнить с сохраненным результатом")
+    args = parser.parse_args(argv)
+
+    report = {
+        'params': {'alerts': args.alerts, 'recipients': args.recipients},
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'results': run(make_alerts(args.alerts), args.recipients, args.seconds),
+    }
+    print(json.dumps(report['results'], ensure_ascii=False, indent=2))
+
+    if args.save:
+        args.save.parent.mkdir(parents=True, exist_ok=True)
+        args.save.write_text(json.dumps(report, ensure_ascii=False, indent=2), encoding='utf-8')
+        print(f"💾 Результат сохранен: {args.save}")
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text(encoding='utf-8')))
+
+if __name__ == "__main__":
+    main()
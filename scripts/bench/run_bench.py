@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Нагрузочный тест конвейера алертов: прием через webhook -> БД -> доставка в Telegram
+
+Бот запускается в этом же процессе с временной БД, Telegram заменен локальной
+заглушкой (scripts/fake_telegram_api.py). Результат сохраняется в JSON, чтобы
+сравнивать версии:
+
+    python scripts/bench/run_bench.py constant --rate 500 --duration 20
+    python scripts/bench/run_bench.py burst --compare bench_results/old.json
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import re
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+import aiohttp
+from aiohttp import web
+
+ROOT = Path(__file__).resolve().parent.parent.parent
+sys.path.append(str(ROOT))
+sys.path.append(str(ROOT / "scripts"))
+sys.path.append(str(Path(__file__).resolve().parent))
+
+from fake_telegram_api import FakeTelegramAPI, parse_errors
+from scenarios import SCENARIOS, arrival_offsets, make_alert
+
+SEQ_PATTERN = re.compile(r"bench-(\d+)")
+
+# Метрики, по которым сравниваются прогоны: (путь, больше - лучше)
+COMPARED_METRICS = (
+    ('ingest.throughput', True),
+    ('ingest.latency_ms.p95', False),
+    ('delivery.throughput', True),
+    ('end_to_end_ms.p50', False),
+    ('end_to_end_ms.p95', False),
+    ('end_to_end_ms.p99', False),
+    ('db.write_ops_per_sec', True),
+    ('memory.peak_rss_mb', False),
+)
+
+def percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    """p50/p95/p99/max по списку значений"""
+    if not values:
+        return {'p50': None, 'p95': None, 'p99': None, 'max': None}
+    ordered = sorted(values)
+
+    def pick(percent: float) -> float:
+        index = min(int(len(ordered) * percent / 100), len(ordered) - 1)
+        return round(ordered[index], 2)
+
+    return {'p50': pick(50), 'p95': pick(95), 'p99': pick(99), 'max': round(ordered[-1], 2)}
+
+def peak_rss_mb() -> float:
+    """Пиковый RSS процесса (ru_maxrss - КБ в Linux, байты в macOS)"""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(rss / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+def git_version() -> Optional[str]:
+    try:
+        return subprocess.check_output(
+            ["git", "describe", "--always", "--dirty"], cwd=ROOT, stderr=subprocess.DEVNULL
+        ).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def configure_environment(args, workdir: Path, api_url: str):
+    """Настройки бота для прогона (до импорта config.settings)"""
+    os.environ.update({
+        'TELEGRAM_API_URL': api_url,
+        'BOT_TOKEN': '123456:BENCH-TOKEN',
+        'WEBHOOK_SECRET': 'bench-secret',
+        'DATABASE_URL': f"sqlite:///{workdir / 'bench.db'}",
+        'ALERT_COOLDOWN': '0',
+        'MAX_ALERTS_PER_HOUR': str(10 ** 9),
+        'RATE_LIMIT_RULES': '{}',
+        'DEDUP_WINDOW': '0',  # каждый алерт бенчмарка должен дойти до Telegram
+        'QUEUE_MAX_PENDING': str(10 ** 7),
+        'TELEGRAM_GLOBAL_RATE': str(args.telegram_rate),
+        'TELEGRAM_CHAT_RATE': str(args.chat_rate),
+        'DELIVERY_WORKERS': str(args.workers),
+        'WEBHOOK_FAST_ACK': 'true' if args.fast_ack else 'false',
+        'HEALTH_CHECK_URLS': '{}',
+        'COMPACTION_INTERVAL': '0',
+        'ALERT_ARCHIVE_ENABLED': 'false',
+        'METRICS_PORT': '0',
+        'LOG_LEVEL': 'WARNING',
+        'LOG_FILE': str(workdir / 'logs' / 'alert_bot.log'),  # логи прогона не попадают в logs/ проекта
+    })
+
+class BenchRun:
+    """Один прогон сценария"""
+
+    def __init__(self, args, params: Dict[str, Any]):
+        self.args = args
+        self.params = params
+        self.sent_at: Dict[int, float] = {}
+        self.delivered_at: Dict[int, float] = {}
+        self.deliveries = 0
+        self.request_latencies: List[float] = []
+        self.statuses: Dict[str, int] = {}
+        self.accepted = 0
+
+    def on_message(self, chat_id: str, text: str, received_at: float):
+        """Доставка в заглушку Telegram: учет первой доставки алерта"""
+        self.deliveries += 1
+        match = SEQ_PATTERN.search(text)
+        if match:
+            self.delivered_at.setdefault(int(match.group(1)), received_at)
+
+    async def run_with_fake_api(self, workdir: Path) -> Dict[str, Any]:
+        """Прогон против локальной заглушки Bot API"""
+        fake = FakeTelegramAPI(latency=self.args.telegram_latency, on_message=self.on_message,
+                               errors=parse_errors(self.args.telegram_errors),
+                               rate_limit=self.args.telegram_limits)
+        api_url = await fake.start()
+        configure_environment(self.args, workdir, api_url)
+        try:
+            results = await self.run()
+        finally:
+            await fake.stop()
+        results['telegram'] = {'requests': fake.requests, 'errors': fake.stats['errors'],
+                               'rate_limited': fake.stats['rate_limited']}
+        return results
+
+    async def run(self) -> Dict[str, Any]:
+        # Проект импортируется после configure_environment: Settings читает окружение при импорте
+        import logging
+
+        from alert_bot import TeBiumAlertBot
+        from utils.metrics import metrics_middleware
+
+        logging.getLogger('TeBiumAlertBot').setLevel(logging.WARNING)
+
+        bot = TeBiumAlertBot()
+
+        await bot.db.init_database()
+        for chat_index in range(self.params['subscribers']):
+            await bot.db.add_subscription(str(100000 + chat_index))
+        bot.start_background_tasks()
+
+        app = web.Application(middlewares=[metrics_middleware])
+        bot.add_api_routes(app)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        base_url = f"http://127.0.0.1:{runner.addresses[0][1]}"
+
+        batcher_before = dict(bot.db.batcher.stats)
+        rss_before = peak_rss_mb()
+
+        offsets = arrival_offsets(self.params)
+        connector = aiohttp.TCPConnector(limit=self.args.connections)
+        headers = {'Authorization': f"Bearer {bot.settings.WEBHOOK_SECRET}"}
+        try:
+            async with aiohttp.ClientSession(connector=connector, headers=headers) as session:
+                started = time.perf_counter()
+                await self._send_all(session, f"{base_url}{bot.webhook_url}", offsets, started)
+                ingest_elapsed = time.perf_counter() - started
+
+                expected = self.accepted * self.params['subscribers']
+                deadline = time.perf_counter() + self.args.drain_timeout
+                while self.deliveries < expected and time.perf_counter() < deadline:
+                    await asyncio.sleep(0.05)
+                total_elapsed = time.perf_counter() - started
+        finally:
+            await runner.cleanup()
+            await bot.shutdown()
+            await bot.bot.session.close()
+
+        write_ops = bot.db.batcher.stats['operations'] - batcher_before['operations']
+        end_to_end = [
+            (self.delivered_at[seq] - sent) * 1000
+            for seq, sent in self.sent_at.items() if seq in self.delivered_at
+        ]
+        return {
+            'ingest': {
+                'requests': len(offsets),
+                'accepted': self.accepted,
+                'statuses': self.statuses,
+                'elapsed_s': round(ingest_elapsed, 3),
+                'throughput': round(len(offsets) / ingest_elapsed, 1),
+                'latency_ms': percentiles(self.request_latencies),
+            },
+            'delivery': {
+                'expected': self.accepted * self.params['subscribers'],
+                'delivered': self.deliveries,
+                'elapsed_s': round(total_elapsed, 3),
+                'throughput': round(self.deliveries / total_elapsed, 1),
+            },
+            'end_to_end_ms': percentiles(end_to_end),
+            'db': {
+                'write_ops': write_ops,
+                'batches': bot.db.batcher.stats['batches'] - batcher_before['batches'],
+                'write_ops_per_sec': round(write_ops / total_elapsed, 1),
+            },
+            'memory': {
+                'rss_before_mb': rss_before,
+                'peak_rss_mb': peak_rss_mb(),
+            },
+        }
+
+    async def _send_all(self, session, url: str, offsets: List[float], started: float):
+        """Отправка алертов по расписанию; пачками, если задан --batch"""
+        modules = self.params['modules']
+        batch_size = max(self.args.batch, 1)
+        tasks = []
+        for first in range(0, len(offsets), batch_size):
+            delay = started + offsets[first] - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            seqs = list(range(first, min(first + batch_size, len(offsets))))
+            alerts = [make_alert(seq, modules) for seq in seqs]
+            tasks.append(asyncio.create_task(self._send(session, url, seqs, alerts)))
+        await asyncio.gather(*tasks)
+
+    async def _send(self, session, url: str, seqs: List[int], alerts: List[Dict[str, Any]]):
+        batch = self.args.batch > 1
+        sent = time.perf_counter()
+        for seq in seqs:
+            self.sent_at[seq] = sent
+        try:
+            async with session.post(f"{url}/batch" if batch else url,
+                                    json=alerts if batch else alerts[0]) as response:
+                body = await response.read()
+                status = str(response.status)
+        except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+            status = type(e).__name__
+            body = b""
+        self.request_latencies.append((time.perf_counter() - sent) * 1000)
+
+        if batch and status == "200":
+            for item in json.loads(body)['results']:
+                self.statuses[item['status']] = self.statuses.get(item['status'], 0) + 1
+                self.accepted += item['status'] == 'queued'
+            return
+        self.statuses[status] = self.statuses.get(status, 0) + len(seqs)
+        if status in ("200", "202"):
+            self.accepted += len(seqs)
+
+def lookup(results: Dict[str, Any], path: str) -> Optional[float]:
+    value: Any = results
+    for key in path.split('.'):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+def compare(current: Dict[str, Any], baseline: Dict[str, Any]):
+    """Таблица изменений относительно сохраненного прогона"""
+    print(f"\n📊 Сравнение с {baseline.get('version') or '?'} ({baseline.get('timestamp', '')[:19]})")
+    for path, higher_is_better in COMPARED_METRICS:
+        old = lookup(baseline['results'], path)
+        new = lookup(current['results'], path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        better = change >= 0 if higher_is_better else change <= 0
+        mark = "✅" if better or abs(change) < 5 else "⚠️"
+        print(f"  {mark} {path:<26} {old:>10} → {new:>10} ({change:+.1f}%)")
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Нагрузочный тест TeBium Alert Bot")
+    parser.add_argument("scenario", choices=sorted(SCENARIOS))
+    parser.add_argument("--rate", type=float, help="алертов в секунду")
+    parser.add_argument("--duration", type=float, help="секунд нагрузки")
+    parser.add_argument("--modules", type=int, help="число модулей-источников")
+    parser.add_argument("--subscribers", type=int, help="число подписанных чатов")
+    parser.add_argument("--burst-size", type=int, help="алертов в пачке (сценарий burst)")
+    parser.add_argument("--burst-interval", type=float, help="секунд между пачками")
+    parser.add_argument("--batch", type=int, default=1, help="отправлять через /batch по N алертов")
+    parser.add_argument("--fast-ack", action="store_true", help="включить WEBHOOK_FAST_ACK")
+    parser.add_argument("--connections", type=int, default=100, help="одновременных HTTP-соединений")
+    parser.add_argument("--workers", type=int, default=8, help="DELIVERY_WORKERS")
+    parser.add_argument("--telegram-rate", type=float, default=10000, help="TELEGRAM_GLOBAL_RATE")
+    parser.add_argument("--chat-rate", type=float, default=10000, help="TELEGRAM_CHAT_RATE")
+    parser.add_argument("--telegram-latency", default="0",
+                        help="задержка заглушки, мс: 40, uniform:20,80, lognormal:40,0.6")
+    parser.add_argument("--telegram-errors", default="", help="ошибки заглушки: 429=0.01,500=0.005")
+    parser.add_argument("--telegram-limits", action="store_true",
+                        help="ограничения частоты Telegram в заглушке (30/с, 1/с в чат)")
+    parser.add_argument("--drain-timeout", type=float, default=60, help="ожидание доставки, с")
+    parser.add_argument("--output", type=Path, help="файл результата (по умолчанию bench_results/)")
+    parser.add_argument("--compare", type=Path, help="сравнить с сохраненным результатом")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    params = dict(SCENARIOS[args.scenario])
+    for key in ('rate', 'duration', 'modules', 'subscribers', 'burst_size', 'burst_interval'):
+        value = getattr(args, key)
+        if value is not None:
+            params[key] = value
+
+    with tempfile.TemporaryDirectory(prefix="tebium-bench-") as workdir:
+        print(f"🚀 Сценарий {args.scenario}: {params}")
+        results = asyncio.run(BenchRun(args, params).run_with_fake_api(Path(workdir)))
+
+    report = {
+        'scenario': args.scenario,
+        'params': params,
+        'options': {key: value for key, value in vars(args).items()
+                    if key not in ('output', 'compare', 'scenario') and key not in params},
+        'version': git_version(),
+        'timestamp': datetime.now().isoformat(),
+        'python': sys.version.split()[0],
+        'results': results,
+    }
+
+    output = args.output or ROOT / "bench_results" / (
+        f"{args.scenario}-{datetime.now().strftime('%Y%m%d-%H%M%S')}.json")
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(report, ensure_ascii=False, indent=2, default=str), encoding='utf-8')
+
+    print(json.dumps(results, ensure_ascii=False, indent=2))
+    print(f"💾 Результат сохранен: {output}")
+
+    if args.compare:
+        compare(report, json.loads(args.compare.read_text(encoding='utf-8')))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,41 @@
+"""
+Сценарии нагрузки для бенчмарка TeBium Alert Bot
+"""
+
+from typing import Any, Dict, List
+
+# Параметры по умолчанию; любой можно переопределить из командной строки
+SCENARIOS: Dict[str, Dict[str, Any]] = {
+    # Равномерный поток от нескольких модулей
+    'constant': {'rate': 200, 'duration': 10, 'modules': 5, 'subscribers': 1},
+    # Пачки алертов (инцидент: много модулей падают одновременно)
+    'burst': {'burst_size': 500, 'burst_interval': 2, 'duration': 10, 'modules': 50, 'subscribers': 1},
+    # Много источников: нагрузка на rate limiter, статистику и кэши
+    'many_modules': {'rate': 200, 'duration': 10, 'modules': 1000, 'subscribers': 1},
+    # Много подписчиков: каждый алерт - десятки сообщений в Telegram
+    'many_subscribers': {'rate': 20, 'duration': 10, 'modules': 5, 'subscribers': 50},
+}
+
+ALERT_TYPES = (('error', 'error'), ('warning', 'warning'), ('info', 'info'), ('critical', 'critical'))
+
+def arrival_offsets(params: Dict[str, Any]) -> List[float]:
+    """Смещения (в секундах от старта) отправки каждого алерта"""
+    duration = params['duration']
+    if params.get('burst_size'):
+        bursts = max(int(duration // params['burst_interval']), 1)
+        return [burst * params['burst_interval']
+                for burst in range(bursts) for _ in range(params['burst_size'])]
+
+    total = int(params['rate'] * duration)
+    return [i / params['rate'] for i in range(total)]
+
+def make_alert(seq: int, modules: int) -> Dict[str, Any]:
+    """Алерт бенчмарка; номер в тексте связывает отправку с доставкой"""
+    alert_type, priority = ALERT_TYPES[seq % len(ALERT_TYPES)]
+    return {
+        'type': alert_type,
+        'priority': priority,
+        'module': f"bench-module-{seq % modules}",
+        'message': f"bench-{seq}",
+        'data': {'seq': seq}
+    }
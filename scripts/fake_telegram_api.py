@@ -0,0 +1,448 @@
+#!/usr/bin/env python3
+"""
+Локальная заглушка Telegram Bot API для нагрузочного тестирования
+
+Реализует sendMessage, editMessageText, answerCallbackQuery, getUpdates,
+setWebhook (и служебные getMe, deleteWebhook, getWebhookInfo) с настраиваемой
+задержкой ответа, внедрением ошибок и ограничениями частоты как у Telegram.
+Бот направляется на заглушку настройкой TELEGRAM_API_URL:
+
+    python scripts/fake_telegram_api.py --port 8081 --latency lognormal:40,0.6 --errors 429=0.01,500=0.005
+    TELEGRAM_API_URL=http://127.0.0.1:8081 python alert_bot.py
+"""
+
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import math
+import random
+import time
+from collections import OrderedDict, deque
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple
+
+import aiohttp
+from aiohttp import web
+
+logger = logging.getLogger('FakeTelegramAPI')
+
+# Ошибки, которые можно внедрять: код -> описание Telegram
+ERROR_DESCRIPTIONS = {
+    400: "Bad Request: chat not found",
+    403: "Forbidden: bot was blocked by the user",
+    429: "Too Many Requests: retry after {retry_after}",
+    500: "Internal Server Error",
+    502: "Bad Gateway",
+}
+
+# Методы, на которые действуют ограничения частоты отправки
+RATE_LIMITED_METHODS = {"sendMessage", "editMessageText"}
+
+class TelegramError(Exception):
+    """Ошибка в ответе Bot API"""
+
+    def __init__(self, code: int, description: str, retry_after: Optional[int] = None):
+        super().__init__(description)
+        self.code = code
+        self.description = description
+        self.retry_after = retry_after
+
+    def to_response(self) -> web.Response:
+        body: Dict[str, Any] = {"ok": False, "error_code": self.code, "description": self.description}
+        if self.retry_after is not None:
+            body["parameters"] = {"retry_after": self.retry_after}
+        return web.json_response(body, status=self.code)
+
+class LatencyModel:
+    """Распределение задержки ответа, задается строкой (значения в мс):
+
+    ``40`` или ``const:40``, ``uniform:20,80``, ``normal:50,10``,
+    ``lognormal:40,0.6`` (медиана и sigma), ``exp:50`` (среднее).
+    """
+
+    def __init__(self, spec: str = "0", rng: Optional[random.Random] = None):
+        self.spec = spec
+        self.rng = rng or random.Random()
+        kind, _, args = spec.partition(":") if ":" in spec else ("const", "", spec)
+        self.kind = kind
+        self.args = [float(value) for value in args.split(",") if value]
+        if kind not in ("const", "uniform", "normal", "lognormal", "exp"):
+            raise ValueError(f"Неизвестное распределение задержки: {spec}")
+
+    def sample(self) -> float:
+        """Задержка в секундах"""
+        args = self.args
+        if self.kind == "const":
+            value = args[0] if args else 0.0
+        elif self.kind == "uniform":
+            value = self.rng.uniform(args[0], args[1])
+        elif self.kind == "normal":
+            value = self.rng.gauss(args[0], args[1])
+        elif self.kind == "lognormal":
+            value = args[0] * math.exp(self.rng.gauss(0, args[1]))
+        else:
+            value = self.rng.expovariate(1 / args[0])
+        return max(value, 0.0) / 1000
+
+class RateWindow:
+    """Token bucket: ``rate`` запросов за ``per`` секунд, запас ``burst``"""
+
+    __slots__ = ('rate', 'burst', 'tokens', 'updated')
+
+    def __init__(self, rate: float, per: float = 1.0, burst: Optional[float] = None):
+        self.rate = rate / per
+        self.burst = burst if burst is not None else rate
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+
+    def retry_after(self, now: float) -> float:
+        """0 - запрос можно выполнить, иначе секунды до освобождения"""
+        if now > self.updated:
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        self.tokens -= 1
+
+class FakeTelegramAPI:
+    """Bot API в памяти для офлайн-тестов доставки.
+
+    Ограничения по умолчанию повторяют рекомендации Telegram: не больше 30
+    сообщений в секунду всего, 1 сообщения в секунду в личный чат (с небольшим
+    запасом) и 20 сообщений в минуту в группу. При превышении отвечает 429 с
+    ``retry_after``, как настоящий API.
+    """
+
+    def __init__(self, latency: Any = 0.0,
+                 on_message: Optional[Callable[[str, str, float], Any]] = None,
+                 errors: Optional[Dict[int, float]] = None, rate_limit: bool = False,
+                 global_rate: float = 30, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate_per_minute: float = 20, history_size: int = 10000,
+                 seed: Optional[int] = None):
+        self.rng = random.Random(seed)
+        if isinstance(latency, (int, float)):
+            latency = f"const:{latency * 1000}"
+        self.latency = LatencyModel(latency, self.rng)
+        self.on_message = on_message
+        self.errors = errors or {}
+        self.rate_limit = rate_limit
+        self.global_rate = global_rate
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate_per_minute = group_rate_per_minute
+
+        self.messages: Deque[Tuple[float, str, str]] = deque(maxlen=history_size)  # (время, чат, текст)
+        self.stored: "OrderedDict[Tuple[str, int], str]" = OrderedDict()  # для editMessageText
+        self.history_size = history_size
+        self.callback_answers: Deque[Dict[str, Any]] = deque(maxlen=history_size)
+        self.stats: Dict[str, Any] = {'requests': 0, 'by_method': {}, 'errors': {}, 'rate_limited': 0}
+
+        self.webhook_url: Optional[str] = None
+        self.webhook_secret: Optional[str] = None
+        self.updates: List[Dict[str, Any]] = []
+        self._update_ids = itertools.count(1)
+        self._new_update = asyncio.Event()
+
+        self._global_window = RateWindow(global_rate)
+        self._chat_windows: Dict[str, RateWindow] = {}
+        self._message_ids: Dict[str, itertools.count] = {}
+        self._webhook_session: Optional[aiohttp.ClientSession] = None
+        self._runner: Optional[web.AppRunner] = None
+        self.url: Optional[str] = None
+
+    @property
+    def requests(self) -> int:
+        return self.stats['requests']
+
+    def create_app(self) -> web.Application:
+        app = web.Application()
+        app.router.add_route("*", "/bot{token}/{method}", self.handle_method)
+        app.router.add_post("/fake/updates", self.handle_inject_update)
+        app.router.add_get("/fake/stats", self.handle_stats)
+        return app
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> str:
+        """Запуск сервера; возвращает базовый URL для TELEGRAM_API_URL"""
+        self._runner = web.AppRunner(self.create_app())
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        port = self._runner.addresses[0][1]
+        self.url = f"http://{host}:{port}"
+        return self.url
+
+    async def stop(self):
+        if self._webhook_session is not None:
+            await self._webhook_session.close()
+            self._webhook_session = None
+        if self._runner is not None:
+            await self._runner.cleanup()
+            self._runner = None
+
+    # --- Обработка запросов ---
+
+    async def _read_params(self, request: web.Request) -> Dict[str, Any]:
+        if request.content_type == "application/json":
+            return await request.json()
+        if request.method == "GET":
+            return dict(request.query)
+        return dict(await request.post())
+
+    async def handle_method(self, request: web.Request) -> web.Response:
+        method = request.match_info['method']
+        self.stats['requests'] += 1
+        self.stats['by_method'][method] = self.stats['by_method'].get(method, 0) + 1
+
+        handler = getattr(self, f"_method_{method}", None)
+        if handler is None:
+            return TelegramError(404, "Not Found: method not found").to_response()
+
+        params = await self._read_params(request)
+        delay = self.latency.sample()
+        if delay:
+            await asyncio.sleep(delay)
+
+        try:
+            if method in RATE_LIMITED_METHODS:
+                self._inject_error()
+                self._check_rate_limit(str(params.get('chat_id')))
+            result = await handler(params)
+        except TelegramError as e:
+            self.stats['errors'][e.code] = self.stats['errors'].get(e.code, 0) + 1
+            return e.to_response()
+
+        return web.json_response({"ok": True, "result": result})
+
+    def _inject_error(self):
+        """Случайная ошибка с заданными вероятностями"""
+        for code, probability in self.errors.items():
+            if probability and self.rng.random() < probability:
+                retry_after = self.rng.randint(1, 5) if code == 429 else None
+                description = ERROR_DESCRIPTIONS.get(code, "Error").format(retry_after=retry_after)
+                raise TelegramError(code, description, retry_after)
+
+    def _check_rate_limit(self, chat_id: str):
+        """Ограничения Telegram: общий поток и по чатам"""
+        if not self.rate_limit:
+            return
+        now = time.monotonic()
+        window = self._chat_windows.get(chat_id)
+        if window is None:
+            if chat_id.startswith('-'):
+                window = RateWindow(self.group_rate_per_minute, per=60)
+            else:
+                window = RateWindow(self.chat_rate, burst=self.chat_burst)
+            self._chat_windows[chat_id] = window
+
+        wait = max(self._global_window.retry_after(now), window.retry_after(now))
+        if wait:
+            self.stats['rate_limited'] += 1
+            retry_after = math.ceil(wait)
+            raise TelegramError(429, ERROR_DESCRIPTIONS[429].format(retry_after=retry_after), retry_after)
+        self._global_window.consume()
+        window.consume()
+
+    def _chat(self, chat_id: str) -> Dict[str, Any]:
+        if not chat_id or chat_id == "None":
+            raise TelegramError(400, "Bad Request: chat_id is empty")
+        chat: Any = int(chat_id) if chat_id.lstrip('-').isdigit() else chat_id
+        if isinstance(chat, int) and chat > 0:
+            return {"id": chat, "type": "private", "first_name": "Bench"}
+        return {"id": chat, "type": "supergroup", "title": "Bench"}
+
+    def _message(self, chat_id: str, message_id: int, text: str,
+                 reply_markup: Any = None, edited: bool = False) -> Dict[str, Any]:
+        message: Dict[str, Any] = {
+            "message_id": message_id,
+            "date": int(time.time()),
+            "chat": self._chat(chat_id),
+            "text": text
+        }
+        if edited:
+            message["edit_date"] = int(time.time())
+        if reply_markup:
+            message["reply_markup"] = json.loads(reply_markup) if isinstance(reply_markup, str) else reply_markup
+        return message
+
+    def _store(self, chat_id: str, message_id: int, text: str):
+        self.stored[(chat_id, message_id)] = text
+        if len(self.stored) > self.history_size:
+            self.stored.popitem(last=False)
+
+    async def _method_getMe(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"id": 123456, "is_bot": True, "first_name": "TeBium Fake", "username": "tebium_fake_bot"}
+
+    async def _method_sendMessage(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        chat_id = str(params.get('chat_id'))
+        text = str(params.get('text') or '')
+        if not text:
+            raise TelegramError(400, "Bad Request: message text is empty")
+        if len(text) > 4096:
+            raise TelegramError(400, "Bad Request: message is too long")
+
+        counter = self._message_ids.get(chat_id)
+        if counter is None:
+            counter = self._message_ids[chat_id] = itertools.count(1)
+        message_id = next(counter)
+        self._store(chat_id, message_id, text)
+
+        received_at = time.perf_counter()
+        self.messages.append((received_at, chat_id, text))
+        if self.on_message:
+            self.on_message(chat_id, text, received_at)
+        return self._message(chat_id, message_id, text, params.get('reply_markup'))
+
+    async def _method_editMessageText(self, params: Dict[str, Any]) -> Any:
+        if params.get('inline_message_id'):
+            return True
+        chat_id = str(params.get('chat_id'))
+        message_id = int(params.get('message_id') or 0)
+        text = str(params.get('text') or '')
+
+        key = (chat_id, message_id)
+        if key not in self.stored:
+            raise TelegramError(400, "Bad Request: message to edit not found")
+        if self.stored[key] == text and not params.get('reply_markup'):
+            raise TelegramError(400, "Bad Request: message is not modified: specified new message "
+                                     "content and reply markup are exactly the same as a current "
+                                     "content and reply markup of the message")
+        self.stored[key] = text
+        self.stored.move_to_end(key)
+        return self._message(chat_id, message_id, text, params.get('reply_markup'), edited=True)
+
+    async def _method_answerCallbackQuery(self, params: Dict[str, Any]) -> bool:
+        if not params.get('callback_query_id'):
+            raise TelegramError(400, "Bad Request: query is too old and response timeout expired "
+                                     "or query ID is invalid")
+        self.callback_answers.append(dict(params))
+        return True
+
+    async def _method_getUpdates(self, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+        if self.webhook_url:
+            raise TelegramError(409, "Conflict: can't use getUpdates method while webhook is active; "
+                                     "use deleteWebhook to delete the webhook first")
+        offset = int(params.get('offset') or 0)
+        limit = int(params.get('limit') or 100)
+        timeout = min(float(params.get('timeout') or 0), 50)
+
+        if offset:
+            self.updates = [update for update in self.updates if update['update_id'] >= offset]
+        if not self.updates and timeout:
+            self._new_update.clear()
+            try:
+                await asyncio.wait_for(self._new_update.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+        return self.updates[:limit]
+
+    async def _method_setWebhook(self, params: Dict[str, Any]) -> bool:
+        url = params.get('url') or None
+        self.webhook_url = url
+        self.webhook_secret = params.get('secret_token') or None
+        if url and self.updates:
+            pending, self.updates = self.updates, []
+            for update in pending:
+                await self._post_webhook(update)
+        return True
+
+    async def _method_deleteWebhook(self, params: Dict[str, Any]) -> bool:
+        self.webhook_url = None
+        self.webhook_secret = None
+        if str(params.get('drop_pending_updates', '')).lower() == 'true':
+            self.updates = []
+        return True
+
+    async def _method_getWebhookInfo(self, params: Dict[str, Any]) -> Dict[str, Any]:
+        return {"url": self.webhook_url or "", "has_custom_certificate": False,
+                "pending_update_count": len(self.updates)}
+
+    # --- Входящие обновления (нажатия кнопок и сообщения пользователей) ---
+
+    def add_update(self, update: Dict[str, Any]) -> Dict[str, Any]:
+        """Добавление обновления для getUpdates или отправки на webhook"""
+        update = dict(update, update_id=next(self._update_ids))
+        if self.webhook_url:
+            asyncio.get_running_loop().create_task(self._post_webhook(update))
+        else:
+            self.updates.append(update)
+            self._new_update.set()
+        return update
+
+    def callback_update(self, chat_id: int, data: str, message_id: int = 1) -> Dict[str, Any]:
+        """Нажатие inline-кнопки под сообщением бота"""
+        text = self.stored.get((str(chat_id), message_id), "")
+        return self.add_update({
+            "callback_query": {
+                "id": str(self.rng.getrandbits(63)),
+                "from": {"id": chat_id, "is_bot": False, "first_name": "Bench"},
+                "chat_instance": str(chat_id),
+                "data": data,
+                "message": self._message(str(chat_id), message_id, text or "-")
+            }
+        })
+
+    async def _post_webhook(self, update: Dict[str, Any]):
+        if self._webhook_session is None:
+            self._webhook_session = aiohttp.ClientSession()
+        headers = {"X-Telegram-Bot-Api-Secret-Token": self.webhook_secret} if self.webhook_secret else {}
+        try:
+            async with self._webhook_session.post(self.webhook_url, json=update, headers=headers) as response:
+                await response.read()
+        except aiohttp.ClientError as e:
+            logger.warning(f"⚠️ Webhook недоступен: {e}")
+
+    async def handle_inject_update(self, request: web.Request) -> web.Response:
+        """POST /fake/updates - обновление в формате Bot API (без update_id)"""
+        return web.json_response(self.add_update(await request.json()))
+
+    async def handle_stats(self, request: web.Request) -> web.Response:
+        """GET /fake/stats - счетчики запросов и ошибок"""
+        return web.json_response({**self.stats, 'messages': len(self.messages),
+                                  'pending_updates': len(self.updates),
+                                  'webhook_url': self.webhook_url})
+
+def parse_errors(spec: str) -> Dict[int, float]:
+    """``429=0.01,500=0.005`` -> {429: 0.01, 500: 0.005}"""
+    errors = {}
+    for item in filter(None, spec.split(",")):
+        code, _, probability = item.partition("=")
+        errors[int(code)] = float(probability)
+    return errors
+
+async def serve(args):
+    api = FakeTelegramAPI(latency=args.latency, errors=parse_errors(args.errors),
+                          rate_limit=not args.no_rate_limit, global_rate=args.global_rate,
+                          chat_rate=args.chat_rate, group_rate_per_minute=args.group_rate,
+                          seed=args.seed)
+    url = await api.start(args.host, args.port)
+    print(f"🤖 Fake Telegram Bot API: {url} (TELEGRAM_API_URL={url})")
+    try:
+        await asyncio.Future()
+    finally:
+        await api.stop()
+
+def main():
+    parser = argparse.ArgumentParser(description="Локальная заглушка Telegram Bot API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", default="0", help="задержка, мс: 40, uniform:20,80, lognormal:40,0.6")
+    parser.add_argument("--errors", default="", help="вероятности ошибок: 429=0.01,500=0.005,403=0.001")
+    parser.add_argument("--no-rate-limit", action="store_true", help="без ограничений частоты")
+    parser.add_argument("--global-rate", type=float, default=30, help="сообщений/с всего")
+    parser.add_argument("--chat-rate", type=float, default=1, help="сообщений/с в личный чат")
+    parser.add_argument("--group-rate", type=float, default=20, help="сообщений/мин в группу")
+    parser.add_argument("--seed", type=int, help="seed для воспроизводимости")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    try:
+        asyncio.run(serve(args))
+    except KeyboardInterrupt:
+        pass
+
+if __name__ == "__main__":
+    main()
@@ -3,15 +3,34 @@
 """
 
 import pytest
+import pytest_asyncio
 import asyncio
+import sys
+import time
+from pathlib import Path
 from unittest.mock import Mock, AsyncMock
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from config.settings import Settings
 from utils.database import DatabaseManager
 from utils.alert_manager import AlertManager
+from utils.alert_queue import DurableAlertQueue, QueueFullError
+from utils.alert_stats import AlertStats
+from utils.compaction import CompactionJob
+from utils.health_checker import HealthChecker
+from utils.health_state import HealthStateMachine
+from utils.delivery import Delivery, DeliveryEngine
+from utils.ids import AlertIdGenerator, id_timestamp
+from utils.latency import LatencyHistogram, LatencyTracker
+from utils import metrics
+from utils.rate_limiter import RateLimiter
+from utils.rendering import AlertRenderer
+from utils.retry_scheduler import RetryScheduler
 from config.alert_templates import AlertTemplates
 
+sys.path.append(str(Path(__file__).parent.parent / "scripts"))
+from fake_telegram_api import FakeTelegramAPI
+
 class TestAlertTemplates:
     """Тесты для шаблонов алертов"""
     
@@ -33,6 +52,31 @@ class TestAlertTemplates:
         assert "Test error message" in formatted
         assert "🚨" in formatted  # Эмодзи для critical
     
+    def test_alert_renderer(self):
+        """Тест кэша форматирования: экранирование и один рендер на алерт"""
+        alert_data = {
+            "type": "error",
+            "priority": "error",
+            "module": "api-gateway",
+            "message": "users_1 failed: *timeout* [retry]",
+            "timestamp": "2024-01-01T12:03:04",
+            "data": {"status_code": "`504`"}
+        }
+        renderer = AlertRenderer(cache_size=1)
+        
+        rendered = renderer.render("a1", alert_data)
+        
+        assert "users\\_1 failed: \\*timeout\\* \\[retry]" in rendered.text
+        assert "• status\\_code: `'504'`" in rendered.text
+        assert "`12:03:04`" in rendered.text
+        assert renderer.render("a1", alert_data) is rendered
+        assert renderer.keyboard("a1") is rendered.reply_markup
+        assert rendered.reply_markup.inline_keyboard[0][0].callback_data == "confirm_a1"
+        
+        renderer.render("a2", alert_data)
+        assert renderer.render("a1", alert_data) is not rendered
+        assert renderer.stats == {'hits': 1, 'misses': 3}
+    
     def test_format_system_status(self):
         """Тест форматирования статуса системы"""
         status_data = {
@@ -49,14 +93,41 @@ class TestAlertTemplates:
         assert "3/3" in formatted
         assert "50%" in formatted
         assert "25%" in formatted
+    
+    def test_format_digest_split(self):
+        """Тест дайджеста: экранирование Markdown и деление по 4096 символов"""
+        digest = {
+            "interval": 15,
+            "total": 400,
+            "modules": [
+                {"module": f"module-{i}", "count": 10, "priorities": {"info": 10},
+                 "top": [(f"disk_{i} " + "x" * 300, 7), ("ok", 1)], "other_messages": 2}
+                for i in range(40)
+            ]
+        }
+        
+        parts = AlertTemplates.format_digest(digest)
+        
+        assert len(parts) > 1
+        assert all(len(part.encode("utf-16-le")) // 2 <= AlertTemplates.MAX_MESSAGE_LENGTH for part in parts)
+        assert parts[0].startswith("📬") and f"(часть 1/{len(parts)})" in parts[0]
+        assert "disk\\_0" in parts[0] and "×7" in parts[0]
+        assert sum(part.count("🔧 `module-") for part in parts) == 40
+        
+        single = {"interval": 15, "total": 1, "modules": [
+            {"module": "api`v2", "count": 1, "priorities": {"info": 1}, "top": [], "other_messages": 0}
+        ]}
+        assert "🔧 `api'v2`" in AlertTemplates.format_digest(single)[0]
 
 class TestDatabaseManager:
     """Тесты для менеджера базы данных"""
     
-    @pytest.fixture
-    def db_manager(self):
+    @pytest_asyncio.fixture
+    async def db_manager(self):
         """Фикстура для менеджера БД"""
-        return DatabaseManager("sqlite:///:memory:")
+        db_manager = DatabaseManager("sqlite:///:memory:")
+        yield db_manager
+        await db_manager.close()
     
     @pytest.mark.asyncio
     async def test_init_database(self, db_manager):
@@ -81,7 +152,99 @@ class TestDatabaseManager:
         
         alert_id = await db_manager.save_alert(alert_data)
         assert alert_id is not None
-        assert "test-module" in alert_id
+        assert len(alert_id) == 26
+        
+        # Алерты одного модуля в пределах секунды не перезаписывают друг друга
+        second_id = await db_manager.save_alert(alert_data)
+        assert second_id > alert_id
+        assert len(await db_manager.get_alerts_between(datetime.now() - timedelta(minutes=1))) == 2
+    
+    def test_alert_ids_monotonic(self):
+        """Тест генератора идентификаторов: монотонность, номер узла, время"""
+        generator = AlertIdGenerator(node_id=7)
+        ids = [generator.new_id() for _ in range(1000)]
+        assert ids == sorted(ids)
+        assert len(set(ids)) == len(ids)
+        assert abs(id_timestamp(ids[0]) - time.time()) < 5
+        assert AlertIdGenerator(node_id=8).new_id() != ids[-1]
+        with pytest.raises(ValueError):
+            AlertIdGenerator(node_id=1024)
+    
+    @pytest.mark.asyncio
+    async def test_connection_pool(self, tmp_path):
+        """Тест пула соединений: WAL, чтение после записи, закрытие"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}", pool_readers=2)
+        await db_manager.init_database()
+        
+        async with db_manager.pool.writer() as db:
+            cursor = await db.execute("PRAGMA journal_mode")
+            assert (await cursor.fetchone())[0] == "wal"
+        
+        await db_manager.save_alert({"type": "test", "module": "pool", "message": "Pooled"})
+        history = await db_manager.get_alert_history(10)
+        assert len(history) == 1
+        
+        await db_manager.close()
+        assert not db_manager.pool.is_open
+    
+    @pytest.mark.asyncio
+    async def test_group_commit(self, tmp_path):
+        """Тест групповой записи: одна транзакция на пачку и запись при остановке"""
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}", batch_interval_ms=50)
+        await db_manager.init_database()
+        
+        async with db_manager.pool.writer() as db:
+            await db.execute("INSERT INTO module_settings (module_name) VALUES ('batch')")
+            await db.commit()
+        
+        await asyncio.gather(*[
+            db_manager.batcher.execute(
+                "INSERT INTO alerts (alert_id, type, priority, module, message) VALUES (?, ?, ?, ?, ?)",
+                (f"batch_{i}", "test", "info", "batch", "Batched")
+            )
+            for i in range(50)
+        ])
+        assert db_manager.batcher.stats['batches'] == 1
+        assert db_manager.batcher.stats['operations'] == 50
+        
+        await db_manager.update_alert_cooldown("batch")
+        await db_manager.close()
+        
+        db_manager = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db_manager.init_database()
+        assert not await db_manager.get_alert_cooldown("batch", "test")
+        await db_manager.close()
+
+    @pytest.mark.asyncio
+    async def test_subscription_routing(self, db_manager):
+        """Тест маршрутизации подписок без ложных совпадений подстрок"""
+        await db_manager.init_database()
+        
+        await db_manager.add_subscription("1", alert_types=["error"])
+        await db_manager.add_subscription("2", alert_types=["error_rate"], priority_levels=["critical"])
+        await db_manager.add_subscription("3")
+        
+        assert await db_manager.get_subscribed_chats("error", "api", "info") == ["1", "3"]
+        assert await db_manager.get_subscribed_chats("error_rate", "api", "info") == ["3"]
+        assert await db_manager.get_subscribed_chats("error_rate", "api", "critical") == ["2", "3"]
+        
+        await db_manager.remove_subscriptions("3")
+        assert await db_manager.get_subscribed_chats("error", "api", "info") == ["1"]
+    
+    @pytest.mark.asyncio
+    async def test_subscription_migration(self, db_manager):
+        """Тест переноса строковых фильтров подписок в таблицы связей"""
+        await db_manager.init_database()
+        
+        async with db_manager.pool.writer() as db:
+            await db.execute(
+                "INSERT INTO alert_subscriptions (chat_id, modules) VALUES ('legacy', 'bot,api')"
+            )
+            await db.commit()
+        
+        await db_manager.init_database()
+        assert await db_manager.get_subscribed_chats("info", "api") == ["legacy"]
+        assert await db_manager.get_subscribed_chats("info", "web") == []
 
 class TestAlertManager:
     """Тесты для менеджера алертов"""
@@ -101,6 +264,7 @@ class TestAlertManager:
         db.get_alert_cooldown = AsyncMock(return_value=True)
         db.update_alert_cooldown = AsyncMock()
         db.get_subscribed_chats = AsyncMock(return_value=["123456789"])
+        db.get_alert_routes = AsyncMock(return_value=[("123456789", 0)])
         db.mark_alert_sent = AsyncMock()
         return db
     
@@ -123,9 +287,230 @@ class TestAlertManager:
         
         await alert_manager.process_alert(alert_data)
         
-        # Проверяем, что алерт был сохранен
+        # Проверяем, что алерт был сохранен, а cooldown проверен без обращения к БД
         alert_manager.db.save_alert.assert_called_once()
-        alert_manager.db.update_alert_cooldown.assert_called_once()
+        alert_manager.db.get_alert_cooldown.assert_not_called()
+        assert alert_manager.rate_limiter.is_cooling_down("test-module", "test")
+    
+    @pytest.mark.asyncio
+    async def test_process_alerts_batch(self, mock_bot, tmp_path):
+        """Тест пакетной обработки: одна транзакция и статус по каждому алерту"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(mock_bot, db, queue_max_pending=3)
+        
+        alerts = [
+            {"type": "test", "module": "module-a", "message": "a"},
+            {"type": "test", "module": "module-a", "message": "a"},
+            {"message": "no type"},
+            "not an object",
+            {"type": "test", "module": "module-b", "message": "b"},
+            {"type": "test", "module": "module-c", "message": "c"},
+            {"type": "test", "module": "module-d", "message": "d"},
+        ]
+        results = await manager.process_alerts_batch(alerts)
+        
+        statuses = [result['status'] for result in results]
+        assert statuses == ["queued", "duplicate", "invalid", "invalid",
+                            "queued", "queued", "queue_full"]
+        assert len({result['alert_id'] for result in results if 'alert_id' in result}) == 3
+        assert await db.count_unprocessed_alerts() == 3
+        assert db.batcher.stats['batches'] == 1
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_accept_alert_fast_ack(self, mock_bot, tmp_path):
+        """Тест быстрого приема: идентификатор сразу, запись в БД в фоне, статус по id"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(mock_bot, db)
+        
+        result = manager.accept_alert({"type": "test", "module": "test-module", "message": "m"})
+        alert_id = result['alert_id']
+        assert result['status'] == "accepted"
+        assert len(alert_id) == 26
+        assert (await manager.get_alert_status(alert_id))['status'] == "accepted"
+        assert manager.accept_alert({"message": "no type"})['status'] == "invalid"
+        
+        await manager.stop()
+        assert (await manager.get_alert_status(alert_id))['status'] == "queued"
+        
+        await manager.alert_queue.ack(alert_id)
+        assert (await manager.get_alert_status(alert_id))['status'] == "processed"
+        assert await manager.get_alert_status("missing") is None
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_send_failure_requeues_then_releases(self, mock_bot, tmp_path):
+        """Тест: ошибка постановки в доставку возвращает алерт в очередь, затем снимает его"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        await db.add_subscription("100")
+        manager = AlertManager(mock_bot, db)
+        manager.renderer.render = Mock(side_effect=RuntimeError("render"))
+        
+        alert_id = await manager.process_alert({"type": "test", "module": "m", "message": "boom"})
+        for _ in range(AlertManager.MAX_SEND_ATTEMPTS):
+            item = await manager.alert_queue.get()
+            assert item['alert_id'] == alert_id
+            await manager._send_alert(item['alert_id'], item['alert_data'])
+        await asyncio.gather(*manager._ack_tasks)
+        
+        assert manager.alert_queue.qsize() == 0 and manager.alert_queue.lane_pending['info'] == 0
+        assert not manager._send_failures
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_fast_ack_admission_during_flush(self, mock_bot, tmp_path):
+        """Тест: пачка в процессе записи занимает места - принятые алерты не отклоняются"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(mock_bot, db, alert_cooldown=0, queue_max_pending=3, queue_shed_at={})
+        
+        gate = asyncio.Event()
+        save_alerts = db.save_alerts
+        async def slow_save(*args, **kwargs):
+            await gate.wait()
+            return await save_alerts(*args, **kwargs)
+        db.save_alerts = slow_save
+        
+        def alert(number):
+            return {"type": "test", "module": "test-module", "message": ("disk", "cpu", "memory", "network")[number]}
+        
+        ids = [manager.accept_alert(alert(i))['alert_id'] for i in range(2)]
+        await asyncio.sleep(0.01)  # пачка из двух алертов ждет записи
+        ids.append(manager.accept_alert(alert(2))['alert_id'])
+        with pytest.raises(QueueFullError):
+            manager.accept_alert(alert(3))
+        
+        gate.set()
+        await manager.stop()
+        assert not manager._ingest_failed
+        assert [(await manager.get_alert_status(i))['status'] for i in ids] == ["queued"] * 3
+        assert manager.alert_queue.qsize() == 3
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_repeats_aggregated(self, mock_bot, tmp_path):
+        """Тест агрегации: повторы с другими числами и адресами - одна сводка со счетчиком"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(mock_bot, db, alert_cooldown=0, dedup_window=300)
+        
+        def alert(value, host):
+            return {"type": "warning", "module": "disk", "message": f"Диск {value}% на {host}"}
+        
+        first_id = await manager.process_alert(alert(91, "10.0.0.1"))
+        assert first_id
+        assert await manager.process_alert(alert(92, "10.0.0.2")) is None
+        assert manager.accept_alert(alert(93, "10.0.0.3"))['status'] == "aggregated"
+        assert (await manager.process_alerts_batch([alert(94, "10.0.0.4")]))[0]['status'] == "aggregated"
+        assert await manager.process_alert({"type": "warning", "module": "disk", "message": "Нет места"})
+        
+        # Окно истекло: одна сводка вместо трех повторов
+        assert await manager.dedup.flush(now=time.time() + 301) == 1
+        await manager.alert_queue.get()  # первый алерт
+        await manager.alert_queue.get()  # другой шаблон сообщения
+        summary = (await manager.alert_queue.get())['alert_data']
+        assert "×3 за последние 5 мин" in summary['message']
+        assert summary['data']['occurrences'] == 4
+        assert manager.dedup.get(alert(95, "10.0.0.5")).alert_id != first_id
+        
+        # Эскалация приоритета - не повтор: доставляется сразу
+        assert await manager.process_alert({**alert(99, "10.0.0.9"), "priority": "critical"})
+        
+        # Окно без повторов закрывается - следующий алерт снова доставляется
+        assert await manager.dedup.flush(now=time.time() + 602) == 0
+        assert await manager.process_alert(alert(96, "10.0.0.6"))
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_repeats_edit_in_place(self, tmp_path):
+        """Тест правки сообщения: повторы объединяются в одну правку за интервал"""
+        bot = Mock()
+        bot.send_message = AsyncMock(return_value=Mock(message_id=42))
+        bot.edit_message_text = AsyncMock()
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        await db.add_subscription("100")
+        manager = AlertManager(bot, db, alert_cooldown=0, chat_rate=100,
+                               edit_in_place=True, edit_interval=0.2)
+        await manager.delivery.start()
+        
+        alert = {"type": "warning", "module": "disk", "message": "Диск 91%"}
+        alert_id = await manager.process_alert(dict(alert))
+        await manager._send_alert(alert_id, (await manager.alert_queue.get())['alert_data'])
+        await manager.delivery.join()
+        
+        for value in (92, 93, 94):
+            assert await manager.process_alert(dict(alert, message=f"Диск {value}%")) is None
+        await manager.delivery.join()
+        assert bot.edit_message_text.await_count == 1  # первая правка сразу, остальные ждут
+        
+        await asyncio.sleep(0.3)
+        await manager.delivery.join()
+        assert bot.edit_message_text.await_count == 2
+        edit = bot.edit_message_text.await_args.kwargs
+        assert edit['message_id'] == 42 and "Диск 94%" in edit['text'] and "×4" in edit['text']
+        assert bot.send_message.await_count == 1
+        
+        await manager.delivery.stop()
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_digest_subscription(self, mock_bot, tmp_path):
+        """Тест дайджеста: info копится по подписке, error уходит сразу, буфер переживает перезапуск"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        await db.add_subscription("1")
+        await db.add_subscription("2", digest_priorities=["info"], digest_interval=15)
+        assert await db.get_alert_routes("test", "api", "info") == [("1", 0), ("2", 15)]
+        assert await db.get_alert_routes("test", "api", "error") == [("1", 0), ("2", 0)]
+        
+        manager = AlertManager(mock_bot, db)
+        manager.delivery.submit = Mock()
+        for number in range(3):
+            alert = {"type": "test", "priority": "info", "module": "api", "message": f"slow {number}"}
+            await manager._send_alert(f"info-{number}", alert)
+        await manager._send_alert("error-1", {"type": "test", "priority": "error", "module": "api",
+                                               "message": "down"})
+        chats = [call.args[0].chat_id for call in manager.delivery.submit.call_args_list]
+        assert chats == ["1", "1", "1", "1", "2"]
+        await db.batcher.flush()
+        
+        # Перезапуск: неотправленный дайджест восстанавливается из БД
+        restarted = AlertManager(mock_bot, db)
+        restarted.delivery.submit = Mock()
+        await restarted.digests.load()
+        assert restarted.digests.pending() == 3
+        assert await restarted.digests.flush(now=time.time() + 60) == 0
+        assert await restarted.digests.flush(now=time.time() + 15 * 60) == 1
+        
+        delivery = restarted.delivery.submit.call_args.args[0]
+        assert delivery.chat_id == "2" and delivery.reply_markup is None
+        assert "**3**" in delivery.text and "slow 2 ×3" in delivery.text
+        await db.batcher.flush()
+        assert await db.get_digest_items() == []
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_get_alert_cached(self, mock_bot, tmp_path):
+        """Тест поиска алерта: LRU-кэш отправленных, затем индекс в БД"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(mock_bot, db, alert_cache_size=1)
+        
+        alert_data = {"type": "test", "module": "test-module", "message": "m", "data": {"k": 1}}
+        first_id = await db.save_alert(alert_data)
+        second_id = await db.save_alert(alert_data)
+        await manager._send_alert(second_id, alert_data)
+        assert second_id in manager.recent_alerts
+        
+        alert = await manager.get_alert(first_id)
+        assert alert['data'] == {"k": 1}
+        assert list(manager.recent_alerts) == [first_id]
+        assert await manager.get_alert("missing") is None
+        await db.close()
     
     def test_validate_alert_data(self, alert_manager):
         """Тест валидации данных алерта"""
@@ -157,6 +542,577 @@ class TestAlertManager:
         
         # Второй алерт тоже должен пройти (лимит 100 в час)
         assert not alert_manager._is_rate_limited(module, alert_type)
+    
+    def test_rate_limit_rules(self):
+        """Тест GCRA: всплеск до лимита, правила по приоритету и вытеснение ключей"""
+        limiter = RateLimiter(
+            max_per_hour=3,
+            cooldown=0,
+            rules={"priority=critical": {"per_hour": 0}},
+            max_keys=2
+        )
+        
+        for _ in range(3):
+            assert not limiter.is_rate_limited("module", "error")
+            limiter.record("module", "error")
+        assert limiter.is_rate_limited("module", "error")
+        
+        # Для critical лимит отключен правилом
+        assert not limiter.is_rate_limited("module", "error", "critical")
+        
+        limiter.record("module-2", "error")
+        limiter.record("module-3", "error")
+        assert len(limiter.states) == 2
+        assert ("module", "error") not in limiter.states
+
+class TestAlertStats:
+    """Тесты для инкрементальной статистики"""
+    
+    @pytest.mark.asyncio
+    async def test_windows_and_rollup(self, tmp_path):
+        """Тест: скользящие окна, сохранение поминутных корзин и загрузка после рестарта"""
+        db_url = f"sqlite:///{tmp_path / 'alerts.db'}"
+        db = DatabaseManager(db_url)
+        await db.init_database()
+        
+        now = time.time()
+        stats = AlertStats()
+        stats.record("error", "module-a", "critical", now=now - 2 * 3600)
+        stats.record("info", "module-b", "info", now=now)
+        stats.record("info", "module-b", "info", now=now)
+        
+        summary = stats.summary()
+        assert summary['total_alerts'] == 3
+        assert summary['recent_alerts'] == 2
+        assert summary['windows']['24h'] == 3
+        assert summary['by_module'] == {"module-b": 2, "module-a": 1}
+        assert stats.summary('1h')['by_type'] == {"info": 2}
+        
+        await stats.stop(db)
+        await db.close()
+        
+        db = DatabaseManager(db_url)
+        await db.init_database()
+        restored = AlertStats()
+        await restored.load(db)
+        assert restored.summary() == summary
+        await db.close()
+
+class TestCompactionJob:
+    """Тесты для очистки истории"""
+    
+    @pytest.mark.asyncio
+    async def test_retention_and_rollups(self, tmp_path):
+        """Тест: старые алерты сворачиваются в агрегаты порциями, свежие остаются"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        
+        old = (datetime.now() - timedelta(days=40)).isoformat()
+        for i in range(5):
+            alert_id = await db.save_alert({"type": "error", "module": "m", "message": str(i),
+                                            "priority": "critical", "timestamp": old})
+            await db.mark_alert_processed(alert_id)
+        fresh_id = await db.save_alert({"type": "error", "module": "m", "message": "fresh"})
+        await db.mark_alert_processed(fresh_id)
+        
+        archived = []
+        async def archiver(rows):
+            archived.extend(rows)
+        
+        job = CompactionJob(db, retention_days=30, chunk_size=2, chunk_pause=0, archiver=archiver)
+        stats = await job.run_once()
+        
+        assert stats['alerts_compacted'] == 5
+        assert len(archived) == 5
+        assert not stats['running']
+        assert await db.get_alert(fresh_id) is not None
+        assert len(await db.get_alert_history(100)) == 1
+        
+        async with db.pool.reader() as conn:
+            cursor = await conn.execute("SELECT day, count FROM alert_rollup_daily")
+            assert [tuple(row) for row in await cursor.fetchall()] == [(old[:10], 5)]
+        await db.close()
+
+    @pytest.mark.asyncio
+    async def test_archive_fall_through(self, tmp_path):
+        """Тест: удаленные по сроку алерты доступны из архива при запросе за период"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}",
+                             archive_dir=str(tmp_path / 'archive'))
+        await db.init_database()
+        
+        old = datetime.now() - timedelta(days=40)
+        for i in range(3):
+            alert_id = await db.save_alert({"type": "error", "module": f"m{i}", "message": str(i),
+                                            "timestamp": (old + timedelta(minutes=i)).isoformat()})
+            await db.mark_alert_processed(alert_id)
+        
+        job = CompactionJob(db, retention_days=30, chunk_size=2, chunk_pause=0,
+                            archiver=db.archive_alerts)
+        await job.run_once()
+        assert await db.get_alert_history(10) == []
+        assert (tmp_path / 'archive' / old.strftime('%Y/%m') / f"alerts-{old:%Y-%m-%d}.ndjson.gz").exists()
+        
+        rows = await db.get_alerts_between(old - timedelta(days=1), limit=2)
+        assert [row['message'] for row in rows] == ["2", "1"]
+        assert db.archive.stats()['alerts'] == 3
+        assert await db.archive.query(old - timedelta(days=1), module="m0") != []
+        
+        # Unix timestamp: свежие строки из БД и архив за тот же период
+        await db.save_alert({"type": "error", "module": "m", "message": "fresh"})
+        rows = await db.get_alerts_between((old - timedelta(days=1)).timestamp())
+        assert [row['message'] for row in rows] == ["fresh", "2", "1", "0"]
+        await db.close()
+
+class TestHealthChecker:
+    """Тесты для проверки здоровья модулей"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_probes_shared_session(self):
+        """Тест: проверки идут параллельно через одну сессию, таймаут не блокирует остальные"""
+        from aiohttp import web
+        
+        async def healthy(request):
+            return web.Response(text="OK")
+        
+        async def slow(request):
+            await asyncio.sleep(1)
+            return web.Response(text="OK")
+        
+        async def missing(request):
+            return web.Response(status=404)
+        
+        app = web.Application()
+        app.router.add_get("/ok", healthy)
+        app.router.add_get("/slow", slow)
+        app.router.add_get("/missing", missing)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        
+        results = []
+        async def on_result(name, status, response_time, details):
+            results.append((name, status))
+        
+        endpoints = {f"ok-{i}": f"http://127.0.0.1:{port}/ok" for i in range(20)}
+        endpoints["slow"] = f"http://127.0.0.1:{port}/slow"
+        endpoints["missing"] = f"http://127.0.0.1:{port}/missing"
+        checker = HealthChecker(endpoints, on_result, timeout=0.3, concurrency=10)
+        
+        started = time.monotonic()
+        checked = await checker.check_all()
+        session = checker._session
+        await checker.check_all()
+        
+        assert time.monotonic() - started < 2
+        assert checker._session is session
+        assert checked["ok-0"][0] == "online"
+        assert checked["slow"][0] == "timeout"
+        assert checked["missing"] == ("error", checked["missing"][1], "HTTP 404")
+        assert len(results) == 44
+        
+        await checker.stop()
+        await runner.cleanup()
+
+    def test_health_state_machine(self):
+        """Тест: N из M для смены состояния и подавление уведомлений при флаппинге"""
+        machine = HealthStateMachine(window=5, degraded_after=2, down_after=3,
+                                     recover_after=2, flap_threshold=3)
+        
+        first = machine.observe("m", "online")
+        assert (first.new_state, first.notify) == ("online", False)
+        assert machine.observe("m", "online") is None
+        assert machine.observe("m", "timeout") is None
+        
+        degraded = machine.observe("m", "timeout")
+        assert (degraded.old_state, degraded.new_state, degraded.notify) == ("online", "degraded", True)
+        down = machine.observe("m", "error")
+        assert (down.new_state, down.notify) == ("down", True)
+        
+        # Восстановление требует нескольких успешных проверок подряд
+        assert machine.observe("m", "online") is None
+        recovered = machine.observe("m", "online")
+        assert recovered.new_state == "online" and recovered.flapping
+        assert machine.observe("m", "timeout") is None
+        flapping = machine.observe("m", "timeout")
+        assert flapping.new_state == "degraded" and not flapping.notify
+    
+    @pytest.mark.asyncio
+    async def test_health_transitions_write_and_alert(self, tmp_path):
+        """Тест: запись в БД и системный алерт только при смене состояния"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(Mock(), db, health_down_after=2, health_degraded_after=2)
+        manager.send_system_alert = AsyncMock()
+        
+        for status in ("online", "online", "error", "error", "error"):
+            await manager._on_health_result("m", status, 0.01, None)
+        await db.batcher.flush()
+        
+        assert manager.send_system_alert.await_count == 1
+        assert manager.send_system_alert.await_args.kwargs['priority'] == "critical"
+        status_data = await db.get_module_status()
+        assert status_data['modules']['m']['status'] == "down"
+        assert (await manager.get_module_status())['modules']['m']['status'] == "down"
+        await db.close()
+
+    @pytest.mark.asyncio
+    async def test_health_transitions_bypass_cooldown(self, tmp_path):
+        """Тест: переходы degraded → down подряд не отбрасываются cooldown'ом"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(Mock(), db, health_degraded_after=2, health_down_after=3)
+        
+        for status in ("online", "online", "timeout", "timeout", "error"):
+            await manager._on_health_result("m", status, 0.01, None)
+        
+        assert manager.rate_limiter.stats['cooldown'] == 0
+        assert manager.alert_queue.lane_pending['warning'] == 1
+        assert manager.alert_queue.lane_pending['critical'] == 1
+        await db.close()
+
+class TestLatency:
+    """Тесты для гистограмм времени ответа"""
+    
+    @pytest.mark.asyncio
+    async def test_percentiles_and_persistence(self, tmp_path):
+        """Тест: перцентили с погрешностью корзины, упаковка и загрузка из БД"""
+        histogram = LatencyHistogram()
+        for ms in range(1, 1001):
+            histogram.record(ms / 1000)
+        
+        assert histogram.total == 1000
+        for percent in (50, 95, 99):
+            assert abs(histogram.percentile(percent) - percent * 10) <= percent * 10 * 0.07
+        assert histogram.percentile(100) == 1000
+        restored = LatencyHistogram.from_bytes(histogram.to_bytes())
+        assert restored.counts == histogram.counts and restored.max_value == histogram.max_value
+        assert len(histogram.to_bytes()) < 1000
+        
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        tracker = LatencyTracker()
+        for ms in (10, 20, 30):
+            tracker.record("m", ms / 1000)
+        await tracker.flush(db)
+        await db.batcher.flush()
+        
+        loaded = LatencyTracker()
+        await loaded.load(db)
+        assert loaded.summary("m")['count'] == 3
+        assert loaded.summary("m")['max'] == 30
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_slo_breach_alert(self):
+        """Тест: алерт при превышении SLO по p95 и при возврате в норму"""
+        manager = AlertManager(Mock(), Mock(), latency_slo={"m": 100}, latency_slo_min_samples=3)
+        manager.send_system_alert = AsyncMock()
+        manager.db.update_module_status = AsyncMock()
+        
+        for _ in range(3):
+            await manager._on_health_result("m", "online", 0.5, None)
+        
+        assert manager.send_system_alert.await_count == 1
+        call = manager.send_system_alert.await_args
+        assert call.args[0] == "performance" and call.kwargs['data']['threshold'] == 100
+        assert "m" in manager.slo_breached
+        text = manager._format_alert({"type": "performance", "module": "m", "data": call.kwargs['data']})
+        assert "ПРОИЗВОДИТЕЛЬНОСТЬ" in text
+        
+        manager.latency = LatencyTracker()
+        for _ in range(3):
+            await manager._on_health_result("m", "online", 0.01, None)
+        assert manager.send_system_alert.await_count == 2
+        assert "m" not in manager.slo_breached
+    
+    @pytest.mark.asyncio
+    async def test_slo_timeouts_and_recovery(self, tmp_path):
+        """Тест: таймауты входят в p95, алерт о возврате в SLO не отбрасывается cooldown'ом"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(Mock(), db, latency_slo={"m": 100}, latency_slo_min_samples=3,
+                               health_check_timeout=2)
+        
+        for _ in range(3):
+            await manager._on_health_result("m", "timeout", None, "Timeout")
+        assert manager.slo_breached["m"] >= 1000
+        
+        manager.latency = LatencyTracker()
+        for _ in range(3):
+            await manager._on_health_result("m", "online", 0.01, None)
+        
+        assert "m" not in manager.slo_breached
+        performance = [item['alert_data']['priority'] for lane in manager.alert_queue._buffers.values()
+                       for item in lane if item['alert_data']['type'] == "performance"]
+        assert sorted(performance) == ["info", "warning"]
+        await db.close()
+
+class TestMetrics:
+    """Тесты для метрик Prometheus"""
+    
+    @pytest.mark.asyncio
+    async def test_database_and_pipeline_metrics(self):
+        """Тест: время операций БД по методам, глубина очередей и отклонения в /metrics"""
+        from prometheus_client import REGISTRY
+        
+        def db_count(method):
+            return REGISTRY.get_sample_value(
+                'tebium_db_operation_duration_seconds_count', {'method': method}) or 0
+        
+        db = metrics.instrument_database(DatabaseManager("sqlite:///:memory:"))
+        before = db_count('save_alert')
+        await db.init_database()
+        manager = AlertManager(Mock(), db, alert_cooldown=60)
+        metrics.register_pipeline_collector(manager)
+        
+        alert = {"type": "error", "message": "m", "module": "metrics-test"}
+        assert await manager.process_alert(dict(alert))
+        assert await manager.process_alert(dict(alert, message="other")) is None  # cooldown
+        
+        assert db_count('save_alert') == before + 1
+        assert REGISTRY.get_sample_value('tebium_queue_depth', {'queue': 'alerts_pending'}) == 1
+        body, content_type = metrics.render_latest()
+        assert b'tebium_alerts_rejected_total{reason="cooldown"}' in body
+        assert content_type.startswith("text/plain")
+        await db.close()
+    
+    @pytest.mark.asyncio
+    async def test_pipeline_collector_queue_depths(self, tmp_path):
+        """Тест: alerts_memory - буферы в памяти, alerts_pending - все необработанные"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        manager = AlertManager(Mock(), db, queue_memory_size=2, queue_shed_at={})
+        for i in range(5):
+            await manager.alert_queue.put({"type": "test", "module": "m", "message": str(i)})
+        
+        queue = next(iter(metrics.AlertPipelineCollector(manager).collect()))
+        depths = {sample.labels['queue']: sample.value for sample in queue.samples}
+        assert depths['alerts_pending'] == 5
+        assert depths['alerts_memory'] == 2
+        await db.close()
+
+class TestFakeTelegramAPI:
+    """Тесты для заглушки Telegram Bot API"""
+    
+    @pytest.mark.asyncio
+    async def test_bot_methods_and_rate_limit(self):
+        """Тест: aiogram через TELEGRAM_API_URL - отправка, правка, обновления и 429"""
+        from aiogram import Bot
+        from aiogram.client.session.aiohttp import AiohttpSession
+        from aiogram.client.telegram import TelegramAPIServer
+        from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+        
+        api = FakeTelegramAPI(rate_limit=True, chat_rate=1, chat_burst=1)
+        url = await api.start()
+        bot = Bot("123456:TEST", session=AiohttpSession(api=TelegramAPIServer.from_base(url)))
+        try:
+            message = await bot.send_message(42, "первое")
+            assert message.message_id == 1 and message.chat.id == 42
+            
+            with pytest.raises(TelegramRetryAfter) as error:
+                await bot.send_message(42, "второе")
+            assert error.value.retry_after >= 1
+            await bot.send_message(43, "другой чат")
+            
+            api.rate_limit = False
+            edited = await bot.edit_message_text("исправлено", chat_id=42, message_id=1)
+            assert edited.text == "исправлено"
+            with pytest.raises(TelegramBadRequest):
+                await bot.edit_message_text("исправлено", chat_id=42, message_id=1)
+            
+            api.callback_update(42, "details_1", message_id=1)
+            updates = await bot.get_updates(timeout=1)
+            assert updates[0].callback_query.data == "details_1"
+            assert await bot.answer_callback_query(updates[0].callback_query.id)
+            assert await bot.get_updates(offset=updates[0].update_id + 1) == []
+            
+            assert await bot.set_webhook("http://127.0.0.1:1/hook")
+            assert api.webhook_url == "http://127.0.0.1:1/hook"
+        finally:
+            await bot.session.close()
+            await api.stop()
+        
+        assert api.stats['rate_limited'] == 1
+        assert api.stats['errors'][429] == 1
+
+class TestDeliveryEngine:
+    """Тесты для движка доставки"""
+    
+    @pytest.mark.asyncio
+    async def test_per_chat_order_and_concurrency(self):
+        """Тест: сообщения одного чата идут по порядку, разные чаты - параллельно"""
+        received = {}
+        in_flight = 0
+        max_in_flight = 0
+        
+        async def sender(delivery):
+            nonlocal in_flight, max_in_flight
+            in_flight += 1
+            max_in_flight = max(max_in_flight, in_flight)
+            await asyncio.sleep(0.01)
+            received.setdefault(delivery.chat_id, []).append(delivery.text)
+            in_flight -= 1
+        
+        engine = DeliveryEngine(sender, workers=4, global_rate=1000, chat_rate=1000)
+        await engine.start()
+        
+        for i in range(5):
+            for chat_id in ("1", "2", "3", "4"):
+                engine.submit(Delivery(f"alert_{i}", chat_id, str(i)))
+        
+        await engine.stop()
+        
+        assert all(texts == ["0", "1", "2", "3", "4"] for texts in received.values())
+        assert len(received) == 4
+        assert max_in_flight > 1
+        assert engine.get_stats()['sent'] == 20
+    
+    def test_idle_bucket_eviction_lru(self):
+        """Тест: вытесняются лимиты давно не использованных чатов, а не созданных первыми"""
+        engine = DeliveryEngine(AsyncMock(), max_idle_chats=2)
+        busy = engine._chat_limits("1")
+        engine._chat_limits("2")
+        assert engine._chat_limits("1") is busy
+        engine._chat_limits("3")
+        
+        assert list(engine.chat_buckets) == ["1", "3"]
+    
+    @pytest.mark.asyncio
+    async def test_critical_overtakes_chat_backlog(self):
+        """Тест: critical не ждет накопленные в чате info, порядок внутри полосы сохраняется"""
+        sent = []
+        
+        async def sender(delivery):
+            sent.append(delivery.text)
+        
+        engine = DeliveryEngine(sender, workers=2, global_rate=1000, chat_rate=1000)
+        await engine.start()
+        
+        for i in range(40):
+            engine.submit(Delivery(f"info_{i}", "1", f"info {i}"))
+        engine.submit(Delivery("critical_1", "1", "critical", lane="critical"))
+        await engine.stop()
+        
+        assert sent.index("critical") <= 1
+        assert [text for text in sent if text != "critical"] == [f"info {i}" for i in range(40)]
+
+class TestRetryScheduler:
+    """Тесты для планировщика повторных отправок"""
+    
+    @pytest.mark.asyncio
+    async def test_retry_then_dead_letter(self):
+        """Тест: повтор с сохранением в БД, затем перенос в dead letters"""
+        db = DatabaseManager("sqlite:///:memory:")
+        await db.init_database()
+        
+        resubmitted = []
+        scheduler = RetryScheduler(db, resubmitted.append, max_retries=1, base_delay=0.01)
+        await scheduler.start()
+        
+        delivery = Delivery("alert_1", "123", "Text")
+        await scheduler.handle_failure(delivery, RuntimeError("network"))
+        assert len(await db.get_pending_retries()) == 1
+        
+        await asyncio.sleep(0.05)
+        assert len(resubmitted) == 1
+        assert resubmitted[0].payload['attempts'] == 1
+        
+        await scheduler.handle_failure(resubmitted[0], RuntimeError("network"))
+        await db.batcher.flush()
+        
+        dead_letters = await db.get_dead_letters()
+        assert len(dead_letters) == 1
+        assert dead_letters[0]['attempts'] == 2
+        assert await db.get_pending_retries() == []
+        
+        await scheduler.stop()
+        await db.close()
+
+class TestDurableAlertQueue:
+    """Тесты для надежной очереди алертов"""
+    
+    @pytest.mark.asyncio
+    async def test_spill_backpressure_and_recovery(self, tmp_path):
+        """Тест: ограниченный буфер, отказ при переполнении, восстановление после рестарта"""
+        db_url = f"sqlite:///{tmp_path / 'alerts.db'}"
+        db = DatabaseManager(db_url)
+        await db.init_database()
+        
+        queue = DurableAlertQueue(db, memory_size=2, max_pending=5, shed_at={})
+        for i in range(5):
+            await queue.put({"type": "test", "module": f"module-{i}", "message": str(i)})
+        
+        assert len(queue._buffers['info']) == 2
+        with pytest.raises(QueueFullError):
+            await queue.put({"type": "test", "module": "overflow", "message": "x"})
+        
+        # Порядок сохраняется при подгрузке из БД
+        messages = []
+        for _ in range(3):
+            item = await queue.get()
+            messages.append(item['alert_data']['message'])
+            await queue.ack(item['alert_id'])
+        assert messages == ["0", "1", "2"]
+        await db.close()
+        
+        # После перезапуска в очередь возвращаются только необработанные алерты
+        db = DatabaseManager(db_url)
+        await db.init_database()
+        queue = DurableAlertQueue(db, memory_size=2)
+        await queue.put({"type": "test", "module": "early", "message": "5"})  # до recover
+        await queue.recover()
+        assert queue.qsize() == 3 and queue.lane_pending['info'] == 3
+        
+        # Возвращенный без подтверждения алерт подгружается из БД снова
+        item = await queue.get()
+        queue.release(item['alert_id'])
+        messages = sorted([(await queue.get())['alert_data']['message'] for _ in range(3)])
+        assert messages == ["3", "4", "5"]
+        assert queue.qsize() == 3
+        await db.close()
+
+    @pytest.mark.asyncio
+    async def test_priority_lanes(self, tmp_path):
+        """Тест полос: critical не ждет очередь info, взвешенная выборка, отказ младшим при перегрузке"""
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        
+        queue = DurableAlertQueue(db, memory_size=3, max_pending=40)
+        for i in range(20):
+            await queue.put({"type": "test", "priority": "info", "module": "noise", "message": str(i)})
+        await queue.put({"type": "test", "priority": "critical", "module": "core", "message": "down"})
+        for i in range(4):
+            await queue.put({"type": "test", "priority": "warning", "module": "disk", "message": f"w{i}"})
+        
+        # Полосы info и warning переполнили буфер в памяти и подгружаются из БД
+        order = []
+        for _ in range(9):
+            item = await queue.get()
+            order.append(item['lane'])
+            await queue.ack(item['alert_id'])
+        assert order[0] == "critical"
+        assert order[1:] == ["warning", "warning", "info"] * 2 + ["info", "info"]
+        
+        # Заполнение 80% max_pending: info отклоняется, critical принимается
+        for i in range(16):
+            await queue.put({"type": "test", "priority": "error", "module": "api", "message": str(i)})
+        assert queue.qsize() == 32
+        with pytest.raises(QueueFullError) as error:
+            await queue.put({"type": "test", "priority": "info", "module": "noise", "message": "x"})
+        assert error.value.reason == "shed"
+        await queue.put({"type": "test", "priority": "critical", "module": "core", "message": "down"})
+        await db.close()
+        
+        # После перезапуска счетчики полос восстанавливаются из БД
+        db = DatabaseManager(f"sqlite:///{tmp_path / 'alerts.db'}")
+        await db.init_database()
+        queue = DurableAlertQueue(db, memory_size=3, max_pending=40)
+        await queue.recover()
+        assert queue.lane_pending == {"critical": 1, "error": 16, "warning": 0, "info": 16}
+        assert (await queue.get())['lane'] == "critical"
+        await db.close()
 
 @pytest.mark.asyncio
 async def test_integration():
@@ -186,6 +1142,8 @@ async def test_integration():
     assert len(history) == 1
     assert history[0]["type"] == "test"
     assert history[0]["message"] == "Integration test message"
+    
+    await db.close()
 
 if __name__ == "__main__":
     pytest.main([__file__])
@@ -4,69 +4,432 @@
 
 import asyncio
 import logging
-from typing import Dict, List, Optional, Any
-from datetime import datetime, timedelta
-import aiohttp
+import time
+from collections import Counter, OrderedDict
+from typing import Dict, List, Optional, Any, Tuple
+from datetime import datetime
 import json
 
+from aiogram.exceptions import TelegramBadRequest, TelegramRetryAfter
+
 from config.alert_templates import AlertTemplates
+from .alert_queue import DurableAlertQueue, QueueFullError, lane_of
+from .alert_stats import AlertStats
+from .compaction import CompactionJob
+from .dedup import AlertDeduplicator, DedupEntry
+from .digest import DIGEST_ID_PREFIX, ChatDigest, DigestBuffer
+from .health_checker import HealthChecker
+from .health_state import DEGRADED, DOWN, ONLINE, HealthStateMachine
+from .ids import id_timestamp
+from .latency import LatencyTracker
+from .message_editor import MessageEditor
+from . import metrics
+from .delivery import Delivery, DeliveryEngine
+from .rate_limiter import RateLimiter
+from .rendering import AlertRenderer
+from .retry_scheduler import RetryScheduler
 
 logger = logging.getLogger('TeBiumAlertBot')
 
 class AlertManager:
     """Менеджер для обработки и отправки алертов"""
     
-    def __init__(self, bot, database_manager):
+    MAX_SEND_ATTEMPTS = 3  # Попыток поставить алерт в доставку до снятия с очереди
+    
+    def __init__(self, bot, database_manager, delivery_workers: int = 8,
+                 global_rate: float = 30, chat_rate: float = 1,
+                 group_rate_per_minute: float = 20, max_retries: int = 3,
+                 retry_delay: float = 5, retry_max_delay: float = 300,
+                 queue_memory_size: int = 1000, queue_max_pending: int = 10000,
+                 queue_retry_after: int = 5, queue_lane_weights: Optional[Dict[str, int]] = None,
+                 queue_lane_capacity: Optional[Dict[str, int]] = None,
+                 queue_shed_at: Optional[Dict[str, float]] = None, max_alerts_per_hour: int = 100,
+                 alert_cooldown: float = 60, rate_limit_rules: Optional[Dict] = None,
+                 rate_limit_max_keys: int = 10000, rate_limit_snapshot_interval: float = 30,
+                 alert_cache_size: int = 1000, retention_days: int = 30,
+                 status_retention_days: int = 7, compaction_interval: float = 3600,
+                 compaction_chunk_size: int = 500,
+                 health_endpoints: Optional[Dict[str, str]] = None,
+                 health_check_interval: float = 60, health_check_timeout: float = 10,
+                 health_check_concurrency: int = 50, health_check_jitter: float = 0.1,
+                 health_window: int = 5, health_degraded_after: int = 2,
+                 health_down_after: int = 3, health_recover_after: int = 3,
+                 health_flap_threshold: int = 4, health_flap_interval: float = 900,
+                 latency_slo_p95_ms: float = 1000, latency_slo: Optional[Dict[str, float]] = None,
+                 latency_slo_window: int = 5, latency_slo_min_samples: int = 3,
+                 dedup_window: float = 300, dedup_max_entries: int = 10000,
+                 dedup_data_keys: Optional[List[str]] = None,
+                 edit_in_place: bool = False, edit_interval: float = 10,
+                 digest_interval: int = 15, digest_top_messages: int = 3):
         self.bot = bot
         self.db = database_manager
-        self.alert_queue = asyncio.Queue()
-        self.sent_alerts = {}  # Кэш для предотвращения дублирования
-        self.rate_limits = {}  # Ограничения по частоте отправки
+        self.alert_queue = DurableAlertQueue(
+            self.db,
+            memory_size=queue_memory_size,
+            max_pending=queue_max_pending,
+            retry_after=queue_retry_after,
+            lane_weights=queue_lane_weights,
+            lane_capacity=queue_lane_capacity,
+            shed_at=queue_shed_at
+        )
+        self.outstanding_deliveries: Dict[str, int] = {}  # Неотправленные сообщения по алертам
+        self.dedup = AlertDeduplicator(  # Схлопывание повторов в одно сообщение со счетчиком
+            window=dedup_window,
+            max_entries=dedup_max_entries,
+            data_keys=dedup_data_keys or (),
+            on_summary=self._send_repeat_summary
+        )
+        self.edit_in_place = edit_in_place  # Повторы правят уже отправленное сообщение
+        self.editor = MessageEditor(
+            self._submit_edit,
+            interval=edit_interval,
+            max_alerts=dedup_max_entries
+        )
+        self.digest_interval = digest_interval  # период дайджеста по умолчанию для /subscribe, мин
+        self.digests = DigestBuffer(  # Алерты, которые подписки собирают в дайджест
+            self.db,
+            on_flush=self._send_digest,
+            top_messages=digest_top_messages
+        )
+        self.recent_alerts: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()  # LRU для кнопок алертов
+        self.alert_cache_size = alert_cache_size
+        self.renderer = AlertRenderer(  # Текст и клавиатура алерта - одни на всех получателей
+            cache_size=alert_cache_size,
+            formatter=self._format_alert
+        )
+        self.rate_limiter = RateLimiter(  # Ограничения по частоте отправки и cooldown
+            max_per_hour=max_alerts_per_hour,
+            cooldown=alert_cooldown,
+            rules=rate_limit_rules,
+            max_keys=rate_limit_max_keys
+        )
+        self.rate_limit_snapshot_interval = rate_limit_snapshot_interval
+        self.alert_stats = AlertStats()  # Счетчики для /stats без чтения таблицы alerts
+        self.compaction = CompactionJob(  # Срок хранения истории и сжатие БД
+            self.db,
+            retention_days=retention_days,
+            status_retention_days=status_retention_days,
+            chunk_size=compaction_chunk_size,
+            interval=compaction_interval,
+            archiver=self.db.archive_alerts
+        )
+        self.health_states = HealthStateMachine(  # Переходы online/degraded/down
+            window=health_window,
+            degraded_after=health_degraded_after,
+            down_after=health_down_after,
+            recover_after=health_recover_after,
+            flap_threshold=health_flap_threshold,
+            flap_interval=health_flap_interval
+        )
+        self.latency = LatencyTracker()  # Гистограммы времени ответа модулей
+        self.latency_slo_p95_ms = latency_slo_p95_ms  # SLO по p95, мс (0 - отключено)
+        self.latency_slo = latency_slo or {}  # Переопределения SLO по модулям
+        self.latency_slo_window = latency_slo_window  # минуты
+        self.latency_slo_min_samples = latency_slo_min_samples
+        self.slo_breached: Dict[str, float] = {}  # Модули с нарушенным SLO -> p95
+        self.health_checker = HealthChecker(  # Периодическая проверка модулей
+            health_endpoints or {},
+            self._on_health_result,
+            interval=health_check_interval,
+            timeout=health_check_timeout,
+            concurrency=health_check_concurrency,
+            jitter=health_check_jitter
+        )
+        self.delivery = DeliveryEngine(
+            self._deliver,
+            workers=delivery_workers,
+            global_rate=global_rate,
+            chat_rate=chat_rate,
+            group_rate_per_minute=group_rate_per_minute,
+            on_success=self._on_delivery_success,
+            on_failure=self._on_delivery_failure
+        )
+        self.retry_scheduler = RetryScheduler(
+            self.db,
+            self._resubmit,
+            max_retries=max_retries,
+            base_delay=retry_delay,
+            max_delay=retry_max_delay,
+            pause_chat=self.delivery.pause_chat
+        )
+        
+        # Быстрый прием (fast-ack): алерты, принятые до записи в БД
+        self._ingest_buffer: List[Tuple[str, Dict[str, Any]]] = []
+        self._ingest_unsaved = 0  # Принятые, но еще не поставленные в очередь: буфер и записываемая пачка
+        self._ingest_lanes: Counter = Counter()  # Те же алерты по полосам очереди
+        self._ingest_pending = set()
+        self._ingest_failed: "OrderedDict[str, str]" = OrderedDict()
+        self._ingest_wakeup = asyncio.Event()
+        self._ingest_lock = asyncio.Lock()
+        self._ingest_task: Optional[asyncio.Task] = None
         
-    async def process_alert(self, alert_data: Dict[str, Any]):
+        # Подтверждения в очереди ждут групповой записи - не в воркерах доставки
+        self._ack_tasks = set()
+        self._send_failures: Dict[str, int] = {}  # Неудачные попытки постановки алерта в доставку
+        
+    async def process_alert(self, alert_data: Dict[str, Any]) -> Optional[str]:
         """Обработка входящего алерта"""
         try:
-            # Валидация данных алерта
-            if not self._validate_alert_data(alert_data):
-                logger.warning("⚠️ Некорректные данные алерта")
-                return
+            # Валидация, cooldown и rate limit
+            rejection = self._check_alert(alert_data)
+            if rejection:
+                self._log_rejection(alert_data, rejection)
+                return None
             
-            # Проверка cooldown
-            module = alert_data.get('module', 'unknown')
-            alert_type = alert_data.get('type', 'info')
+            # Проверка места в очереди (и в полосе приоритета) до учета алерта в лимитах
+            self.alert_queue.check_capacity(alert_data.get('priority'))
             
-            if not await self.db.get_alert_cooldown(module, alert_type):
-                logger.info(f"⏳ Алерт от {module} заблокирован cooldown")
-                return
+            # Обновление rate limit и cooldown (до await, чтобы параллельные алерты их видели)
+            entry = self._record_alert(alert_data)
             
-            # Проверка rate limit
-            if self._is_rate_limited(module, alert_type):
-                logger.info(f"🚫 Алерт от {module} заблокирован rate limit")
-                return
+            # Сохранение в базу данных и добавление в очередь отправки
+            alert_id = await self.alert_queue.put(alert_data)
+            if entry is not None:
+                entry.alert_id = alert_id
             
-            # Сохранение в базу данных
-            alert_id = await self.db.save_alert(alert_data)
+            logger.info(f"📨 Алерт {alert_id} добавлен в очередь")
+            return alert_id
             
-            # Добавление в очередь отправки
-            await self.alert_queue.put({
-                'alert_id': alert_id,
-                'alert_data': alert_data
-            })
+        except QueueFullError as e:
+            metrics.ALERTS_REJECTED.labels(e.reason).inc()
+            logger.warning(f"🚧 Очередь переполнена ({e.reason}), алерт от {alert_data.get('module')} отклонен")
+            raise
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки алерта: {e}")
+            return None
+    
+    async def process_alerts_batch(self, alerts: List[Any]) -> List[Dict[str, Any]]:
+        """Обработка пачки алертов: проверки в памяти и сохранение одной транзакцией"""
+        results: List[Dict[str, Any]] = [{'index': i} for i in range(len(alerts))]
+        accepted: List[int] = []
+        entries: Dict[int, Optional[DedupEntry]] = {}
+        seen = set()
+        planned: Counter = Counter()  # Принятые алерты пачки по полосам
+        
+        for index, alert_data in enumerate(alerts):
+            if not isinstance(alert_data, dict):
+                results[index]['status'] = 'invalid'
+                continue
             
-            # Обновление cooldown
-            await self.db.update_alert_cooldown(module)
+            # Дубликаты внутри одной пачки
+            key = (alert_data.get('module'), alert_data.get('type'), alert_data.get('message'))
+            rejection = 'duplicate' if key in seen else self._check_alert(alert_data)
             
-            # Обновление rate limit
-            self._update_rate_limit(module, alert_type)
+            if not rejection:
+                lane = lane_of(alert_data.get('priority'))
+                rejection = self.alert_queue.admission(alert_data.get('priority'), len(accepted), planned[lane])
             
-            logger.info(f"📨 Алерт {alert_id} добавлен в очередь")
+            if rejection:
+                results[index]['status'] = rejection
+                metrics.ALERTS_REJECTED.labels(rejection).inc()
+                continue
             
-        except Exception as e:
-            logger.error(f"❌ Ошибка обработки алерта: {e}")
+            entries[index] = self._record_alert(alert_data)
+            seen.add(key)
+            accepted.append(index)
+            planned[lane] += 1
+        
+        if accepted:
+            try:
+                alert_ids = await self.alert_queue.put_many([alerts[i] for i in accepted])
+                for index, alert_id in zip(accepted, alert_ids):
+                    results[index].update(status='queued', alert_id=alert_id)
+                    if entries[index] is not None:
+                        entries[index].alert_id = alert_id
+            except QueueFullError:
+                for index in accepted:
+                    results[index]['status'] = 'queue_full'
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения пачки алертов: {e}")
+                for index in accepted:
+                    results[index]['status'] = 'error'
+        
+        logger.info(f"📨 Пачка алертов: принято {len(accepted)} из {len(alerts)}")
+        return results
+    
+    def accept_alert(self, alert_data: Dict[str, Any]) -> Dict[str, Any]:
+        """Быстрый прием алерта: проверки в памяти, идентификатор сразу, запись в БД в фоне"""
+        rejection = self._check_alert(alert_data)
+        if rejection:
+            self._log_rejection(alert_data, rejection)
+            return {'status': rejection}
+        
+        # Место в очереди и полосе с учетом еще не записанных алертов
+        lane = lane_of(alert_data.get('priority'))
+        rejection = self.alert_queue.admission(
+            alert_data.get('priority'), self._ingest_unsaved, self._ingest_lanes[lane]
+        )
+        if rejection:
+            metrics.ALERTS_REJECTED.labels(rejection).inc()
+            raise QueueFullError(
+                self.alert_queue.qsize() + self._ingest_unsaved,
+                self.alert_queue.retry_after,
+                rejection
+            )
+        
+        entry = self._record_alert(alert_data)
+        
+        alert_id = self.db.new_alert_id()
+        if entry is not None:
+            entry.alert_id = alert_id
+        self._ingest_buffer.append((alert_id, alert_data))
+        self._ingest_unsaved += 1
+        self._ingest_lanes[lane] += 1
+        self._ingest_pending.add(alert_id)
+        self._ingest_wakeup.set()
+        
+        if self._ingest_task is None:
+            self._ingest_task = asyncio.create_task(self._run_ingest())
+        
+        return {'status': 'accepted', 'alert_id': alert_id}
+    
+    async def get_alert_status(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Статус алерта для источника (в том числе еще не записанного в БД)"""
+        if alert_id in self._ingest_pending:
+            return {'alert_id': alert_id, 'status': 'accepted'}
+        if alert_id in self._ingest_failed:
+            return {'alert_id': alert_id, 'status': 'failed', 'error': self._ingest_failed[alert_id]}
+        return await self.db.get_alert_status(alert_id)
+    
+    async def _run_ingest(self):
+        """Фоновая запись принятых алертов: все накопленное - одной транзакцией"""
+        while True:
+            await self._ingest_wakeup.wait()
+            self._ingest_wakeup.clear()
+            try:
+                await self._flush_ingest()
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка фоновой записи алертов: {e}")
+    
+    async def _flush_ingest(self):
+        """Запись буфера быстрого приема в очередь"""
+        async with self._ingest_lock:
+            if not self._ingest_buffer:
+                return
+            
+            # Пачка остается в _ingest_unsaved и _ingest_lanes до постановки в очередь,
+            # чтобы прием во время записи не занял уже обещанные ей места
+            batch, self._ingest_buffer = self._ingest_buffer, []
+            alert_ids = [alert_id for alert_id, _ in batch]
+            try:
+                await self.alert_queue.put_many([alert_data for _, alert_data in batch], alert_ids,
+                                                admitted=True)
+            except Exception as e:
+                logger.error(f"❌ Не удалось сохранить {len(batch)} принятых алертов: {e}")
+                for alert_id in alert_ids:
+                    self._ingest_failed[alert_id] = str(e)
+                while len(self._ingest_failed) > 10000:
+                    self._ingest_failed.popitem(last=False)
+            finally:
+                self._ingest_pending.difference_update(alert_ids)
+                self._ingest_unsaved -= len(batch)
+                self._ingest_lanes.subtract(lane_of(alert_data.get('priority')) for _, alert_data in batch)
+    
+    def _check_alert(self, alert_data: Dict[str, Any]) -> Optional[str]:
+        """Проверка алерта без обращений к БД; None - алерт можно принять"""
+        # Валидация данных алерта
+        if not self._validate_alert_data(alert_data):
+            return 'invalid'
+        
+        # Повтор уже доставленного алерта учитывается в его окне агрегации
+        entry = self.dedup.absorb(alert_data)
+        if entry is not None:
+            if self.edit_in_place and entry.alert_id:
+                self.editor.request(entry.alert_id, lambda: self._format_repeat(entry))
+            return 'aggregated'
+        
+        module = alert_data.get('module', 'unknown')
+        alert_type = alert_data.get('type', 'info')
+        priority = alert_data.get('priority', 'info')
+        
+        # Проверка cooldown
+        if self.rate_limiter.is_cooling_down(module, alert_type, priority):
+            return 'cooldown'
+        
+        # Проверка rate limit
+        if self._is_rate_limited(module, alert_type, priority):
+            return 'rate_limited'
+        
+        return None
+    
+    def _record_alert(self, alert_data: Dict[str, Any]) -> Optional[DedupEntry]:
+        """Учет принятого алерта в rate limit, cooldown, статистике и окне агрегации"""
+        module = alert_data.get('module', 'unknown')
+        alert_type = alert_data.get('type', 'info')
+        priority = alert_data.get('priority', 'info')
+        
+        self._update_rate_limit(module, alert_type, priority)
+        self.alert_stats.record(alert_type, module, priority)
+        metrics.ALERTS_ACCEPTED.inc()
+        return self.dedup.register(alert_data)
+    
+    def _log_rejection(self, alert_data: Dict[str, Any], rejection: str):
+        """Логирование причины отклонения алерта"""
+        metrics.ALERTS_REJECTED.labels(rejection).inc()
+        module = alert_data.get('module', 'unknown')
+        if rejection == 'invalid':
+            logger.warning("⚠️ Некорректные данные алерта")
+        elif rejection == 'cooldown':
+            logger.info(f"⏳ Алерт от {module} заблокирован cooldown")
+        elif rejection == 'rate_limited':
+            logger.info(f"🚫 Алерт от {module} заблокирован rate limit")
+        elif rejection == 'aggregated':
+            logger.debug(f"🔁 Повтор алерта от {module} учтен в сводке")
+    
+    @staticmethod
+    def _repeat_alert(entry: DedupEntry, counter: str) -> Dict[str, Any]:
+        """Последний повтор алерта со счетчиком в тексте и временем первого и последнего"""
+        alert = dict(entry.alert_data)
+        alert['message'] = f"{entry.alert_data.get('message', '')}\n{counter}"
+        data = dict(alert['data']) if isinstance(alert.get('data'), dict) else {}
+        data.update(
+            occurrences=entry.total,
+            first_seen=datetime.fromtimestamp(entry.first_seen).strftime('%H:%M:%S'),
+            last_seen=datetime.fromtimestamp(entry.last_seen).strftime('%H:%M:%S')
+        )
+        alert['data'] = data
+        return alert
+    
+    def _format_repeat(self, entry: DedupEntry) -> str:
+        """Текст правки сообщения открытого инцидента"""
+        last_seen = datetime.fromtimestamp(entry.last_seen).strftime('%H:%M:%S')
+        return self._format_alert(self._repeat_alert(entry, f"🔁 ×{entry.total}, последний в {last_seen}"))
+    
+    async def _send_repeat_summary(self, entry: DedupEntry):
+        """Одно сообщение со счетчиком вместо повторов, пришедших за окно агрегации"""
+        if self.edit_in_place and entry.alert_id and self.editor.has_messages(entry.alert_id):
+            # Счетчик уже в отправленном сообщении: досылается только последняя правка
+            self.editor.request(entry.alert_id, lambda: self._format_repeat(entry))
+            return
+        
+        minutes = max(round(self.dedup.window / 60), 1)
+        summary = self._repeat_alert(entry, f"🔁 ×{entry.suppressed} за последние {minutes} мин")
+        
+        # Сводка минует cooldown и rate limit: повторы уже прошли через них один раз
+        try:
+            alert_id = await self.alert_queue.put(summary)
+            entry.alert_id = alert_id
+            logger.info(f"🔁 Сводка повторов {alert_id}: {entry.alert_data.get('module')} ×{entry.suppressed}")
+        except QueueFullError:
+            logger.warning(f"🚧 Очередь переполнена, сводка повторов {entry.alert_data.get('module')} отложена")
+            raise
     
     async def start_alert_processor(self):
         """Запуск обработчика алертов"""
         logger.info("🚀 Запуск обработчика алертов")
+        await self.delivery.start()
+        await self.retry_scheduler.start()
+        await self.alert_queue.recover()
+        await self.rate_limiter.start(self.db, self.rate_limit_snapshot_interval)
+        await self.alert_stats.start(self.db)
+        await self.latency.start(self.db)
+        await self.compaction.start()
+        await self.dedup.start()
+        await self.digests.start()
+        await self._restore_health_states()
+        await self.health_checker.start()
         
         while True:
             try:
@@ -75,90 +438,263 @@ class AlertManager:
                 alert_id = item['alert_id']
                 alert_data = item['alert_data']
                 
-                # Отправка алерта
+                # Время ожидания в полосе (по времени из идентификатора алерта)
+                created_at = id_timestamp(alert_id)
+                if created_at is not None:
+                    metrics.LANE_WAIT.labels(item['lane']).observe(max(time.time() - created_at, 0))
+                
+                # Постановка алерта в очереди доставки (не ждет отправки)
                 await self._send_alert(alert_id, alert_data)
                 
                 # Отметка как обработанного
                 self.alert_queue.task_done()
                 
+            except asyncio.CancelledError:
+                raise
             except Exception as e:
                 logger.error(f"❌ Ошибка в обработчике алертов: {e}")
                 await asyncio.sleep(5)  # Пауза при ошибке
     
+    async def stop(self):
+        """Остановка доставки с отправкой уже поставленных сообщений"""
+        # Накопленные сводки повторов сохраняются в очередь до ее остановки
+        await self.dedup.stop()
+        self.editor.flush_all()
+        
+        # Запись алертов, принятых в режиме fast-ack
+        await self._flush_ingest()
+        if self._ingest_task is not None:
+            self._ingest_task.cancel()
+            await asyncio.gather(self._ingest_task, return_exceptions=True)
+            self._ingest_task = None
+        
+        await self.digests.stop()
+        await self.retry_scheduler.stop()
+        await self.delivery.stop()
+        await asyncio.gather(*self._ack_tasks, return_exceptions=True)
+        await self.rate_limiter.stop(self.db)
+        await self.health_checker.stop()
+        await self.latency.stop(self.db)
+        await self.compaction.stop()
+        await self.alert_stats.stop(self.db)
+    
+    @staticmethod
+    def _format_alert(alert_data: Dict[str, Any]) -> str:
+        """Текст алерта: для нарушений порогов производительности - отдельный шаблон"""
+        data = alert_data.get('data')
+        if (alert_data.get('type') == 'performance' and isinstance(data, dict)
+                and {'metric', 'value', 'threshold'} <= data.keys()):
+            return AlertTemplates.format_performance_alert(
+                data['metric'], data['value'], data['threshold'], alert_data.get('module', 'unknown')
+            )
+        return AlertTemplates.format_alert(alert_data)
+    
     async def _send_alert(self, alert_id: str, alert_data: Dict[str, Any]):
-        """Отправка алерта в Telegram"""
+        """Рассылка алерта подписчикам через движок доставки"""
         try:
-            # Форматирование сообщения
-            message_text = AlertTemplates.format_alert(alert_data)
-            
-            # Получение списка чатов для отправки
-            chat_ids = await self.db.get_subscribed_chats(
+            # Получение списка чатов для отправки (сразу или в дайджесте)
+            routes = await self.db.get_alert_routes(
                 alert_type=alert_data.get('type'),
-                module=alert_data.get('module')
+                module=alert_data.get('module'),
+                priority=alert_data.get('priority', 'info')
             )
             
-            if not chat_ids:
+            self._cache_alert(alert_id, alert_data)
+            
+            if not routes:
                 logger.warning("⚠️ Нет подписчиков для алерта")
+                self._ack_later(alert_id)
+                return
+            
+            digest_routes = [(chat_id, interval) for chat_id, interval in routes if interval]
+            if digest_routes:
+                await self.digests.add(alert_id, alert_data, digest_routes)
+            
+            chat_ids = [chat_id for chat_id, interval in routes if not interval]
+            if not chat_ids:
+                # Алерт сохранен в дайджестах, которые восстанавливаются после перезапуска
+                self._ack_later(alert_id)
                 return
             
-            # Отправка в каждый чат
+            # Текст и клавиатура форматируются один раз для всех получателей
+            rendered = self.renderer.render(alert_id, alert_data)
+            
+            # Алерт подтверждается в очереди, когда каждое сообщение отправлено
+            # или сохранено для повторной отправки
+            self.outstanding_deliveries[alert_id] = len(chat_ids)
+            lane = lane_of(alert_data.get('priority'))
             for chat_id in chat_ids:
-                try:
-                    # Создание клавиатуры с кнопками
-                    keyboard = self._create_alert_keyboard(alert_id, alert_data)
-                    
-                    # Отправка сообщения
-                    message = await self.bot.send_message(
-                        chat_id=chat_id,
-                        text=message_text,
-                        reply_markup=keyboard,
-                        parse_mode='Markdown'
-                    )
-                    
-                    # Отметка как отправленного
-                    await self.db.mark_alert_sent(alert_id, chat_id, message.message_id)
-                    
-                    logger.info(f"✅ Алерт {alert_id} отправлен в чат {chat_id}")
-                    
-                except Exception as e:
-                    logger.error(f"❌ Ошибка отправки в чат {chat_id}: {e}")
+                self.delivery.submit(Delivery(
+                    alert_id, chat_id, rendered.text, rendered.reply_markup,
+                    payload={'track': True}, lane=lane
+                ))
+            
+            self._send_failures.pop(alert_id, None)
             
         except Exception as e:
-            logger.error(f"❌ Ошибка отправки алерта {alert_id}: {e}")
+            # Алерт не должен занимать место в очереди до перезапуска: повтор, затем снятие
+            attempts = self._send_failures.get(alert_id, 0) + 1
+            if attempts < self.MAX_SEND_ATTEMPTS:
+                self._send_failures[alert_id] = attempts
+                logger.error(f"❌ Ошибка отправки алерта {alert_id} (попытка {attempts}), алерт возвращен в очередь: {e}")
+                self.alert_queue.release(alert_id)
+            else:
+                logger.error(f"❌ Алерт {alert_id} не отправлен за {attempts} попытки и снят с очереди: {e}")
+                self._ack_later(alert_id)
+    
+    async def _send_digest(self, digest: ChatDigest):
+        """Постановка дайджеста чата в очередь доставки (одно или несколько сообщений)"""
+        digest_id = f"{DIGEST_ID_PREFIX}{self.db.new_alert_id()}"
+        for text in AlertTemplates.format_digest(self.digests.summary(digest)):
+            self.delivery.submit(Delivery(digest_id, digest.chat_id, text))
+        logger.info(f"📬 Дайджест {digest_id} для чата {digest.chat_id}: {digest.total} алертов")
     
-    def _create_alert_keyboard(self, alert_id: str, alert_data: Dict[str, Any]) -> Optional[Any]:
-        """Создание клавиатуры для алерта"""
+    async def get_alert(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Алерт по идентификатору: недавние - из LRU-кэша, остальные - по индексу в БД"""
+        alert = self.recent_alerts.get(alert_id)
+        if alert is not None:
+            self.recent_alerts.move_to_end(alert_id)
+            return alert
+        
+        alert = await self.db.get_alert(alert_id)
+        if alert is not None:
+            self._store_cached(alert_id, alert)
+        return alert
+    
+    def _cache_alert(self, alert_id: str, alert_data: Dict[str, Any]):
+        """Кэширование отправляемого алерта в формате строки БД"""
+        self._store_cached(alert_id, {
+            'alert_id': alert_id,
+            'type': alert_data.get('type', 'info'),
+            'priority': alert_data.get('priority', 'info'),
+            'module': alert_data.get('module', 'unknown'),
+            'message': alert_data.get('message', ''),
+            'data': alert_data.get('data') or {},
+            'timestamp': alert_data.get('timestamp', datetime.now().isoformat()),
+            'sent': False
+        })
+    
+    def _store_cached(self, alert_id: str, alert: Dict[str, Any]):
+        """Добавление в LRU-кэш с вытеснением самых старых записей"""
+        self.recent_alerts[alert_id] = alert
+        self.recent_alerts.move_to_end(alert_id)
+        while len(self.recent_alerts) > self.alert_cache_size:
+            self.recent_alerts.popitem(last=False)
+    
+    async def _deliver(self, delivery: Delivery):
+        """Отправка одного сообщения в Telegram"""
+        if 'edit_message_id' in delivery.payload:
+            await self._edit_message(delivery)
+            return
+        
+        started = time.perf_counter()
         try:
-            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
-            
-            keyboard = InlineKeyboardMarkup(inline_keyboard=[
-                [
-                    InlineKeyboardButton(
-                        text="✅ Подтвердить",
-                        callback_data=f"confirm_{alert_id}"
-                    ),
-                    InlineKeyboardButton(
-                        text="⏰ Отложить",
-                        callback_data=f"delay_{alert_id}"
-                    )
-                ],
-                [
-                    InlineKeyboardButton(
-                        text="📊 Детали",
-                        callback_data=f"details_{alert_id}"
-                    ),
-                    InlineKeyboardButton(
-                        text="🔕 Отключить",
-                        callback_data=f"mute_{alert_id}"
-                    )
-                ]
-            ])
-            
-            return keyboard
-            
+            message = await self.bot.send_message(
+                chat_id=delivery.chat_id,
+                text=delivery.text,
+                reply_markup=delivery.reply_markup,
+                parse_mode='Markdown'
+            )
         except Exception as e:
-            logger.error(f"❌ Ошибка создания клавиатуры: {e}")
-            return None
+            metrics.TELEGRAM_SEND_ERRORS.labels(type(e).__name__).inc()
+            raise
+        finally:
+            metrics.TELEGRAM_SEND_LATENCY.observe(time.perf_counter() - started)
+        
+        if delivery.alert_id.startswith(DIGEST_ID_PREFIX):
+            logger.info(f"✅ Дайджест отправлен в чат {delivery.chat_id}")
+            return
+        
+        # Отметка как отправленного
+        await self.db.mark_alert_sent(delivery.alert_id, delivery.chat_id, message.message_id)
+        if self.edit_in_place:
+            self.editor.remember(delivery.alert_id, delivery.chat_id, message.message_id)
+        cached = self.recent_alerts.get(delivery.alert_id)
+        if cached is not None:
+            cached['sent'] = True
+        
+        logger.info(f"✅ Алерт {delivery.alert_id} отправлен в чат {delivery.chat_id}")
+    
+    def _submit_edit(self, alert_id: str, chat_id: str, message_id: int, text: str):
+        """Постановка правки в очередь доставки (общие лимиты и порядок в чате)"""
+        self.delivery.submit(Delivery(
+            alert_id, chat_id, text, self.renderer.keyboard(alert_id),
+            payload={'edit_message_id': message_id}, lane=self._alert_lane(alert_id)
+        ))
+    
+    async def _edit_message(self, delivery: Delivery):
+        """Правка отправленного сообщения алерта"""
+        try:
+            await self.bot.edit_message_text(
+                text=delivery.text,
+                chat_id=delivery.chat_id,
+                message_id=delivery.payload['edit_message_id'],
+                reply_markup=delivery.reply_markup,
+                parse_mode='Markdown'
+            )
+        except TelegramBadRequest as e:
+            # Текст не изменился - правка не нужна
+            if 'not modified' not in str(e):
+                raise
+    
+    async def _on_edit_failure(self, delivery: Delivery, error: Exception):
+        """Правки не сохраняются для повтора: следующая правка заменит текст"""
+        if isinstance(error, TelegramRetryAfter):
+            self.delivery.pause_chat(delivery.chat_id, error.retry_after)
+            self.delivery.submit(delivery)
+            return
+        logger.warning(f"⚠️ Не удалось изменить сообщение алерта {delivery.alert_id} "
+                       f"в чате {delivery.chat_id}: {error}")
+        self.editor.forget(delivery.alert_id, delivery.chat_id)
+    
+    async def _on_delivery_success(self, delivery: Delivery):
+        """Обработка успешной отправки"""
+        await self.retry_scheduler.handle_success(delivery)
+        await self._complete_delivery(delivery)
+    
+    async def _on_delivery_failure(self, delivery: Delivery, error: Exception):
+        """Обработка ошибки отправки: повтор или dead letter"""
+        if 'edit_message_id' in delivery.payload:
+            await self._on_edit_failure(delivery, error)
+            return
+        await self.retry_scheduler.handle_failure(delivery, error)
+        await self._complete_delivery(delivery)
+    
+    async def _complete_delivery(self, delivery: Delivery):
+        """Учет завершенной доставки и подтверждение алерта в очереди"""
+        if not delivery.payload.get('track'):
+            return
+        
+        remaining = self.outstanding_deliveries.get(delivery.alert_id, 1) - 1
+        if remaining > 0:
+            self.outstanding_deliveries[delivery.alert_id] = remaining
+            return
+        
+        self.outstanding_deliveries.pop(delivery.alert_id, None)
+        self._ack_later(delivery.alert_id)
+    
+    def _ack_later(self, alert_id: str):
+        """Подтверждение алерта в очереди без ожидания записи в БД.
+        
+        ack ждет COMMIT групповой записи (~DB_BATCH_INTERVAL_MS), и в воркере
+        доставки это ограничивало бы чат ~45 сообщениями в секунду.
+        """
+        self._send_failures.pop(alert_id, None)
+        task = asyncio.create_task(self.alert_queue.ack(alert_id))
+        self._ack_tasks.add(task)
+        task.add_done_callback(self._ack_tasks.discard)
+    
+    def _resubmit(self, delivery: Delivery):
+        """Повторная постановка сообщения в очередь доставки"""
+        if not delivery.alert_id.startswith(DIGEST_ID_PREFIX):
+            delivery.reply_markup = self.renderer.keyboard(delivery.alert_id)
+            delivery.lane = self._alert_lane(delivery.alert_id)
+        self.delivery.submit(delivery)
+    
+    def _alert_lane(self, alert_id: str) -> str:
+        """Полоса доставки недавнего алерта (по его приоритету в LRU-кэше)"""
+        cached = self.recent_alerts.get(alert_id)
+        return lane_of(cached.get('priority') if cached else None)
     
     def _validate_alert_data(self, alert_data: Dict[str, Any]) -> bool:
         """Валидация данных алерта"""
@@ -171,39 +707,23 @@ class AlertManager:
         
         return True
     
-    def _is_rate_limited(self, module: str, alert_type: str) -> bool:
+    def _is_rate_limited(self, module: str, alert_type: str, priority: str = "info") -> bool:
         """Проверка rate limit для модуля"""
-        key = f"{module}_{alert_type}"
-        now = datetime.now()
-        
-        if key not in self.rate_limits:
-            self.rate_limits[key] = []
-        
-        # Очистка старых записей (старше часа)
-        hour_ago = now - timedelta(hours=1)
-        self.rate_limits[key] = [
-            timestamp for timestamp in self.rate_limits[key] 
-            if timestamp > hour_ago
-        ]
-        
-        # Проверка лимита (максимум 100 алертов в час)
-        if len(self.rate_limits[key]) >= 100:
-            return True
-        
-        return False
+        return self.rate_limiter.is_rate_limited(module, alert_type, priority)
     
-    def _update_rate_limit(self, module: str, alert_type: str):
-        """Обновление rate limit"""
-        key = f"{module}_{alert_type}"
-        if key not in self.rate_limits:
-            self.rate_limits[key] = []
-        
-        self.rate_limits[key].append(datetime.now())
+    def _update_rate_limit(self, module: str, alert_type: str, priority: str = "info"):
+        """Обновление rate limit и cooldown"""
+        self.rate_limiter.record(module, alert_type, priority)
     
     async def send_system_alert(self, alert_type: str, message: str, 
                               priority: str = "info", module: str = "system",
-                              data: Optional[Dict] = None):
-        """Отправка системного алерта"""
+                              data: Optional[Dict] = None,
+                              bypass_limits: bool = False) -> Optional[str]:
+        """Отправка системного алерта.
+        
+        bypass_limits - минуя агрегацию повторов, cooldown и rate limit: для
+        однократных уведомлений о смене состояния, которые нельзя потерять
+        """
         alert_data = {
             "type": alert_type,
             "message": message,
@@ -213,72 +733,149 @@ class AlertManager:
             "data": data or {}
         }
         
-        await self.process_alert(alert_data)
+        if not bypass_limits:
+            return await self.process_alert(alert_data)
+        
+        try:
+            alert_id = await self.alert_queue.put(alert_data)
+        except QueueFullError as e:
+            metrics.ALERTS_REJECTED.labels(e.reason).inc()
+            logger.error(f"🚧 Очередь переполнена ({e.reason}), системный алерт {module} потерян: {message}")
+            return None
+        except Exception as e:
+            logger.error(f"❌ Ошибка отправки системного алерта: {e}")
+            return None
+        
+        self.alert_stats.record(alert_type, module, priority)
+        metrics.ALERTS_ACCEPTED.inc()
+        logger.info(f"📨 Системный алерт {alert_id} добавлен в очередь")
+        return alert_id
     
     async def check_module_health(self, module_name: str, health_url: str):
         """Проверка здоровья модуля"""
-        try:
-            async with aiohttp.ClientSession() as session:
-                start_time = datetime.now()
-                
-                async with session.get(health_url, timeout=10) as response:
-                    response_time = (datetime.now() - start_time).total_seconds()
-                    
-                    if response.status == 200:
-                        status = "online"
-                        await self.db.update_module_status(
-                            module_name, status, response_time
-                        )
-                        logger.info(f"✅ Модуль {module_name} онлайн")
-                    else:
-                        status = "error"
-                        await self.db.update_module_status(
-                            module_name, status, response_time, 
-                            f"HTTP {response.status}"
-                        )
-                        logger.warning(f"⚠️ Модуль {module_name} недоступен: HTTP {response.status}")
-                        
-        except asyncio.TimeoutError:
-            await self.db.update_module_status(
-                module_name, "timeout", None, "Timeout"
-            )
-            logger.error(f"⏰ Таймаут проверки модуля {module_name}")
-            
-        except Exception as e:
-            await self.db.update_module_status(
-                module_name, "error", None, str(e)
-            )
-            logger.error(f"❌ Ошибка проверки модуля {module_name}: {e}")
+        return await self.health_checker.check(module_name, health_url)
     
-    async def get_alert_statistics(self) -> Dict[str, Any]:
-        """Получение статистики алертов"""
-        try:
-            history = await self.db.get_alert_history(1000)  # Последние 1000 алертов
-            
-            stats = {
-                'total_alerts': len(history),
-                'by_type': {},
-                'by_module': {},
-                'by_priority': {},
-                'recent_alerts': len([a for a in history if 
-                                    datetime.fromisoformat(a['timestamp']) > 
-                                    datetime.now() - timedelta(hours=1)])
+    async def _on_health_result(self, module_name: str, status: str,
+                                response_time: Optional[float], details: Optional[str]):
+        """Учет результата проверки: запись в БД и алерт только при смене состояния"""
+        # Таймаут - самая медленная проверка: в перцентили попадает со значением таймаута
+        sample = response_time
+        if sample is None and status == 'timeout':
+            sample = self.health_checker.timeout.total
+        if sample is not None:
+            self.latency.record(module_name, sample)
+            await self._check_latency_slo(module_name)
+        
+        transition = self.health_states.observe(module_name, status, response_time, details)
+        if transition is None:
+            return
+        
+        if transition.old_state != transition.new_state:
+            await self.db.update_module_status(module_name, transition.new_state, response_time, details)
+            logger.info(f"🩺 Модуль {module_name}: {transition.old_state} → {transition.new_state}")
+        
+        if not transition.notify:
+            return
+        
+        priority = {DOWN: 'critical', DEGRADED: 'warning', ONLINE: 'info'}.get(transition.new_state, 'info')
+        if transition.flapping:
+            message = (f"Модуль {module_name} нестабилен (флаппинг), "
+                       f"уведомления приостановлены. Текущее состояние: {transition.new_state}")
+        elif transition.old_state == transition.new_state:
+            message = f"Модуль {module_name} стабилизировался: {transition.new_state}"
+        else:
+            message = f"Модуль {module_name}: {transition.old_state} → {transition.new_state}"
+        if details and transition.new_state != ONLINE:
+            message += f" ({details})"
+        
+        # Машина состояний уже подавляет повторы, а cooldown по (модуль, "system")
+        # отбросил бы переход degraded → down, пришедший следующей проверкой
+        await self.send_system_alert("system", message, priority=priority, module=module_name, data={
+            'from': transition.old_state,
+            'to': transition.new_state,
+            'last_status': status,
+            'response_time': response_time,
+            'flapping': transition.flapping
+        }, bypass_limits=True)
+    
+    def get_latency_slo(self, module_name: str) -> float:
+        """Порог p95 для модуля в мс (0 - не отслеживается)"""
+        return self.latency_slo.get(module_name, self.latency_slo_p95_ms)
+    
+    async def _check_latency_slo(self, module_name: str):
+        """Алерт при нарушении SLO по p95 и при возврате в норму"""
+        threshold = self.get_latency_slo(module_name)
+        if not threshold:
+            return
+        
+        summary = self.latency.summary(module_name, self.latency_slo_window)
+        p95 = summary['p95']
+        if summary['count'] < self.latency_slo_min_samples or p95 is None:
+            return
+        
+        # Уведомления однократные: минуют cooldown по (модуль, "performance"), а состояние
+        # меняется только после приема алерта - иначе при переполненной очереди оно потеряется
+        if p95 > threshold and module_name not in self.slo_breached:
+            logger.warning(f"🐢 Модуль {module_name}: p95 {p95:.0f}ms > SLO {threshold:.0f}ms")
+            if await self.send_system_alert(
+                "performance",
+                f"p95 времени ответа {module_name} превышает SLO",
+                priority="warning",
+                module=module_name,
+                data={'metric': f"p95 за {self.latency_slo_window} мин, ms",
+                      'value': round(p95, 1), 'threshold': threshold},
+                bypass_limits=True
+            ):
+                self.slo_breached[module_name] = p95
+        elif p95 <= threshold and module_name in self.slo_breached:
+            logger.info(f"✅ Модуль {module_name}: p95 {p95:.0f}ms в пределах SLO")
+            if await self.send_system_alert(
+                "performance",
+                f"p95 времени ответа {module_name} вернулся в пределы SLO",
+                priority="info",
+                module=module_name,
+                data={'p95_ms': round(p95, 1), 'slo_ms': threshold},
+                bypass_limits=True
+            ):
+                del self.slo_breached[module_name]
+    
+    def get_latency_summary(self, module_name: str, minutes: int = 60) -> Dict[str, Any]:
+        """Перцентили времени ответа модуля за окно"""
+        summary = self.latency.summary(module_name, minutes)
+        summary['slo'] = self.get_latency_slo(module_name)
+        summary['breached'] = module_name in self.slo_breached
+        return summary
+    
+    async def _restore_health_states(self):
+        """Восстановление состояний модулей, чтобы рестарт не порождал повторные алерты"""
+        status_data = await self.db.get_module_status()
+        for module_name, module_info in status_data.get('modules', {}).items():
+            self.health_states.restore(module_name, module_info['status'])
+    
+    async def get_module_status(self) -> Dict[str, Any]:
+        """Статус модулей: сохраненные состояния и последние проверки из памяти"""
+        status_data = await self.db.get_module_status()
+        modules = status_data.get('modules', {})
+        
+        for module_name, health in self.health_states.snapshot().items():
+            if health['last_check'] is None:
+                continue
+            modules[module_name] = {
+                'status': health['status'],
+                'last_check': datetime.fromtimestamp(health['last_check']).isoformat(),
+                'response_time': health['response_time'],
+                'flapping': health['flapping']
             }
-            
-            for alert in history:
-                # Статистика по типам
-                alert_type = alert['type']
-                stats['by_type'][alert_type] = stats['by_type'].get(alert_type, 0) + 1
-                
-                # Статистика по модулям
-                module = alert['module']
-                stats['by_module'][module] = stats['by_module'].get(module, 0) + 1
-                
-                # Статистика по приоритетам
-                priority = alert['priority']
-                stats['by_priority'][priority] = stats['by_priority'].get(priority, 0) + 1
-            
-            return stats
+        
+        status_data['modules'] = modules
+        status_data['total_modules'] = len(modules)
+        status_data['modules_online'] = len([m for m in modules.values() if m['status'] == ONLINE])
+        return status_data
+    
+    async def get_alert_statistics(self, window: Optional[str] = None) -> Dict[str, Any]:
+        """Получение статистики алертов за окно 1h/24h/7d/30d (None - за все время)"""
+        try:
+            return self.alert_stats.summary(window)
             
         except Exception as e:
             logger.error(f"❌ Ошибка получения статистики: {e}")
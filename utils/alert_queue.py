@@ -0,0 +1,250 @@
+"""
+Надежная очередь алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Полосы очереди от самой срочной; неизвестный приоритет попадает в info
+LANES = ('critical', 'error', 'warning', 'info')
+DEFAULT_LANE_WEIGHTS = {'critical': 8, 'error': 4, 'warning': 2, 'info': 1}
+# Доля max_pending, после которой новые алерты полосы отклоняются (место для срочных)
+DEFAULT_SHED_AT = {'warning': 0.9, 'info': 0.8}
+
+def lane_of(priority: Optional[str]) -> str:
+    """Полоса очереди для приоритета алерта"""
+    return priority if priority in LANES else 'info'
+
+class QueueFullError(Exception):
+    """Очередь переполнена - источнику алертов нужно повторить позже"""
+
+    def __init__(self, pending: int, retry_after: int, reason: str = 'queue_full'):
+        super().__init__(f"Очередь алертов переполнена: {pending} в ожидании")
+        self.pending = pending
+        self.retry_after = retry_after
+        self.reason = reason  # queue_full, lane_full или shed
+
+class DurableAlertQueue:
+    """Очередь на основе таблицы alerts с полосами приоритетов и ограниченным буфером в памяти.
+
+    Алерт сначала сохраняется в БД и попадает в полосу своего приоритета
+    (critical/error/warning/info). В памяти каждой полосы держится не более
+    ``memory_size`` элементов, остальные подгружаются из БД по мере
+    освобождения буфера. ``get`` выбирает полосу взвешенным циклическим
+    обходом (smooth weighted round-robin) по ``lane_weights``, поэтому поток
+    info не задерживает critical, но и сам не голодает. При заполнении
+    очереди выше доли ``shed_at`` новые алерты младших полос отклоняются,
+    сохраняя место для срочных. Алерт считается обработанным после ``ack``.
+    При старте все необработанные алерты возвращаются в очередь.
+    """
+
+    def __init__(self, database_manager, memory_size: int = 1000,
+                 max_pending: int = 10000, retry_after: int = 5,
+                 lane_weights: Optional[Dict[str, int]] = None,
+                 lane_capacity: Optional[Dict[str, int]] = None,
+                 shed_at: Optional[Dict[str, float]] = None):
+        self.db = database_manager
+        self.memory_size = max(memory_size, 1)
+        self.max_pending = max_pending
+        self.retry_after = retry_after
+        self.lane_weights = {lane: max(int((lane_weights or DEFAULT_LANE_WEIGHTS).get(lane, 1)), 1)
+                             for lane in LANES}
+        self.lane_capacity = lane_capacity or {}  # Предел необработанных алертов полосы
+        self.shed_at = DEFAULT_SHED_AT if shed_at is None else shed_at
+
+        self._buffers: Dict[str, Deque[Dict[str, Any]]] = {lane: deque() for lane in LANES}
+        self._known: Dict[str, str] = {}  # В буфере или в обработке: alert_id -> полоса
+        self._not_empty = asyncio.Event()
+        self._refill_locks = {lane: asyncio.Lock() for lane in LANES}
+        self._spilled = {lane: False for lane in LANES}  # Часть алертов полосы есть только в БД
+        self._puts_during_refill = {lane: 0 for lane in LANES}
+        self._current_weight = {lane: 0 for lane in LANES}
+
+        self.pending = 0
+        self.lane_pending = {lane: 0 for lane in LANES}
+        self.stats = {'shed': 0}
+
+    def qsize(self) -> int:
+        """Количество необработанных алертов (в памяти и в БД)"""
+        return self.pending
+
+    def memory_depth(self) -> int:
+        """Количество алертов в буферах полос в памяти"""
+        return sum(len(buffer) for buffer in self._buffers.values())
+
+    def is_full(self) -> bool:
+        return self.pending >= self.max_pending
+
+    def admission(self, priority: Optional[str] = None, extra: int = 0,
+                  extra_lane: int = 0) -> Optional[str]:
+        """Причина отказа в приеме алерта (None - принять).
+
+        extra и extra_lane - уже принятые, но еще не поставленные алерты
+        (всего и в полосе алерта).
+        """
+        lane = lane_of(priority)
+        pending = self.pending + extra
+        if pending >= self.max_pending:
+            return 'queue_full'
+        if self.lane_pending[lane] + extra_lane >= self.lane_capacity.get(lane, self.max_pending):
+            return 'lane_full'
+        if lane in self.shed_at and pending >= self.shed_at[lane] * self.max_pending:
+            return 'shed'
+        return None
+
+    def check_capacity(self, priority: Optional[str] = None):
+        """Отказ в приеме при переполнении очереди или полосы (backpressure)"""
+        rejection = self.admission(priority)
+        if rejection:
+            if rejection == 'shed':
+                self.stats['shed'] += 1
+            raise QueueFullError(self.pending, self.retry_after, rejection)
+
+    async def recover(self):
+        """Восстановление необработанных алертов после перезапуска"""
+        # Счетчики задаются по БД целиком: алерты, поставленные до recover, уже в ней
+        counts = await self.db.count_unprocessed_by_priority()
+        self.lane_pending = {lane: 0 for lane in LANES}
+        for priority, count in counts.items():
+            lane = lane_of(priority)
+            self.lane_pending[lane] += count
+            self._spilled[lane] = True
+        self.pending = sum(counts.values())
+        if self.pending:
+            self._not_empty.set()
+            logger.info(f"♻️ Восстановлено необработанных алертов: {self.pending}")
+
+    def _enqueue(self, alert_id: str, alert_data: Dict[str, Any]):
+        """Учет сохраненного алерта в полосе"""
+        lane = lane_of(alert_data.get('priority'))
+        self.pending += 1
+        self.lane_pending[lane] += 1
+
+        if self._refill_locks[lane].locked():
+            self._puts_during_refill[lane] += 1
+
+        if self._spilled[lane] or len(self._buffers[lane]) >= self.memory_size:
+            # Буфер заполнен - алерт будет подгружен из БД
+            self._spilled[lane] = True
+        else:
+            self._buffers[lane].append({'alert_id': alert_id, 'alert_data': alert_data, 'lane': lane})
+            self._known[alert_id] = lane
+
+    async def put(self, alert_data: Dict[str, Any]) -> str:
+        """Сохранение алерта в БД и постановка в очередь"""
+        self.check_capacity(alert_data.get('priority'))
+
+        alert_id = await self.db.save_alert(alert_data)
+        self._enqueue(alert_id, alert_data)
+        self._not_empty.set()
+        return alert_id
+
+    async def put_many(self, alerts: List[Dict[str, Any]],
+                       alert_ids: Optional[List[str]] = None, admitted: bool = False) -> List[str]:
+        """Сохранение пачки алертов одной транзакцией и постановка в очередь.
+
+        admitted - место для алертов уже проверено при приеме (fast-ack), и
+        источникам обещана доставка: лимит очереди повторно не проверяется.
+        """
+        if not admitted and self.pending + len(alerts) > self.max_pending:
+            raise QueueFullError(self.pending, self.retry_after)
+
+        alert_ids = await self.db.save_alerts(alerts, alert_ids)
+        for alert_id, alert_data in zip(alert_ids, alerts):
+            self._enqueue(alert_id, alert_data)
+
+        if alert_ids:
+            self._not_empty.set()
+        return alert_ids
+
+    def free_slots(self) -> int:
+        """Сколько алертов еще можно принять"""
+        return max(self.max_pending - self.pending, 0)
+
+    def _next_lane(self) -> Optional[str]:
+        """Выбор полосы: smooth weighted round-robin по непустым полосам"""
+        ready = [lane for lane in LANES if self._buffers[lane] or self._spilled[lane]]
+        if not ready:
+            return None
+
+        total = 0
+        chosen = None
+        for lane in ready:
+            self._current_weight[lane] += self.lane_weights[lane]
+            total += self.lane_weights[lane]
+            if chosen is None or self._current_weight[lane] > self._current_weight[chosen]:
+                chosen = lane
+        self._current_weight[chosen] -= total
+        return chosen
+
+    async def get(self) -> Dict[str, Any]:
+        """Получение следующего алерта (элемент содержит полосу 'lane')"""
+        while True:
+            lane = self._next_lane()
+            if lane is None:
+                self._not_empty.clear()
+                await self._not_empty.wait()
+                continue
+
+            buffer = self._buffers[lane]
+            if not buffer and self._spilled[lane]:
+                await self._refill(lane)
+
+            if buffer:
+                item = buffer.popleft()
+                if not buffer and not self._spilled[lane]:
+                    # Опустевшая полоса не копит приоритет на будущее
+                    self._current_weight[lane] = 0
+                return item
+
+    def task_done(self):
+        """Совместимость с asyncio.Queue (подтверждение - через ack)"""
+
+    async def ack(self, alert_id: str):
+        """Подтверждение обработки алерта"""
+        try:
+            await self.db.mark_alert_processed(alert_id)
+        finally:
+            lane = self._known.pop(alert_id, None)
+            if lane is not None:
+                self.lane_pending[lane] = max(self.lane_pending[lane] - 1, 0)
+            self.pending = max(self.pending - 1, 0)
+
+    def release(self, alert_id: str):
+        """Возврат взятого алерта без подтверждения: он будет повторно подгружен из БД"""
+        lane = self._known.pop(alert_id, None)
+        if lane is not None:
+            self._spilled[lane] = True
+            self._not_empty.set()
+
+    async def _refill(self, lane: str):
+        """Подгрузка алертов полосы из БД в буфер"""
+        async with self._refill_locks[lane]:
+            self._puts_during_refill[lane] = 0
+            buffer = self._buffers[lane]
+            in_lane = sum(1 for known_lane in self._known.values() if known_lane == lane)
+            limit = self.memory_size + in_lane
+            if lane == 'info':
+                rows = await self.db.get_unprocessed_alerts(limit, exclude_priorities=LANES[:-1])
+            else:
+                rows = await self.db.get_unprocessed_alerts(limit, priorities=[lane])
+
+            for row in rows:
+                if row['alert_id'] in self._known:
+                    continue
+                if len(buffer) >= self.memory_size:
+                    break
+                row['lane'] = lane
+                buffer.append(row)
+                self._known[row['alert_id']] = lane
+
+            # Все алерты полосы из БД в памяти, и во время запроса новых не поступало
+            if len(rows) < limit and not self._puts_during_refill[lane]:
+                self._spilled[lane] = False
+
+            if not buffer and self._spilled[lane]:
+                await asyncio.sleep(0.1)
@@ -0,0 +1,173 @@
+"""
+Инкрементальная статистика алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Dict, Optional, Set
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Окна статистики в минутах
+WINDOWS = {
+    '1h': 60,
+    '24h': 24 * 60,
+    '7d': 7 * 24 * 60,
+    '30d': 30 * 24 * 60
+}
+
+class AlertStats:
+    """Счетчики алертов по типу, модулю и приоритету без чтения таблицы alerts.
+
+    Алерты учитываются в поминутных корзинах; для каждого окна (1h/24h/7d/30d)
+    поддерживается скользящая сумма - при сдвиге окна вычитаются только
+    выпавшие минуты. Корзины сохраняются в таблицу alert_stats_rollup.
+    """
+
+    def __init__(self):
+        self.totals: Counter = Counter()  # (тип, модуль, приоритет) -> количество
+        self.buckets: Dict[int, Counter] = {}
+        self.windows: Dict[str, Counter] = {name: Counter() for name in WINDOWS}
+
+        minute = self._minute()
+        self._window_start = {name: minute - size + 1 for name, size in WINDOWS.items()}
+        self._dirty: Set[int] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _minute(now: Optional[float] = None) -> int:
+        return int((now if now is not None else time.time()) // 60)
+
+    def record(self, alert_type: str, module: str, priority: str, count: int = 1,
+               now: Optional[float] = None):
+        """Учет принятого алерта"""
+        minute = self._minute(now)
+        self._advance(minute)
+
+        key = (alert_type, module, priority)
+        self.buckets.setdefault(minute, Counter())[key] += count
+        self.totals[key] += count
+        for name, window in self.windows.items():
+            if minute >= self._window_start[name]:
+                window[key] += count
+        self._dirty.add(minute)
+
+    def _advance(self, minute: int):
+        """Сдвиг окон: вычитание минут, вышедших за границу окна"""
+        oldest = self._window_start['30d']
+
+        for name, size in WINDOWS.items():
+            start = minute - size + 1
+            old_start = self._window_start[name]
+            if start <= old_start:
+                continue
+
+            window = self.windows[name]
+            if start - old_start >= size:
+                # Окно сдвинулось целиком
+                window.clear()
+            else:
+                for expired in range(old_start, start):
+                    bucket = self.buckets.get(expired)
+                    if bucket:
+                        window.subtract(bucket)
+                for key in [key for key, count in window.items() if count <= 0]:
+                    del window[key]
+            self._window_start[name] = start
+
+        # Корзины старше самого длинного окна больше не нужны (кроме несохраненных)
+        start = self._window_start['30d']
+        if start > oldest:
+            if start - oldest >= WINDOWS['30d']:
+                expired_minutes = [m for m in self.buckets if m < start]
+            else:
+                expired_minutes = [m for m in range(oldest, start) if m in self.buckets]
+            for expired in expired_minutes:
+                if expired not in self._dirty:
+                    del self.buckets[expired]
+
+    def summary(self, window: Optional[str] = None) -> Dict[str, Any]:
+        """Счетчики за окно (None - за все время)"""
+        self._advance(self._minute())
+        counter = self.totals if window is None else self.windows[window]
+
+        by_type: Counter = Counter()
+        by_module: Counter = Counter()
+        by_priority: Counter = Counter()
+        for (alert_type, module, priority), count in counter.items():
+            by_type[alert_type] += count
+            by_module[module] += count
+            by_priority[priority] += count
+
+        return {
+            'total_alerts': sum(counter.values()),
+            'recent_alerts': sum(self.windows['1h'].values()),
+            'windows': {name: sum(c.values()) for name, c in self.windows.items()},
+            'by_type': dict(by_type.most_common()),
+            'by_module': dict(by_module.most_common()),
+            'by_priority': dict(by_priority.most_common())
+        }
+
+    async def load(self, database_manager):
+        """Загрузка накопленных счетчиков из alert_stats_rollup"""
+        for row in await database_manager.get_stats_totals():
+            self.totals[(row['type'], row['module'], row['priority'])] += row['count']
+
+        since = self._minute() - WINDOWS['30d'] + 1
+        for row in await database_manager.get_stats_rollup(since):
+            minute = row['minute']
+            key = (row['type'], row['module'], row['priority'])
+            self.buckets.setdefault(minute, Counter())[key] += row['count']
+            for name, window in self.windows.items():
+                if minute >= self._window_start[name]:
+                    window[key] += row['count']
+
+        logger.info(f"📊 Статистика загружена: {sum(self.totals.values())} алертов")
+
+    async def flush(self, database_manager):
+        """Сохранение измененных минутных корзин"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            (minute, alert_type, module, priority, count)
+            for minute in sorted(dirty)
+            for (alert_type, module, priority), count in self.buckets.get(minute, {}).items()
+        ]
+        try:
+            await database_manager.save_stats_rollup(rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+    async def start(self, database_manager, interval: float = 60):
+        """Загрузка счетчиков и запуск периодического сохранения"""
+        if self._task is not None:
+            return
+        await self.load(database_manager)
+        self._task = asyncio.create_task(self._run(database_manager, interval))
+
+    async def stop(self, database_manager):
+        """Остановка с сохранением несохраненных корзин"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush(database_manager)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения статистики: {e}")
+
+    async def _run(self, database_manager, interval: float):
+        """Периодическое сохранение корзин"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(database_manager)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения статистики: {e}")
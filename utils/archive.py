@@ -0,0 +1,154 @@
+"""
+Архив старых алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import gzip
+import heapq
+import json
+import logging
+import os
+from datetime import datetime
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+def _to_datetime(moment) -> Optional[datetime]:
+    """Время (datetime или unix timestamp) в datetime: метки в архиве - локальное время ISO"""
+    if moment is None or isinstance(moment, datetime):
+        return moment
+    return datetime.fromtimestamp(moment)
+
+class AlertArchive:
+    """Холодный архив: сжатый NDJSON, по файлу на день.
+
+    Файлы лежат в ``<archive_dir>/YYYY/MM/alerts-YYYY-MM-DD.ndjson.gz``. Каждая
+    выгрузка дописывается в файл отдельным gzip-членом, поэтому файл не
+    перезаписывается. ``index.json`` хранит по каждому дню файл, число строк и
+    диапазон времени - запрос за период открывает только нужные дни и читает
+    их построчно.
+    """
+
+    INDEX_FILE = "index.json"
+
+    def __init__(self, archive_dir: str = "data/archive"):
+        self.archive_dir = Path(archive_dir)
+        self._index: Optional[Dict[str, Dict[str, Any]]] = None
+        self._lock = asyncio.Lock()
+
+    async def write(self, rows: List[Dict[str, Any]]) -> int:
+        """Выгрузка строк таблицы alerts в архив (до их удаления из БД)"""
+        if not rows:
+            return 0
+        async with self._lock:
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(None, self._write, rows)
+
+    async def query(self, start=None, end=None,
+                    limit: int = 50, module: Optional[str] = None) -> List[Dict[str, Any]]:
+        """Алерты из архива за период [start, end), новые первыми (datetime или unix timestamp)"""
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, self._query, _to_datetime(start), _to_datetime(end),
+                                          limit, module)
+
+    def _load_index(self) -> Dict[str, Dict[str, Any]]:
+        if self._index is None:
+            path = self.archive_dir / self.INDEX_FILE
+            try:
+                self._index = json.loads(path.read_text(encoding='utf-8'))
+            except FileNotFoundError:
+                self._index = {}
+        return self._index
+
+    def _save_index(self):
+        """Атомарная запись индекса"""
+        path = self.archive_dir / self.INDEX_FILE
+        tmp_path = path.with_suffix('.tmp')
+        tmp_path.write_text(json.dumps(self._index, ensure_ascii=False, sort_keys=True), encoding='utf-8')
+        os.replace(tmp_path, path)
+
+    def _write(self, rows: List[Dict[str, Any]]) -> int:
+        index = self._load_index()
+
+        by_day: Dict[str, List[Dict[str, Any]]] = {}
+        for row in rows:
+            row = dict(row)
+            row['timestamp'] = str(row['timestamp']).replace(' ', 'T')
+            if isinstance(row.get('data'), str):
+                try:
+                    row['data'] = json.loads(row['data'])
+                except ValueError:
+                    pass
+            by_day.setdefault(row['timestamp'][:10], []).append(row)
+
+        for day, day_rows in by_day.items():
+            relative = Path(day[:4]) / day[5:7] / f"alerts-{day}.ndjson.gz"
+            path = self.archive_dir / relative
+            path.parent.mkdir(parents=True, exist_ok=True)
+
+            with open(path, 'ab') as raw:
+                with gzip.GzipFile(fileobj=raw, mode='ab') as archive_file:
+                    for row in day_rows:
+                        archive_file.write(json.dumps(row, ensure_ascii=False, default=str).encode('utf-8'))
+                        archive_file.write(b"\n")
+                raw.flush()
+                os.fsync(raw.fileno())
+
+            timestamps = [row['timestamp'] for row in day_rows]
+            entry = index.setdefault(day, {'file': relative.as_posix(), 'count': 0,
+                                           'min_ts': min(timestamps), 'max_ts': max(timestamps)})
+            entry['count'] += len(day_rows)
+            entry['min_ts'] = min(entry['min_ts'], *timestamps)
+            entry['max_ts'] = max(entry['max_ts'], *timestamps)
+
+        self._save_index()
+        logger.info(f"🗄️ В архив выгружено алертов: {len(rows)}")
+        return len(rows)
+
+    def _read_day(self, entry: Dict[str, Any]) -> Iterator[Dict[str, Any]]:
+        """Построчное чтение файла дня"""
+        with gzip.open(self.archive_dir / entry['file'], 'rt', encoding='utf-8') as archive_file:
+            for line in archive_file:
+                if line.strip():
+                    yield json.loads(line)
+
+    def _query(self, start: Optional[datetime], end: Optional[datetime],
+               limit: int, module: Optional[str]) -> List[Dict[str, Any]]:
+        index = self._load_index()
+        low = start.isoformat() if start else ""
+        high = end.isoformat() if end else "9999"
+
+        results: List[Dict[str, Any]] = []
+        seen = set()
+        # Дни не пересекаются: идем от новых к старым, пока не наберем limit
+        for day in sorted(index, reverse=True):
+            entry = index[day]
+            if entry['max_ts'] < low or entry['min_ts'] >= high:
+                continue
+
+            matching = (
+                row for row in self._read_day(entry)
+                if low <= row['timestamp'] < high
+                and (module is None or row.get('module') == module)
+            )
+            # В памяти не больше limit строк дня
+            for row in heapq.nlargest(limit - len(results), matching, key=lambda r: r['timestamp']):
+                if row['alert_id'] not in seen:
+                    seen.add(row['alert_id'])
+                    results.append(row)
+
+            if len(results) >= limit:
+                break
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        """Размер архива по индексу"""
+        index = self._load_index()
+        return {
+            'days': len(index),
+            'alerts': sum(entry['count'] for entry in index.values()),
+            'oldest': min(index) if index else None,
+            'newest': max(index) if index else None
+        }
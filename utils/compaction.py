@@ -0,0 +1,189 @@
+"""
+Хранение и сжатие истории алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from datetime import datetime, timedelta
+from typing import Any, Awaitable, Callable, Dict, List, Optional
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class CompactionJob:
+    """Фоновая очистка БД небольшими порциями.
+
+    Обработанные алерты старше ``retention_days`` сворачиваются в почасовые и
+    дневные агрегаты и удаляются, старые проверки модулей и гистограммы времени
+    ответа удаляются, поминутные счетчики статистики старше 30 дней
+    сворачиваются в дневные. Каждая порция - отдельная короткая транзакция,
+    между порциями запись алертов не блокируется.
+    Затем свободные страницы возвращаются файлу (incremental vacuum).
+    """
+
+    STATS_ROLLUP_DAYS = 30
+
+    def __init__(self, database_manager, retention_days: int = 30,
+                 status_retention_days: int = 7, chunk_size: int = 500,
+                 interval: float = 3600, chunk_pause: float = 0.05,
+                 archiver: Optional[Callable[[List[Dict[str, Any]]], Awaitable[Any]]] = None):
+        self.db = database_manager
+        self.retention_days = retention_days
+        self.status_retention_days = status_retention_days
+        self.chunk_size = max(chunk_size, 1)
+        self.interval = interval
+        self.chunk_pause = chunk_pause
+        # Вызывается с порцией строк до их удаления (например, выгрузка в архив)
+        self.archiver = archiver
+
+        self._task: Optional[asyncio.Task] = None
+        self._lock = asyncio.Lock()
+
+        self.progress: Dict[str, Any] = {'stage': 'idle', 'processed': 0}
+        self.stats = {
+            'runs': 0,
+            'last_run_at': None,
+            'last_duration': 0.0,
+            'alerts_compacted': 0,
+            'status_rows_deleted': 0,
+            'latency_rows_deleted': 0,
+            'rollup_rows_compacted': 0,
+            'reclaimed_bytes': 0,
+            'last_error': None
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._lock.locked()
+
+    async def start(self):
+        """Запуск периодической очистки"""
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка (текущая порция завершается транзакцией целиком)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    async def run_once(self) -> Dict[str, Any]:
+        """Один проход очистки"""
+        async with self._lock:
+            started = time.monotonic()
+            try:
+                storage = await self.db.get_storage_info()
+                pages_before = storage['page_count']
+
+                await self._compact_alerts()
+                await self._delete_module_status()
+                await self._delete_latency()
+                await self._compact_stats_rollup()
+
+                self.progress = {'stage': 'vacuum', 'processed': 0}
+                if storage['auto_vacuum'] == 2:
+                    await self._vacuum()
+                await self.db.optimize()
+
+                storage = await self.db.get_storage_info()
+                reclaimed = max(pages_before - storage['page_count'], 0) * storage['page_size']
+                self.stats['reclaimed_bytes'] += reclaimed
+                self.stats['last_error'] = None
+
+                if reclaimed:
+                    logger.info(f"🗜️ Очистка БД: освобождено {reclaimed // 1024} КБ")
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self.stats['last_error'] = str(e)
+                logger.error(f"❌ Ошибка очистки БД: {e}")
+            finally:
+                self.stats['runs'] += 1
+                self.stats['last_run_at'] = datetime.now().isoformat()
+                self.stats['last_duration'] = round(time.monotonic() - started, 3)
+                self.progress = {'stage': 'idle', 'processed': 0}
+
+        return self.get_stats()
+
+    async def _compact_alerts(self):
+        """Свертка и удаление алертов старше срока хранения"""
+        self.progress = {'stage': 'alerts', 'processed': 0}
+        before = (datetime.now() - timedelta(days=self.retention_days)).isoformat()
+
+        while True:
+            rows = await self.db.get_expired_alerts(before, self.chunk_size)
+            if not rows:
+                break
+            if self.archiver:
+                await self.archiver(rows)
+            deleted = await self.db.compact_alerts(rows)
+            self.progress['processed'] += deleted
+            self.stats['alerts_compacted'] += deleted
+            if len(rows) < self.chunk_size:
+                break
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _delete_module_status(self):
+        """Удаление старых проверок модулей"""
+        self.progress = {'stage': 'module_status', 'processed': 0}
+        before = (datetime.now() - timedelta(days=self.status_retention_days)).isoformat()
+
+        while True:
+            deleted = await self.db.delete_old_module_status(before, self.chunk_size)
+            self.progress['processed'] += deleted
+            self.stats['status_rows_deleted'] += deleted
+            if deleted < self.chunk_size:
+                break
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _delete_latency(self):
+        """Удаление старых гистограмм времени ответа (срок - как у проверок модулей)"""
+        self.progress = {'stage': 'latency', 'processed': 0}
+        before_minute = int(time.time() // 60) - self.status_retention_days * 1440
+
+        while True:
+            deleted = await self.db.delete_old_latency(before_minute, self.chunk_size)
+            self.progress['processed'] += deleted
+            self.stats['latency_rows_deleted'] += deleted
+            if deleted < self.chunk_size:
+                break
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _compact_stats_rollup(self):
+        """Свертка старых поминутных счетчиков статистики в дневные"""
+        self.progress = {'stage': 'stats_rollup', 'processed': 0}
+        before_minute = int(time.time() // 60) - self.STATS_ROLLUP_DAYS * 1440
+
+        while True:
+            compacted = await self.db.compact_stats_rollup(before_minute)
+            if not compacted:
+                break
+            self.progress['processed'] += compacted
+            self.stats['rollup_rows_compacted'] += compacted
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _vacuum(self):
+        """Возврат свободных страниц порциями"""
+        while True:
+            storage = await self.db.get_storage_info()
+            if not storage['freelist_count']:
+                break
+            await self.db.incremental_vacuum(self.chunk_size)
+            self.progress['processed'] += min(storage['freelist_count'], self.chunk_size)
+            await asyncio.sleep(self.chunk_pause)
+
+    async def _run(self):
+        """Периодический запуск очистки"""
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.run_once()
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика и текущий этап очистки"""
+        return {**self.stats, 'running': self.is_running, 'progress': dict(self.progress)}
@@ -5,27 +5,61 @@
 import sqlite3
 import asyncio
 import aiosqlite
-from typing import Dict, List, Optional, Any
+from pathlib import Path
+from typing import Dict, List, Optional, Any, Tuple
 from datetime import datetime, timedelta
 import json
 import logging
 
+from .archive import AlertArchive
+from .db_pool import ConnectionPool
+from .ids import AlertIdGenerator, id_range
+from .subscription_index import SubscriptionIndex
+from .write_batcher import WriteBatcher
+
 logger = logging.getLogger('TeBiumAlertBot')
 
 class DatabaseManager:
     """Менеджер базы данных для алертов"""
     
-    def __init__(self, database_url: str):
+    # Фильтры подписок: ключ -> (таблица связей, колонка значения)
+    SUBSCRIPTION_FILTERS = {
+        'types': ('subscription_types', 'alert_type'),
+        'modules': ('subscription_modules', 'module'),
+        'priorities': ('subscription_priorities', 'priority')
+    }
+    
+    def __init__(self, database_url: str, pool_readers: int = 4,
+                 busy_timeout: int = 5000, mmap_size: int = 64 * 1024 * 1024,
+                 batch_interval_ms: int = 20, batch_max_size: int = 200,
+                 node_id: int = 0, archive_dir: Optional[str] = None):
         self.database_url = database_url
         self.db_path = database_url.replace("sqlite:///", "")
+        self.pool = ConnectionPool(
+            self.db_path,
+            readers=pool_readers,
+            busy_timeout=busy_timeout,
+            mmap_size=mmap_size
+        )
+        self.batcher = WriteBatcher(
+            self.pool,
+            flush_interval=batch_interval_ms / 1000,
+            max_batch_size=batch_max_size
+        )
+        self.subscriptions = SubscriptionIndex()
+        self.alert_ids = AlertIdGenerator(node_id)
+        self.archive = AlertArchive(archive_dir) if archive_dir else None
         
     async def init_database(self):
         """Инициализация базы данных"""
         try:
             # Создаем папку для базы данных
-            Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            if not self.pool.in_memory:
+                Path(self.db_path).parent.mkdir(parents=True, exist_ok=True)
+            
+            await self.pool.open()
             
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self.pool.writer() as db:
                 # Таблица алертов
                 await db.execute("""
                     CREATE TABLE IF NOT EXISTS alerts (
@@ -39,10 +73,38 @@ class DatabaseManager:
                         timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
                         sent BOOLEAN DEFAULT FALSE,
                         chat_id TEXT,
-                        message_id INTEGER
+                        message_id INTEGER,
+                        processed_at DATETIME
                     )
                 """)
                 
+                # Миграция: отметка обработки алерта очередью
+                if await self._ensure_column(db, "alerts", "processed_at", "DATETIME"):
+                    # Старые алерты уже обработаны - не отправляем их повторно
+                    await db.execute("""
+                        UPDATE alerts SET processed_at = COALESCE(timestamp, CURRENT_TIMESTAMP)
+                    """)
+                
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alerts_unprocessed 
+                    ON alerts(id) WHERE processed_at IS NULL
+                """)
+                # Подгрузка полосы приоритета очереди
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alerts_unprocessed_priority 
+                    ON alerts(priority, id) WHERE processed_at IS NULL
+                """)
+                
+                # Поиск по alert_id обслуживает индекс ограничения UNIQUE
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alerts_timestamp 
+                    ON alerts(timestamp)
+                """)
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_alerts_module_timestamp 
+                    ON alerts(module, timestamp)
+                """)
+                
                 # Таблица настроек модулей
                 await db.execute("""
                     CREATE TABLE IF NOT EXISTS module_settings (
@@ -68,6 +130,16 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Миграция: одна строка на модуль (раньше каждая проверка добавляла строку)
+                await db.execute("""
+                    DELETE FROM module_status 
+                    WHERE id NOT IN (SELECT MAX(id) FROM module_status GROUP BY module_name)
+                """)
+                await db.execute("""
+                    CREATE UNIQUE INDEX IF NOT EXISTS idx_module_status_name 
+                    ON module_status(module_name)
+                """)
+                
                 # Таблица подписок на алерты
                 await db.execute("""
                     CREATE TABLE IF NOT EXISTS alert_subscriptions (
@@ -81,34 +153,224 @@ class DatabaseManager:
                     )
                 """)
                 
+                # Нормализованные фильтры подписок (нет строк - подходят все значения)
+                for table, column in self.SUBSCRIPTION_FILTERS.values():
+                    await db.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            subscription_id INTEGER NOT NULL 
+                                REFERENCES alert_subscriptions(id) ON DELETE CASCADE,
+                            {column} TEXT NOT NULL,
+                            PRIMARY KEY (subscription_id, {column})
+                        )
+                    """)
+                
+                await self._migrate_subscription_filters(db)
+                
+                # Политика дайджеста: приоритеты, собираемые в сводку, и период в минутах
+                await self._ensure_column(db, "alert_subscriptions", "digest_priorities", "TEXT")
+                await self._ensure_column(db, "alert_subscriptions", "digest_interval", "INTEGER DEFAULT 0")
+                
+                # Снимок состояния rate limit / cooldown
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS rate_limit_state (
+                        module TEXT NOT NULL,
+                        alert_type TEXT NOT NULL,
+                        tat REAL NOT NULL,
+                        last_alert REAL,
+                        PRIMARY KEY (module, alert_type)
+                    )
+                """)
+                
+                # Поминутные счетчики алертов для статистики
+                cursor = await db.execute("""
+                    SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'alert_stats_rollup'
+                """)
+                rollup_exists = await cursor.fetchone() is not None
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS alert_stats_rollup (
+                        minute INTEGER NOT NULL,
+                        type TEXT NOT NULL,
+                        module TEXT NOT NULL,
+                        priority TEXT NOT NULL,
+                        count INTEGER NOT NULL,
+                        PRIMARY KEY (minute, type, module, priority)
+                    ) WITHOUT ROWID
+                """)
+                if not rollup_exists:
+                    # Миграция: счетчики по уже сохраненным алертам (timestamp - локальное время)
+                    await db.execute("""
+                        INSERT INTO alert_stats_rollup (minute, type, module, priority, count)
+                        SELECT CAST(strftime('%s', timestamp, 'utc') AS INTEGER) / 60 AS minute,
+                               type, module, priority, COUNT(*)
+                        FROM alerts 
+                        WHERE strftime('%s', timestamp, 'utc') IS NOT NULL
+                        GROUP BY minute, type, module, priority
+                    """)
+                
+                # Поминутные гистограммы времени ответа модулей (упакованные blob)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS module_latency (
+                        module TEXT NOT NULL,
+                        minute INTEGER NOT NULL,
+                        histogram BLOB NOT NULL,
+                        PRIMARY KEY (module, minute)
+                    ) WITHOUT ROWID
+                """)
+                
+                # Почасовые и дневные агрегаты алертов, удаленных по сроку хранения
+                for table, column in (('alert_rollup_hourly', 'hour'), ('alert_rollup_daily', 'day')):
+                    await db.execute(f"""
+                        CREATE TABLE IF NOT EXISTS {table} (
+                            {column} TEXT NOT NULL,
+                            type TEXT NOT NULL,
+                            module TEXT NOT NULL,
+                            priority TEXT NOT NULL,
+                            count INTEGER NOT NULL,
+                            PRIMARY KEY ({column}, type, module, priority)
+                        ) WITHOUT ROWID
+                    """)
+                
+                # Таблица отложенных повторных отправок
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS delivery_retries (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        alert_id TEXT NOT NULL,
+                        chat_id TEXT NOT NULL,
+                        text TEXT NOT NULL,
+                        attempts INTEGER DEFAULT 0,
+                        next_attempt_at REAL NOT NULL,
+                        last_error TEXT,
+                        created_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Таблица недоставленных сообщений (dead letters)
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS dead_letters (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        alert_id TEXT NOT NULL,
+                        chat_id TEXT NOT NULL,
+                        text TEXT NOT NULL,
+                        attempts INTEGER DEFAULT 0,
+                        last_error TEXT,
+                        failed_at DATETIME DEFAULT CURRENT_TIMESTAMP
+                    )
+                """)
+                
+                # Алерты, ожидающие отправки в дайджесте
+                await db.execute("""
+                    CREATE TABLE IF NOT EXISTS digest_items (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        chat_id TEXT NOT NULL,
+                        alert_id TEXT NOT NULL,
+                        module TEXT NOT NULL,
+                        priority TEXT NOT NULL,
+                        message TEXT NOT NULL,
+                        interval INTEGER NOT NULL,
+                        created_at REAL NOT NULL
+                    )
+                """)
+                
+                # Поиск повторов и dead letters по алерту (статус алерта)
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_delivery_retries_alert 
+                    ON delivery_retries(alert_id)
+                """)
+                await db.execute("""
+                    CREATE INDEX IF NOT EXISTS idx_dead_letters_alert 
+                    ON dead_letters(alert_id)
+                """)
+                
                 await db.commit()
-                logger.info("✅ База данных инициализирована")
+            
+            await self.batcher.start()
+            await self.load_subscriptions()
+            logger.info("✅ База данных инициализирована")
                 
         except Exception as e:
             logger.error(f"❌ Ошибка инициализации БД: {e}")
             raise
     
+    async def _migrate_subscription_filters(self, db):
+        """Перенос фильтров из строковых колонок alert_subscriptions в таблицы связей"""
+        cursor = await db.execute("""
+            SELECT id, alert_types, modules, priority_levels FROM alert_subscriptions 
+            WHERE id NOT IN (SELECT subscription_id FROM subscription_types)
+              AND id NOT IN (SELECT subscription_id FROM subscription_modules)
+              AND id NOT IN (SELECT subscription_id FROM subscription_priorities)
+              AND (alert_types IS NOT NULL OR modules IS NOT NULL OR priority_levels IS NOT NULL)
+        """)
+        rows = await cursor.fetchall()
+        
+        for row in rows:
+            legacy = {
+                'types': row['alert_types'],
+                'modules': row['modules'],
+                'priorities': row['priority_levels']
+            }
+            for key, (table, column) in self.SUBSCRIPTION_FILTERS.items():
+                values = self._split_filter(legacy[key])
+                await db.executemany(
+                    f"INSERT OR IGNORE INTO {table} (subscription_id, {column}) VALUES (?, ?)",
+                    [(row['id'], value) for value in values]
+                )
+        
+        if rows:
+            logger.info(f"🔧 Миграция: перенесены фильтры {len(rows)} подписок")
+    
+    @staticmethod
+    def _split_filter(value: Optional[str]) -> List[str]:
+        """Разбор строкового фильтра 'a,b,c' (также JSON-список)"""
+        if not value:
+            return []
+        if value.startswith('['):
+            try:
+                return [str(item).strip() for item in json.loads(value) if str(item).strip()]
+            except ValueError:
+                pass
+        return [item.strip() for item in value.split(',') if item.strip()]
+    
+    async def _ensure_column(self, db, table: str, column: str, definition: str) -> bool:
+        """Добавление колонки в существующую таблицу, True - если колонка добавлена"""
+        cursor = await db.execute(f"PRAGMA table_info({table})")
+        columns = [row[1] for row in await cursor.fetchall()]
+        if column in columns:
+            return False
+        
+        await db.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+        logger.info(f"🔧 Миграция: добавлена колонка {table}.{column}")
+        return True
+    
+    INSERT_ALERT_SQL = """
+        INSERT INTO alerts 
+        (alert_id, type, priority, module, message, data, timestamp)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """
+    
+    def new_alert_id(self) -> str:
+        """Монотонный идентификатор алерта (ULID с номером узла)"""
+        return self.alert_ids.new_id()
+    
+    def _alert_row(self, alert_id: str, alert_data: Dict[str, Any]) -> tuple:
+        """Строка таблицы alerts из данных алерта"""
+        return (
+            alert_id,
+            alert_data.get('type', 'info'),
+            alert_data.get('priority', 'info'),
+            alert_data.get('module', 'unknown'),
+            alert_data.get('message', ''),
+            json.dumps(alert_data.get('data', {})),
+            alert_data.get('timestamp', datetime.now().isoformat())
+        )
+    
     async def save_alert(self, alert_data: Dict[str, Any]) -> str:
         """Сохранение алерта в базу данных"""
         try:
-            alert_id = f"{alert_data['module']}_{int(datetime.now().timestamp())}"
+            alert_id = self.new_alert_id()
+            
+            # Ждем фиксации пачки, в которую попала запись
+            await self.batcher.execute(self.INSERT_ALERT_SQL, self._alert_row(alert_id, alert_data))
             
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO alerts 
-                    (alert_id, type, priority, module, message, data, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?)
-                """, (
-                    alert_id,
-                    alert_data.get('type', 'info'),
-                    alert_data.get('priority', 'info'),
-                    alert_data.get('module', 'unknown'),
-                    alert_data.get('message', ''),
-                    json.dumps(alert_data.get('data', {})),
-                    alert_data.get('timestamp', datetime.now().isoformat())
-                ))
-                await db.commit()
-                
             logger.info(f"💾 Алерт сохранен: {alert_id}")
             return alert_id
             
@@ -116,25 +378,209 @@ class DatabaseManager:
             logger.error(f"❌ Ошибка сохранения алерта: {e}")
             raise
     
+    async def save_alerts(self, alerts: List[Dict[str, Any]],
+                          alert_ids: Optional[List[str]] = None) -> List[str]:
+        """Сохранение пачки алертов одной транзакцией (идентификаторы можно передать заранее)"""
+        try:
+            if alert_ids is None:
+                alert_ids = [self.new_alert_id() for _ in alerts]
+            
+            await self.batcher.execute_many(self.INSERT_ALERT_SQL, [
+                self._alert_row(alert_id, alert_data)
+                for alert_id, alert_data in zip(alert_ids, alerts)
+            ])
+            
+            logger.info(f"💾 Сохранено алертов: {len(alert_ids)}")
+            return alert_ids
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения пачки алертов: {e}")
+            raise
+    
     async def mark_alert_sent(self, alert_id: str, chat_id: str, message_id: int):
         """Отметка алерта как отправленного"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    UPDATE alerts 
-                    SET sent = TRUE, chat_id = ?, message_id = ?
-                    WHERE alert_id = ?
-                """, (chat_id, message_id, alert_id))
-                await db.commit()
+            self.batcher.execute_later("""
+                UPDATE alerts 
+                SET sent = TRUE, chat_id = ?, message_id = ?
+                WHERE alert_id = ?
+            """, (chat_id, message_id, alert_id))
                 
         except Exception as e:
             logger.error(f"❌ Ошибка обновления статуса алерта: {e}")
     
+    async def mark_alert_processed(self, alert_id: str):
+        """Отметка алерта как обработанного очередью"""
+        try:
+            await self.batcher.execute("""
+                UPDATE alerts SET processed_at = ? WHERE alert_id = ?
+            """, (datetime.now().isoformat(), alert_id))
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка отметки обработки алерта: {e}")
+    
+    async def count_unprocessed_alerts(self) -> int:
+        """Количество необработанных алертов"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute(
+                    "SELECT COUNT(*) FROM alerts WHERE processed_at IS NULL"
+                )
+                row = await cursor.fetchone()
+                return row[0]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка подсчета необработанных алертов: {e}")
+            return 0
+    
+    async def count_unprocessed_by_priority(self) -> Dict[str, int]:
+        """Количество необработанных алертов по приоритетам"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT priority, COUNT(*) FROM alerts 
+                    WHERE processed_at IS NULL 
+                    GROUP BY priority
+                """)
+                return {row[0]: row[1] for row in await cursor.fetchall()}
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка подсчета необработанных алертов: {e}")
+            return {}
+    
+    async def get_unprocessed_alerts(self, limit: int = 1000,
+                                     priorities: Optional[List[str]] = None,
+                                     exclude_priorities: Optional[List[str]] = None) -> List[Dict[str, Any]]:
+        """Получение необработанных алертов в порядке поступления (с фильтром по приоритетам)"""
+        try:
+            conditions = ["processed_at IS NULL"]
+            params: List[Any] = []
+            if priorities:
+                conditions.append(f"priority IN ({','.join('?' * len(priorities))})")
+                params.extend(priorities)
+            if exclude_priorities:
+                conditions.append(f"priority NOT IN ({','.join('?' * len(exclude_priorities))})")
+                params.extend(exclude_priorities)
+            
+            async with self.pool.reader() as db:
+                cursor = await db.execute(f"""
+                    SELECT * FROM alerts 
+                    WHERE {' AND '.join(conditions)} 
+                    ORDER BY id 
+                    LIMIT ?
+                """, (*params, limit))
+                rows = await cursor.fetchall()
+                
+                return [
+                    {
+                        'alert_id': row['alert_id'],
+                        'alert_data': {
+                            'type': row['type'],
+                            'priority': row['priority'],
+                            'module': row['module'],
+                            'message': row['message'],
+                            'data': json.loads(row['data']) if row['data'] else {},
+                            'timestamp': row['timestamp']
+                        }
+                    }
+                    for row in rows
+                ]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения необработанных алертов: {e}")
+            return []
+    
+    async def get_alert_status(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Статус обработки и доставки алерта"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT alert_id, module, type, priority, timestamp, sent, processed_at,
+                        (SELECT COUNT(*) FROM delivery_retries r WHERE r.alert_id = a.alert_id) AS retries,
+                        (SELECT COUNT(*) FROM dead_letters d WHERE d.alert_id = a.alert_id) AS dead_letters
+                    FROM alerts a 
+                    WHERE alert_id = ?
+                """, (alert_id,))
+                row = await cursor.fetchone()
+                
+                if row is None:
+                    return None
+                
+                status = dict(row)
+                status['sent'] = bool(status['sent'])
+                if status['processed_at'] is None:
+                    status['status'] = 'queued'
+                elif status['retries']:
+                    status['status'] = 'retrying'
+                elif status['sent']:
+                    status['status'] = 'delivered'
+                elif status['dead_letters']:
+                    status['status'] = 'failed'
+                else:
+                    # Обработан, но получателей не нашлось
+                    status['status'] = 'processed'
+                return status
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статуса алерта: {e}")
+            return None
+    
+    async def get_alert(self, alert_id: str) -> Optional[Dict[str, Any]]:
+        """Получение алерта по идентификатору"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT alert_id, type, priority, module, message, data, timestamp, sent 
+                    FROM alerts 
+                    WHERE alert_id = ?
+                """, (alert_id,))
+                row = await cursor.fetchone()
+                
+                if row is None:
+                    return None
+                
+                alert = dict(row)
+                alert['data'] = json.loads(alert['data']) if alert['data'] else {}
+                alert['sent'] = bool(alert['sent'])
+                return alert
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения алерта: {e}")
+            return None
+    
+    async def get_alerts_between(self, start, end=None, limit: int = 1000) -> List[Dict[str, Any]]:
+        """Алерты за интервал времени - диапазон по индексу alert_id, затем архив"""
+        try:
+            low, high = id_range(start, end)
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM alerts 
+                    WHERE alert_id >= ? AND alert_id < ? 
+                    ORDER BY alert_id DESC 
+                    LIMIT ?
+                """, (low, high, limit))
+                rows = [dict(row) for row in await cursor.fetchall()]
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения алертов за период: {e}")
+            return []
+        
+        # Алерты старше срока хранения - в архиве; его ошибка не отменяет строки из БД
+        if self.archive and len(rows) < limit:
+            try:
+                known = {row['alert_id'] for row in rows}
+                for row in await self.archive.query(start, end, limit - len(rows)):
+                    if row['alert_id'] not in known:
+                        rows.append(row)
+            except Exception as e:
+                logger.error(f"❌ Ошибка чтения архива алертов: {e}")
+        
+        return rows
+    
     async def get_alert_history(self, limit: int = 50) -> List[Dict[str, Any]]:
         """Получение истории алертов"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.pool.reader() as db:
                 cursor = await db.execute("""
                     SELECT * FROM alerts 
                     ORDER BY timestamp DESC 
@@ -151,12 +597,10 @@ class DatabaseManager:
     async def get_module_status(self) -> Dict[str, Any]:
         """Получение статуса всех модулей"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                db.row_factory = aiosqlite.Row
+            async with self.pool.reader() as db:
                 cursor = await db.execute("""
                     SELECT module_name, status, last_check, response_time
-                    FROM module_status 
-                    ORDER BY last_check DESC
+                    FROM module_status
                 """)
                 rows = await cursor.fetchall()
                 
@@ -184,14 +628,17 @@ class DatabaseManager:
                                  details: Optional[str] = None):
         """Обновление статуса модуля"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    INSERT OR REPLACE INTO module_status 
-                    (module_name, status, last_check, response_time, details)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (module_name, status, datetime.now().isoformat(), 
-                     response_time, details))
-                await db.commit()
+            self.batcher.execute_later("""
+                INSERT INTO module_status 
+                (module_name, status, last_check, response_time, details)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (module_name) DO UPDATE SET 
+                    status = excluded.status,
+                    last_check = excluded.last_check,
+                    response_time = excluded.response_time,
+                    details = excluded.details
+            """, (module_name, status, datetime.now().isoformat(), 
+                 response_time, details))
                 
         except Exception as e:
             logger.error(f"❌ Ошибка обновления статуса модуля: {e}")
@@ -199,7 +646,7 @@ class DatabaseManager:
     async def get_alert_cooldown(self, module: str, alert_type: str) -> bool:
         """Проверка cooldown для алертов"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
+            async with self.pool.reader() as db:
                 cursor = await db.execute("""
                     SELECT last_alert, cooldown FROM module_settings 
                     WHERE module_name = ? AND enabled = TRUE
@@ -225,38 +672,514 @@ class DatabaseManager:
     async def update_alert_cooldown(self, module: str):
         """Обновление времени последнего алерта"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                await db.execute("""
-                    UPDATE module_settings 
-                    SET last_alert = ?
-                    WHERE module_name = ?
-                """, (datetime.now().isoformat(), module))
-                await db.commit()
+            self.batcher.execute_later("""
+                UPDATE module_settings 
+                SET last_alert = ?
+                WHERE module_name = ?
+            """, (datetime.now().isoformat(), module))
                 
         except Exception as e:
             logger.error(f"❌ Ошибка обновления cooldown: {e}")
     
+    async def get_module_cooldowns(self) -> Dict[str, int]:
+        """Cooldown модулей из module_settings"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT module_name, cooldown FROM module_settings 
+                    WHERE enabled = TRUE AND cooldown IS NOT NULL
+                """)
+                rows = await cursor.fetchall()
+                
+                return {row['module_name']: row['cooldown'] for row in rows}
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения cooldown модулей: {e}")
+            return {}
+    
+    async def get_rate_limit_state(self, max_age: int = 3600) -> List[Dict[str, Any]]:
+        """Получение актуального снимка rate limit"""
+        try:
+            since = datetime.now().timestamp() - max_age
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT module, alert_type, tat, last_alert FROM rate_limit_state 
+                    WHERE tat > ? OR last_alert > ?
+                """, (since, since))
+                rows = await cursor.fetchall()
+                
+                return [dict(row) for row in rows]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения состояния rate limit: {e}")
+            return []
+    
+    async def save_rate_limit_state(self, rows: List[tuple]):
+        """Сохранение снимка rate limit: (module, alert_type, tat, last_alert)"""
+        try:
+            for row in rows:
+                self.batcher.execute_later("""
+                    INSERT OR REPLACE INTO rate_limit_state 
+                    (module, alert_type, tat, last_alert)
+                    VALUES (?, ?, ?, ?)
+                """, row)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения состояния rate limit: {e}")
+    
+    async def get_stats_totals(self) -> List[Dict[str, Any]]:
+        """Счетчики алертов за все время по (тип, модуль, приоритет)"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT type, module, priority, SUM(count) AS count 
+                    FROM alert_stats_rollup 
+                    GROUP BY type, module, priority
+                """)
+                rows = await cursor.fetchall()
+                
+                return [dict(row) for row in rows]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статистики: {e}")
+            return []
+    
+    async def get_stats_rollup(self, since_minute: int) -> List[Dict[str, Any]]:
+        """Поминутные счетчики алертов начиная с заданной минуты"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT minute, type, module, priority, count 
+                    FROM alert_stats_rollup 
+                    WHERE minute >= ?
+                """, (since_minute,))
+                rows = await cursor.fetchall()
+                
+                return [dict(row) for row in rows]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения статистики: {e}")
+            return []
+    
+    async def save_stats_rollup(self, rows: List[tuple]):
+        """Сохранение поминутных счетчиков: (minute, type, module, priority, count)"""
+        try:
+            await self.batcher.execute_many("""
+                INSERT INTO alert_stats_rollup (minute, type, module, priority, count)
+                VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (minute, type, module, priority) DO UPDATE SET count = excluded.count
+            """, rows)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения статистики: {e}")
+            raise
+    
+    async def get_latency_histograms(self, since_minute: int) -> List[Dict[str, Any]]:
+        """Гистограммы времени ответа начиная с заданной минуты"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT module, minute, histogram 
+                    FROM module_latency 
+                    WHERE minute >= ?
+                """, (since_minute,))
+                rows = await cursor.fetchall()
+                
+                return [dict(row) for row in rows]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения гистограмм времени ответа: {e}")
+            return []
+    
+    async def save_latency_histograms(self, rows: List[tuple]):
+        """Сохранение гистограмм: (module, minute, histogram)"""
+        try:
+            await self.batcher.execute_many("""
+                INSERT INTO module_latency (module, minute, histogram)
+                VALUES (?, ?, ?)
+                ON CONFLICT (module, minute) DO UPDATE SET histogram = excluded.histogram
+            """, rows)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения гистограмм времени ответа: {e}")
+            raise
+    
+    async def load_subscriptions(self):
+        """Построение индекса маршрутизации из активных подписок"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT id, chat_id, digest_priorities, digest_interval 
+                    FROM alert_subscriptions WHERE enabled = TRUE
+                """)
+                subscriptions = {
+                    row['id']: {'id': row['id'], 'chat_id': row['chat_id'],
+                                'types': [], 'modules': [], 'priorities': [],
+                                'digest_priorities': self._split_filter(row['digest_priorities']),
+                                'digest_interval': row['digest_interval'] or 0}
+                    for row in await cursor.fetchall()
+                }
+                
+                for key, (table, column) in self.SUBSCRIPTION_FILTERS.items():
+                    cursor = await db.execute(f"SELECT subscription_id, {column} FROM {table}")
+                    for row in await cursor.fetchall():
+                        subscription = subscriptions.get(row[0])
+                        if subscription is not None:
+                            subscription[key].append(row[1])
+            
+            self.subscriptions.build(subscriptions.values())
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка загрузки подписок: {e}")
+    
+    async def add_subscription(self, chat_id: str, alert_types: Optional[List[str]] = None,
+                             modules: Optional[List[str]] = None,
+                             priority_levels: Optional[List[str]] = None,
+                             digest_priorities: Optional[List[str]] = None,
+                             digest_interval: int = 0) -> int:
+        """Добавление подписки чата, возвращает id подписки.
+        
+        Алерты с приоритетами из digest_priorities собираются в дайджест,
+        отправляемый раз в digest_interval минут.
+        """
+        try:
+            filters = {
+                'types': alert_types or [],
+                'modules': modules or [],
+                'priorities': priority_levels or []
+            }
+            
+            async with self.pool.writer() as db:
+                cursor = await db.execute("""
+                    INSERT INTO alert_subscriptions 
+                    (chat_id, alert_types, modules, priority_levels, digest_priorities, digest_interval)
+                    VALUES (?, ?, ?, ?, ?, ?)
+                """, (
+                    str(chat_id),
+                    ",".join(filters['types']) or None,
+                    ",".join(filters['modules']) or None,
+                    ",".join(filters['priorities']) or None,
+                    ",".join(digest_priorities or []) or None,
+                    digest_interval if digest_priorities else 0
+                ))
+                subscription_id = cursor.lastrowid
+                
+                for key, (table, column) in self.SUBSCRIPTION_FILTERS.items():
+                    await db.executemany(
+                        f"INSERT OR IGNORE INTO {table} (subscription_id, {column}) VALUES (?, ?)",
+                        [(subscription_id, value) for value in filters[key]]
+                    )
+                await db.commit()
+            
+            self.subscriptions.invalidate()
+            logger.info(f"🔔 Подписка {subscription_id} добавлена для чата {chat_id}")
+            return subscription_id
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка добавления подписки: {e}")
+            raise
+    
+    async def remove_subscriptions(self, chat_id: str) -> int:
+        """Удаление всех подписок чата, возвращает количество удаленных"""
+        try:
+            async with self.pool.writer() as db:
+                for table, _ in self.SUBSCRIPTION_FILTERS.values():
+                    await db.execute(f"""
+                        DELETE FROM {table} WHERE subscription_id IN 
+                        (SELECT id FROM alert_subscriptions WHERE chat_id = ?)
+                    """, (str(chat_id),))
+                cursor = await db.execute(
+                    "DELETE FROM alert_subscriptions WHERE chat_id = ?", (str(chat_id),)
+                )
+                await db.commit()
+            
+            self.subscriptions.invalidate()
+            return cursor.rowcount
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка удаления подписок: {e}")
+            raise
+    
     async def get_subscribed_chats(self, alert_type: str = None, 
-                                 module: str = None) -> List[str]:
+                                 module: str = None,
+                                 priority: str = None) -> List[str]:
         """Получение списка чатов для отправки алертов"""
         try:
-            async with aiosqlite.connect(self.db_path) as db:
-                query = "SELECT chat_id FROM alert_subscriptions WHERE enabled = TRUE"
-                params = []
+            if not self.subscriptions.is_loaded:
+                await self.load_subscriptions()
+            
+            return self.subscriptions.lookup(module, alert_type, priority)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения подписок: {e}")
+            return []
+    
+    async def get_alert_routes(self, alert_type: str = None, module: str = None,
+                               priority: str = None) -> List[Tuple[str, int]]:
+        """Чаты для алерта с периодом дайджеста в минутах (0 - отправка сразу)"""
+        try:
+            if not self.subscriptions.is_loaded:
+                await self.load_subscriptions()
+            
+            return self.subscriptions.lookup_routes(module, alert_type, priority)
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения подписок: {e}")
+            return []
+    
+    async def save_digest_items(self, rows: List[Tuple[str, str, str, str, str, int, float]]) -> List[int]:
+        """Сохранение алертов, ожидающих дайджеста:
+        (chat_id, alert_id, module, priority, message, interval, created_at)"""
+        try:
+            # Все строки попадают в одну пачку записи
+            return list(await asyncio.gather(*(
+                self.batcher.execute("""
+                    INSERT INTO digest_items 
+                    (chat_id, alert_id, module, priority, message, interval, created_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?)
+                """, row)
+                for row in rows
+            )))
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения алертов дайджеста: {e}")
+            raise
+    
+    async def get_digest_items(self) -> List[Dict[str, Any]]:
+        """Все алерты, ожидающие дайджеста, в порядке поступления"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("SELECT * FROM digest_items ORDER BY id")
+                return [dict(row) for row in await cursor.fetchall()]
+                
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения алертов дайджеста: {e}")
+            return []
+    
+    async def delete_digest_items(self, chat_id: str, up_to_id: int):
+        """Удаление алертов, вошедших в отправленный дайджест"""
+        try:
+            self.batcher.execute_later(
+                "DELETE FROM digest_items WHERE chat_id = ? AND id <= ?", (str(chat_id), up_to_id)
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка удаления алертов дайджеста: {e}")
+    
+    async def save_delivery_retry(self, alert_id: str, chat_id: str, text: str,
+                                attempts: int, next_attempt_at: float,
+                                last_error: Optional[str] = None) -> int:
+        """Сохранение повторной отправки, возвращает id записи"""
+        try:
+            return await self.batcher.execute("""
+                INSERT INTO delivery_retries 
+                (alert_id, chat_id, text, attempts, next_attempt_at, last_error)
+                VALUES (?, ?, ?, ?, ?, ?)
+            """, (alert_id, chat_id, text, attempts, next_attempt_at, last_error))
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения повторной отправки: {e}")
+            raise
+    
+    async def update_delivery_retry(self, retry_id: int, attempts: int,
+                                  next_attempt_at: float, last_error: Optional[str] = None):
+        """Обновление счетчика попыток и времени следующей отправки"""
+        try:
+            self.batcher.execute_later("""
+                UPDATE delivery_retries 
+                SET attempts = ?, next_attempt_at = ?, last_error = ?
+                WHERE id = ?
+            """, (attempts, next_attempt_at, last_error, retry_id))
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка обновления повторной отправки: {e}")
+    
+    async def delete_delivery_retry(self, retry_id: int):
+        """Удаление выполненной повторной отправки"""
+        try:
+            self.batcher.execute_later(
+                "DELETE FROM delivery_retries WHERE id = ?", (retry_id,)
+            )
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка удаления повторной отправки: {e}")
+    
+    async def get_pending_retries(self) -> List[Dict[str, Any]]:
+        """Получение всех ожидающих повторных отправок"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM delivery_retries 
+                    ORDER BY next_attempt_at
+                """)
+                rows = await cursor.fetchall()
                 
-                if alert_type:
-                    query += " AND (alert_types IS NULL OR alert_types LIKE ?)"
-                    params.append(f"%{alert_type}%")
+                return [dict(row) for row in rows]
                 
-                if module:
-                    query += " AND (modules IS NULL OR modules LIKE ?)"
-                    params.append(f"%{module}%")
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения повторных отправок: {e}")
+            return []
+    
+    async def save_dead_letter(self, alert_id: str, chat_id: str, text: str,
+                             attempts: int, last_error: Optional[str] = None,
+                             retry_id: Optional[int] = None):
+        """Перенос недоставляемого сообщения в dead letters"""
+        try:
+            self.batcher.execute_later("""
+                INSERT INTO dead_letters 
+                (alert_id, chat_id, text, attempts, last_error)
+                VALUES (?, ?, ?, ?, ?)
+            """, (alert_id, chat_id, text, attempts, last_error))
+            
+            if retry_id is not None:
+                await self.delete_delivery_retry(retry_id)
+            
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения dead letter: {e}")
+    
+    async def get_dead_letters(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Получение последних недоставленных сообщений"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM dead_letters 
+                    ORDER BY id DESC 
+                    LIMIT ?
+                """, (limit,))
+                rows = await cursor.fetchall()
+                
+                return [dict(row) for row in rows]
                 
-                cursor = await db.execute(query, params)
+        except Exception as e:
+            logger.error(f"❌ Ошибка получения dead letters: {e}")
+            return []
+    
+    async def archive_alerts(self, rows: List[Dict[str, Any]]):
+        """Выгрузка строк в архив перед удалением (если архив включен)"""
+        if self.archive:
+            await self.archive.write(rows)
+    
+    async def get_expired_alerts(self, before: str, limit: int = 500) -> List[Dict[str, Any]]:
+        """Обработанные алерты старше заданного времени (по индексу timestamp)"""
+        try:
+            async with self.pool.reader() as db:
+                cursor = await db.execute("""
+                    SELECT * FROM alerts 
+                    WHERE timestamp < ? AND processed_at IS NOT NULL 
+                    ORDER BY timestamp 
+                    LIMIT ?
+                """, (before, limit))
                 rows = await cursor.fetchall()
                 
-                return [row[0] for row in rows]
+                return [dict(row) for row in rows]
                 
         except Exception as e:
-            logger.error(f"❌ Ошибка получения подписок: {e}")
+            logger.error(f"❌ Ошибка получения устаревших алертов: {e}")
             return []
+    
+    async def compact_alerts(self, rows: List[Dict[str, Any]]) -> int:
+        """Перенос алертов в почасовые/дневные агрегаты и удаление исходных строк одной транзакцией"""
+        hourly: Dict[tuple, int] = {}
+        daily: Dict[tuple, int] = {}
+        for row in rows:
+            timestamp = str(row['timestamp']).replace(' ', 'T')
+            key = (row['type'], row['module'], row['priority'])
+            hourly[(timestamp[:13],) + key] = hourly.get((timestamp[:13],) + key, 0) + 1
+            daily[(timestamp[:10],) + key] = daily.get((timestamp[:10],) + key, 0) + 1
+        
+        async with self.pool.writer() as db:
+            await db.execute("BEGIN")
+            for table, column, counts in (('alert_rollup_hourly', 'hour', hourly),
+                                          ('alert_rollup_daily', 'day', daily)):
+                await db.executemany(f"""
+                    INSERT INTO {table} ({column}, type, module, priority, count)
+                    VALUES (?, ?, ?, ?, ?)
+                    ON CONFLICT ({column}, type, module, priority) 
+                    DO UPDATE SET count = count + excluded.count
+                """, [bucket + (count,) for bucket, count in counts.items()])
+            cursor = await db.executemany(
+                "DELETE FROM alerts WHERE id = ?", [(row['id'],) for row in rows]
+            )
+            await db.commit()
+            return cursor.rowcount
+    
+    async def delete_old_module_status(self, before: str, limit: int = 500) -> int:
+        """Удаление старых проверок модулей (последняя запись модуля сохраняется)"""
+        async with self.pool.writer() as db:
+            cursor = await db.execute("""
+                DELETE FROM module_status WHERE id IN (
+                    SELECT id FROM module_status 
+                    WHERE last_check < ? 
+                      AND id NOT IN (SELECT MAX(id) FROM module_status GROUP BY module_name)
+                    LIMIT ?
+                )
+            """, (before, limit))
+            await db.commit()
+            return cursor.rowcount
+    
+    async def delete_old_latency(self, before_minute: int, limit: int = 500) -> int:
+        """Удаление гистограмм времени ответа старше before_minute"""
+        async with self.pool.writer() as db:
+            cursor = await db.execute("""
+                DELETE FROM module_latency WHERE (module, minute) IN (
+                    SELECT module, minute FROM module_latency WHERE minute < ? LIMIT ?
+                )
+            """, (before_minute, limit))
+            await db.commit()
+            return cursor.rowcount
+    
+    async def compact_stats_rollup(self, before_minute: int) -> int:
+        """Свертка поминутных счетчиков старше before_minute в дневные (по одному дню за вызов)"""
+        async with self.pool.writer() as db:
+            cursor = await db.execute("""
+                SELECT MIN(minute) FROM alert_stats_rollup 
+                WHERE minute < ? AND minute % 1440 != 0
+            """, (before_minute,))
+            row = await cursor.fetchone()
+            if row[0] is None:
+                return 0
+            
+            day_start = row[0] - row[0] % 1440
+            day_end = min(day_start + 1440, before_minute)
+            await db.execute("BEGIN")
+            await db.execute("""
+                INSERT INTO alert_stats_rollup (minute, type, module, priority, count)
+                SELECT ?, type, module, priority, SUM(count) FROM alert_stats_rollup 
+                WHERE minute > ? AND minute < ? 
+                GROUP BY type, module, priority
+                ON CONFLICT (minute, type, module, priority) 
+                DO UPDATE SET count = count + excluded.count
+            """, (day_start, day_start, day_end))
+            cursor = await db.execute("""
+                DELETE FROM alert_stats_rollup WHERE minute > ? AND minute < ?
+            """, (day_start, day_end))
+            await db.commit()
+            return cursor.rowcount
+    
+    async def get_storage_info(self) -> Dict[str, int]:
+        """Размер файла БД в страницах и режим auto_vacuum"""
+        async with self.pool.writer() as db:
+            info = {}
+            for pragma in ('page_size', 'page_count', 'freelist_count', 'auto_vacuum'):
+                cursor = await db.execute(f"PRAGMA {pragma}")
+                info[pragma] = (await cursor.fetchone())[0]
+            return info
+    
+    async def incremental_vacuum(self, pages: int = 1000):
+        """Возврат свободных страниц файлу (только при auto_vacuum = INCREMENTAL)"""
+        async with self.pool.writer() as db:
+            cursor = await db.execute(f"PRAGMA incremental_vacuum({int(pages)})")
+            await cursor.fetchall()
+    
+    async def optimize(self):
+        """Обновление статистики планировщика запросов"""
+        async with self.pool.writer() as db:
+            await db.execute("PRAGMA optimize")
+    
+    async def close(self):
+        """Запись накопленных операций и закрытие пула соединений"""
+        try:
+            await self.batcher.stop()
+            await self.pool.close()
+        except Exception as e:
+            logger.error(f"❌ Ошибка закрытия БД: {e}")
@@ -0,0 +1,122 @@
+"""
+Пул соединений SQLite для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import List, Optional
+
+import aiosqlite
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class ConnectionPool:
+    """Долгоживущий пул соединений: один писатель и N читателей в режиме WAL"""
+
+    def __init__(self, db_path: str, readers: int = 4, busy_timeout: int = 5000,
+                 mmap_size: int = 64 * 1024 * 1024, cache_size: int = -16000):
+        self.db_path = db_path
+        self.busy_timeout = busy_timeout
+        self.mmap_size = mmap_size
+        self.cache_size = cache_size
+        # База в памяти существует только в рамках одного соединения
+        self.in_memory = db_path in (":memory:", "")
+        self.readers_count = 0 if self.in_memory else max(readers, 0)
+
+        self._writer: Optional[aiosqlite.Connection] = None
+        self._readers: List[aiosqlite.Connection] = []
+        self._idle_readers: Optional[asyncio.Queue] = None
+        self._write_lock = asyncio.Lock()
+
+    @property
+    def is_open(self) -> bool:
+        return self._writer is not None
+
+    async def open(self):
+        """Открытие соединений и настройка PRAGMA"""
+        if self.is_open:
+            return
+
+        self._writer = await self._connect(read_only=False)
+
+        self._idle_readers = asyncio.Queue()
+        for _ in range(self.readers_count):
+            reader = await self._connect(read_only=True)
+            self._readers.append(reader)
+            self._idle_readers.put_nowait(reader)
+
+        logger.info(f"🔌 Пул соединений открыт: 1 писатель, {self.readers_count} читателей")
+
+    async def _connect(self, read_only: bool) -> aiosqlite.Connection:
+        """Создание соединения с настроенными PRAGMA"""
+        db = await aiosqlite.connect(self.db_path)
+        db.row_factory = aiosqlite.Row
+
+        if not self.in_memory and not read_only:
+            # Действует только для новой (пустой) базы - нужно для incremental_vacuum
+            await db.execute("PRAGMA auto_vacuum=INCREMENTAL")
+            await db.execute("PRAGMA journal_mode=WAL")
+        await db.execute("PRAGMA synchronous=NORMAL")
+        await db.execute(f"PRAGMA busy_timeout={int(self.busy_timeout)}")
+        await db.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        await db.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        await db.execute("PRAGMA temp_store=MEMORY")
+        if read_only:
+            await db.execute("PRAGMA query_only=ON")
+
+        return db
+
+    @asynccontextmanager
+    async def writer(self):
+        """Эксклюзивный доступ к соединению-писателю"""
+        if not self.is_open:
+            raise RuntimeError("Пул соединений не открыт")
+
+        async with self._write_lock:
+            try:
+                yield self._writer
+            except Exception:
+                # Не оставляем незавершенную транзакцию на общем соединении
+                await self._writer.rollback()
+                raise
+
+    @asynccontextmanager
+    async def reader(self):
+        """Соединение для чтения (при отсутствии читателей - писатель)"""
+        if not self.is_open:
+            raise RuntimeError("Пул соединений не открыт")
+
+        if not self.readers_count:
+            async with self.writer() as db:
+                yield db
+            return
+
+        db = await self._idle_readers.get()
+        try:
+            yield db
+        finally:
+            self._idle_readers.put_nowait(db)
+
+    async def close(self):
+        """Закрытие всех соединений пула"""
+        if not self.is_open:
+            return
+
+        async with self._write_lock:
+            for reader in self._readers:
+                try:
+                    await reader.close()
+                except Exception as e:
+                    logger.error(f"❌ Ошибка закрытия соединения-читателя: {e}")
+            self._readers = []
+            self._idle_readers = None
+
+            try:
+                if not self.in_memory:
+                    await self._writer.execute("PRAGMA optimize")
+                await self._writer.close()
+            finally:
+                self._writer = None
+
+        logger.info("🔌 Пул соединений закрыт")
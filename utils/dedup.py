@@ -0,0 +1,189 @@
+"""
+Подавление повторяющихся алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import re
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Sequence
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Изменчивые части текста, которые не должны различать повторы одного алерта
+_NORMALIZERS = (
+    (re.compile(r'\b[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}\b', re.I), '<uuid>'),
+    (re.compile(r'\b\d{1,3}(?:\.\d{1,3}){3}(?::\d+)?\b'), '<ip>'),
+    (re.compile(r'\b(?:0x)?[0-9a-f]*\d[0-9a-f]*\b', re.I), '<n>'),
+    (re.compile(r'\d+'), '<n>'),
+    (re.compile(r'\s+'), ' '),
+)
+
+def message_template(message: str) -> str:
+    """Шаблон сообщения: числа, идентификаторы и адреса заменены метками"""
+    for pattern, placeholder in _NORMALIZERS:
+        message = pattern.sub(placeholder, message)
+    return message.strip().lower()
+
+def alert_fingerprint(alert_data: Dict[str, Any], data_keys: Sequence[str] = ()) -> str:
+    """Отпечаток алерта: модуль, тип, приоритет, шаблон сообщения и выбранные ключи data.
+
+    Приоритет входит в отпечаток, чтобы эскалация (warning -> critical) не
+    считалась повтором и доставлялась сразу, а не в сводке по окончании окна.
+    """
+    data = alert_data.get('data')
+    selected = {key: data.get(key) for key in data_keys} if isinstance(data, dict) and data_keys else {}
+    source = "\x1f".join((
+        str(alert_data.get('module', '')),
+        str(alert_data.get('type', '')),
+        str(alert_data.get('priority', 'info')),
+        message_template(str(alert_data.get('message', ''))),
+        json.dumps(selected, sort_keys=True, default=str) if selected else ''
+    ))
+    return hashlib.blake2b(source.encode('utf-8'), digest_size=8).hexdigest()
+
+class DedupEntry:
+    """Открытое окно агрегации одного отпечатка"""
+
+    __slots__ = ('fingerprint', 'alert_data', 'alert_id', 'first_seen', 'window_start',
+                 'last_seen', 'suppressed', 'total')
+
+    def __init__(self, fingerprint: str, alert_data: Dict[str, Any], now: float):
+        self.fingerprint = fingerprint
+        self.alert_data = alert_data  # последний экземпляр алерта
+        self.alert_id: Optional[str] = None  # доставленный алерт
+        self.first_seen = now
+        self.window_start = now
+        self.last_seen = now
+        self.suppressed = 0  # повторы в текущем окне
+        self.total = 1  # все повторы с первого алерта
+
+class AlertDeduplicator:
+    """Схлопывание повторов алерта в окне агрегации.
+
+    Первый алерт с новым отпечатком доставляется как обычно; повторы в течение
+    ``window`` секунд не сохраняются и не рассылаются, а только считаются. По
+    истечении окна, если повторы были, вызывается ``on_summary`` - одно
+    сообщение со счетчиком вместо каждого повтора, - и открывается следующее
+    окно. Окно без повторов закрывается. Число отпечатков ограничено
+    ``max_entries`` (вытесняются давно не встречавшиеся).
+    """
+
+    def __init__(self, window: float = 300, max_entries: int = 10000,
+                 data_keys: Sequence[str] = (),
+                 on_summary: Optional[Callable[[DedupEntry], Awaitable[Any]]] = None):
+        self.window = window
+        self.max_entries = max(max_entries, 1)
+        self.data_keys = tuple(data_keys)
+        self.on_summary = on_summary
+
+        self.entries: "OrderedDict[str, DedupEntry]" = OrderedDict()
+        self._evicted: List[DedupEntry] = []
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'suppressed': 0, 'summaries': 0, 'evicted': 0}
+
+    @property
+    def enabled(self) -> bool:
+        return self.window > 0
+
+    def fingerprint(self, alert_data: Dict[str, Any]) -> str:
+        return alert_fingerprint(alert_data, self.data_keys)
+
+    def absorb(self, alert_data: Dict[str, Any], now: Optional[float] = None) -> Optional[DedupEntry]:
+        """Учет повтора: возвращает окно, если алерт поглощен (не доставляется)"""
+        if not self.enabled:
+            return None
+        entry = self.entries.get(self.fingerprint(alert_data))
+        if entry is None:
+            return None
+
+        now = now if now is not None else time.time()
+        if now - entry.window_start >= self.window and not entry.suppressed:
+            # Окно закрылось без повторов - это новый инцидент
+            return None
+
+        entry.alert_data = alert_data
+        entry.last_seen = now
+        entry.suppressed += 1
+        entry.total += 1
+        self.entries.move_to_end(entry.fingerprint)
+        self.stats['suppressed'] += 1
+        return entry
+
+    def register(self, alert_data: Dict[str, Any], now: Optional[float] = None) -> Optional[DedupEntry]:
+        """Открытие окна для принятого (доставляемого) алерта"""
+        if not self.enabled:
+            return None
+        fingerprint = self.fingerprint(alert_data)
+        entry = DedupEntry(fingerprint, alert_data, now if now is not None else time.time())
+        previous = self.entries.pop(fingerprint, None)
+        if previous is not None and previous.suppressed:
+            self._evicted.append(previous)
+        self.entries[fingerprint] = entry
+
+        while len(self.entries) > self.max_entries:
+            _, evicted = self.entries.popitem(last=False)
+            self.stats['evicted'] += 1
+            if evicted.suppressed:
+                self._evicted.append(evicted)
+        return entry
+
+    def get(self, alert_data: Dict[str, Any]) -> Optional[DedupEntry]:
+        return self.entries.get(self.fingerprint(alert_data))
+
+    def due(self, now: Optional[float] = None) -> List[DedupEntry]:
+        """Окна с истекшим сроком и повторами; пустые истекшие окна удаляются"""
+        now = now if now is not None else time.time()
+        ready, self._evicted = self._evicted, []
+        for fingerprint, entry in list(self.entries.items()):
+            if now - entry.window_start < self.window:
+                continue
+            if entry.suppressed:
+                ready.append(entry)
+            else:
+                del self.entries[fingerprint]
+        return ready
+
+    async def flush(self, now: Optional[float] = None) -> int:
+        """Отправка сводок по закрывшимся окнам"""
+        now = now if now is not None else time.time()
+        ready = self.due(now)
+        for entry in ready:
+            try:
+                if self.on_summary:
+                    await self.on_summary(entry)
+                self.stats['summaries'] += 1
+            except Exception as e:
+                # Счетчик сохраняется: сводка уйдет при следующей проверке
+                logger.error(f"❌ Ошибка отправки сводки повторов {entry.fingerprint}: {e}")
+                continue
+            # Следующее окно: повторы, пришедшие дальше, попадут в новую сводку
+            entry.suppressed = 0
+            entry.window_start = now
+        return len(ready)
+
+    async def start(self):
+        """Запуск периодической проверки окон"""
+        if self._task is None and self.enabled and self.on_summary is not None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка с отправкой накопленных сводок"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self.enabled:
+            await self.flush(now=float('inf'))
+
+    async def _run(self):
+        interval = min(max(self.window / 10, 1), 30)
+        while True:
+            await asyncio.sleep(interval)
+            await self.flush()
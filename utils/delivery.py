@@ -0,0 +1,298 @@
+"""
+Движок доставки сообщений в Telegram для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional
+
+from .alert_queue import LANES, lane_of
+logger = logging.getLogger('TeBiumAlertBot')
+
+class TokenBucket:
+    """Token bucket с монотонным временем"""
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now: float):
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def delay(self) -> float:
+        """Время ожидания до появления токена (0 - токен есть)"""
+        self._refill(time.monotonic())
+        if self.tokens >= 1:
+            return 0.0
+        return (1 - self.tokens) / self.rate
+
+    def consume(self):
+        """Списание токена"""
+        self._refill(time.monotonic())
+        self.tokens -= 1
+
+    def block(self, seconds: float):
+        """Блокировка на заданное время (например, по flood-wait от Telegram)"""
+        self._refill(time.monotonic())
+        self.tokens = min(self.tokens, 1 - seconds * self.rate)
+
+    async def acquire(self):
+        """Ожидание и списание токена"""
+        while True:
+            wait = self.delay()
+            if wait <= 0:
+                self.consume()
+                return
+            await asyncio.sleep(wait)
+
+class Delivery:
+    """Задание на отправку одного сообщения в один чат"""
+
+    __slots__ = ('alert_id', 'chat_id', 'text', 'reply_markup', 'payload', 'lane', 'created_at')
+
+    def __init__(self, alert_id: str, chat_id: str, text: str,
+                 reply_markup: Optional[Any] = None, payload: Optional[Dict[str, Any]] = None,
+                 lane: str = 'info'):
+        self.alert_id = alert_id
+        self.chat_id = str(chat_id)
+        self.text = text
+        self.reply_markup = reply_markup
+        self.payload = payload or {}
+        self.lane = lane_of(lane)  # Полоса приоритета в очереди чата
+        self.created_at = time.monotonic()
+
+class ChatQueue:
+    """Очередь сообщений одного чата по полосам приоритета.
+
+    Первым уходит сообщение самой срочной непустой полосы, внутри полосы
+    сохраняется порядок постановки. Лимит чата (~1 сообщение/с) - главное
+    узкое место, поэтому critical не ждет накопленные в чате info.
+    """
+
+    __slots__ = ('lanes', 'size')
+
+    def __init__(self):
+        self.lanes: Dict[str, Deque[Delivery]] = {}
+        self.size = 0
+
+    def __len__(self) -> int:
+        return self.size
+
+    def append(self, delivery: Delivery):
+        lane = self.lanes.get(delivery.lane)
+        if lane is None:
+            lane = self.lanes[delivery.lane] = deque()
+        lane.append(delivery)
+        self.size += 1
+
+    def popleft(self) -> Delivery:
+        for name in LANES:
+            lane = self.lanes.get(name)
+            if lane:
+                self.size -= 1
+                return lane.popleft()
+        raise IndexError("pop from an empty ChatQueue")
+
+class DeliveryEngine:
+    """Пул воркеров для параллельной отправки с сохранением порядка в каждом чате"""
+
+    def __init__(self, sender: Callable[[Delivery], Awaitable[Any]], workers: int = 8,
+                 global_rate: float = 30, chat_rate: float = 1, group_rate_per_minute: float = 20,
+                 max_idle_chats: int = 10000,
+                 on_success: Optional[Callable[[Delivery], Awaitable[Any]]] = None,
+                 on_failure: Optional[Callable[[Delivery, Exception], Awaitable[Any]]] = None):
+        self.sender = sender
+        self.on_success = on_success
+        self.on_failure = on_failure
+        self.workers_count = max(workers, 1)
+        self.chat_rate = chat_rate
+        self.group_rate_per_minute = group_rate_per_minute
+        self.max_idle_chats = max_idle_chats
+
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_buckets: "OrderedDict[str, List[TokenBucket]]" = OrderedDict()  # LRU по последней отправке
+
+        # Очередь заданий каждого чата и очередь чатов, готовых к отправке.
+        # Чат находится в работе не более чем у одного воркера - так сохраняется порядок.
+        self.chat_queues: Dict[str, ChatQueue] = {}
+        self.active_chats = set()
+        self.ready_chats: asyncio.Queue = asyncio.Queue()
+        self.workers: List[asyncio.Task] = []
+
+        self.stats = {
+            'queued': 0,
+            'sent': 0,
+            'failed': 0,
+            'in_flight': 0,
+            'total_latency': 0.0,
+            'started_at': None
+        }
+        self._recent_sent: Deque[float] = deque(maxlen=4096)
+
+    @property
+    def is_running(self) -> bool:
+        return bool(self.workers)
+
+    async def start(self):
+        """Запуск воркеров доставки"""
+        if self.is_running:
+            return
+        self.stats['started_at'] = time.monotonic()
+        self.workers = [
+            asyncio.create_task(self._worker(i)) for i in range(self.workers_count)
+        ]
+        logger.info(f"📤 Движок доставки запущен: {self.workers_count} воркеров")
+
+    async def stop(self, timeout: float = 10):
+        """Остановка воркеров с ожиданием отправки очереди"""
+        if not self.is_running:
+            return
+
+        try:
+            await asyncio.wait_for(self.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning(f"⚠️ Не отправлено при остановке: {self.pending()} сообщений")
+
+        for task in self.workers:
+            task.cancel()
+        await asyncio.gather(*self.workers, return_exceptions=True)
+        self.workers = []
+        logger.info("📤 Движок доставки остановлен")
+
+    def submit(self, delivery: Delivery):
+        """Постановка сообщения в очередь чата (в полосу delivery.lane)"""
+        chat_queue = self.chat_queues.get(delivery.chat_id)
+        if chat_queue is None:
+            chat_queue = self.chat_queues[delivery.chat_id] = ChatQueue()
+
+        chat_queue.append(delivery)
+        self.stats['queued'] += 1
+
+        if delivery.chat_id not in self.active_chats:
+            self.active_chats.add(delivery.chat_id)
+            self.ready_chats.put_nowait(delivery.chat_id)
+
+    def pending(self) -> int:
+        """Количество сообщений, ожидающих отправки"""
+        return sum(len(q) for q in self.chat_queues.values()) + self.stats['in_flight']
+
+    async def join(self):
+        """Ожидание отправки всех поставленных сообщений"""
+        while self.pending():
+            await asyncio.sleep(0.01)
+
+    def pause_chat(self, chat_id: str, seconds: float):
+        """Приостановка отправки в чат (ответ 429 / RetryAfter)"""
+        for bucket in self._chat_limits(str(chat_id)):
+            bucket.block(seconds)
+
+    def _chat_limits(self, chat_id: str) -> List[TokenBucket]:
+        """Лимиты чата: ~1 сообщение/с, для групп дополнительно ~20/мин"""
+        buckets = self.chat_buckets.get(chat_id)
+        if buckets is not None:
+            self.chat_buckets.move_to_end(chat_id)
+            return buckets
+
+        buckets = [TokenBucket(self.chat_rate, 1)]
+        if chat_id.startswith('-'):
+            buckets.append(TokenBucket(self.group_rate_per_minute / 60,
+                                       self.group_rate_per_minute))
+        self.chat_buckets[chat_id] = buckets
+        self._evict_idle_buckets()
+        return buckets
+
+    def _evict_idle_buckets(self):
+        """Удаление лимитов давно неактивных чатов (от давно не использованных)"""
+        excess = len(self.chat_buckets) - self.max_idle_chats
+        if excess <= 0:
+            return
+        for chat_id in list(self.chat_buckets):
+            if excess <= 0:
+                break
+            if chat_id not in self.active_chats:
+                del self.chat_buckets[chat_id]
+                excess -= 1
+
+    def _release_chat(self, chat_id: str):
+        """Возврат чата в очередь готовых или снятие с обработки"""
+        if self.chat_queues.get(chat_id):
+            self.ready_chats.put_nowait(chat_id)
+        else:
+            self.chat_queues.pop(chat_id, None)
+            self.active_chats.discard(chat_id)
+
+    async def _worker(self, number: int):
+        """Воркер: берет готовый чат и отправляет самое срочное сообщение его очереди"""
+        loop = asyncio.get_running_loop()
+
+        while True:
+            chat_id = await self.ready_chats.get()
+            try:
+                # Лимит чата еще не восстановился - возвращаем чат позже, не занимая воркер
+                buckets = self._chat_limits(chat_id)
+                wait = max(bucket.delay() for bucket in buckets)
+                if wait > 0:
+                    loop.call_later(wait, self.ready_chats.put_nowait, chat_id)
+                    continue
+
+                delivery = self.chat_queues[chat_id].popleft()
+                for bucket in buckets:
+                    bucket.consume()
+
+                self.stats['in_flight'] += 1
+                try:
+                    error = None
+                    try:
+                        await self.global_bucket.acquire()
+                        await self.sender(delivery)
+                    except asyncio.CancelledError:
+                        raise
+                    except Exception as e:
+                        error = e
+
+                    if error is None:
+                        now = time.monotonic()
+                        self.stats['sent'] += 1
+                        self.stats['total_latency'] += now - delivery.created_at
+                        self._recent_sent.append(now)
+                        if self.on_success:
+                            await self.on_success(delivery)
+                    else:
+                        self.stats['failed'] += 1
+                        logger.error(f"❌ Ошибка отправки в чат {chat_id}: {error}")
+                        if self.on_failure:
+                            await self.on_failure(delivery, error)
+                finally:
+                    self.stats['in_flight'] -= 1
+
+                self._release_chat(chat_id)
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка воркера доставки #{number}: {e}")
+                self._release_chat(chat_id)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Статистика пропускной способности"""
+        now = time.monotonic()
+        sent = self.stats['sent']
+        uptime = now - self.stats['started_at'] if self.stats['started_at'] else 0
+        last_minute = sum(1 for ts in self._recent_sent if now - ts <= 60)
+
+        return {
+            'workers': len(self.workers),
+            'queued_total': self.stats['queued'],
+            'pending': self.pending(),
+            'active_chats': len(self.active_chats),
+            'sent': sent,
+            'failed': self.stats['failed'],
+            'avg_latency_ms': round(self.stats['total_latency'] / sent * 1000, 2) if sent else 0,
+            'throughput_per_sec': round(sent / uptime, 2) if uptime else 0,
+            'sent_last_minute': last_minute
+        }
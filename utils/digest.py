@@ -0,0 +1,197 @@
+"""
+Дайджесты алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from collections import Counter
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from .dedup import message_template
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Префикс идентификатора доставки дайджеста (отличает его от алертов при отправке и повторах)
+DIGEST_ID_PREFIX = 'digest-'
+
+class ModuleDigest:
+    """Алерты одного модуля в дайджесте: счетчики и примеры сообщений"""
+
+    __slots__ = ('count', 'priorities', 'messages')
+
+    def __init__(self):
+        self.count = 0
+        self.priorities: Counter = Counter()
+        self.messages: Dict[str, List[Any]] = {}  # шаблон -> [число, последний текст]
+
+class ChatDigest:
+    """Накопленный дайджест одного чата"""
+
+    def __init__(self, chat_id: str, interval: int, opened_at: float):
+        self.chat_id = chat_id
+        self.interval = interval  # минуты
+        self.opened_at = opened_at
+        self.total = 0
+        self.last_item_id = 0
+        self.modules: Dict[str, ModuleDigest] = {}
+
+    @property
+    def due_at(self) -> float:
+        return self.opened_at + self.interval * 60
+
+class DigestBuffer:
+    """Буфер дайджестов по чатам.
+
+    Алерты, которые подписка чата собирает в дайджест, копятся здесь (и в
+    таблице digest_items - для восстановления после перезапуска). Через
+    ``interval`` минут после первого алерта чату уходит один дайджест через
+    ``on_flush``, поэтому число сообщений ограничено частотой дайджестов, а не
+    потоком алертов. Для каждого модуля хранится не больше
+    ``max_messages_per_module`` разных сообщений.
+    """
+
+    def __init__(self, database_manager,
+                 on_flush: Optional[Callable[[ChatDigest], Awaitable[Any]]] = None,
+                 top_messages: int = 3, max_messages_per_module: int = 50,
+                 check_interval: float = 30):
+        self.db = database_manager
+        self.on_flush = on_flush
+        self.top_messages = top_messages
+        self.max_messages_per_module = max_messages_per_module
+        self.check_interval = check_interval
+
+        self.chats: Dict[str, ChatDigest] = {}
+        self._task: Optional[asyncio.Task] = None
+        self.stats = {'buffered': 0, 'digests': 0}
+
+    def pending(self) -> int:
+        """Алерты, ожидающие дайджеста (по всем чатам)"""
+        return sum(digest.total for digest in self.chats.values())
+
+    async def add(self, alert_id: str, alert_data: Dict[str, Any], routes: List[Tuple[str, int]]):
+        """Сохранение алерта в дайджесты чатов: routes - (чат, период в минутах)"""
+        now = time.time()
+        module = alert_data.get('module', 'unknown')
+        priority = alert_data.get('priority', 'info')
+        message = str(alert_data.get('message', ''))
+
+        item_ids = await self.db.save_digest_items([
+            (chat_id, alert_id, module, priority, message, interval, now)
+            for chat_id, interval in routes
+        ])
+        for (chat_id, interval), item_id in zip(routes, item_ids):
+            self._add(chat_id, interval, module, priority, message, item_id, now)
+
+    def _add(self, chat_id: str, interval: int, module: str, priority: str,
+             message: str, item_id: int, now: float):
+        digest = self.chats.get(chat_id)
+        if digest is None:
+            digest = self.chats[chat_id] = ChatDigest(chat_id, interval, now)
+        else:
+            digest.interval = min(digest.interval, interval)
+
+        entry = digest.modules.get(module)
+        if entry is None:
+            entry = digest.modules[module] = ModuleDigest()
+        entry.count += 1
+        entry.priorities[priority] += 1
+
+        template = message_template(message)
+        sample = entry.messages.get(template)
+        if sample is not None:
+            sample[0] += 1
+            sample[1] = message
+        elif len(entry.messages) < self.max_messages_per_module:
+            entry.messages[template] = [1, message]
+
+        digest.total += 1
+        digest.last_item_id = max(digest.last_item_id, item_id)
+        self.stats['buffered'] += 1
+
+    async def load(self):
+        """Восстановление неотправленных дайджестов из БД"""
+        items = await self.db.get_digest_items()
+        for item in items:
+            self._add(item['chat_id'], item['interval'], item['module'], item['priority'],
+                      item['message'], item['id'], item['created_at'])
+        if items:
+            logger.info(f"📬 Восстановлено алертов для дайджестов: {len(items)} ({len(self.chats)} чатов)")
+
+    def summary(self, digest: ChatDigest) -> Dict[str, Any]:
+        """Данные для AlertTemplates.format_digest"""
+        modules = []
+        for module, entry in sorted(digest.modules.items(), key=lambda item: -item[1].count):
+            top = sorted(entry.messages.values(), key=lambda sample: -sample[0])
+            shown = top[:self.top_messages]
+            modules.append({
+                'module': module,
+                'count': entry.count,
+                'priorities': dict(entry.priorities.most_common()),
+                'top': [(message, count) for count, message in shown],
+                'other_messages': entry.count - sum(count for count, _ in shown)
+            })
+        return {'interval': digest.interval, 'total': digest.total, 'modules': modules}
+
+    async def flush(self, now: Optional[float] = None) -> int:
+        """Отправка дайджестов, срок которых наступил"""
+        now = now if now is not None else time.time()
+        sent = 0
+        for chat_id, digest in list(self.chats.items()):
+            if digest.due_at > now:
+                continue
+            # Алерты, пришедшие во время отправки, откроют новый дайджест
+            del self.chats[chat_id]
+            try:
+                if self.on_flush:
+                    await self.on_flush(digest)
+                await self.db.delete_digest_items(chat_id, digest.last_item_id)
+            except Exception as e:
+                # Дайджест возвращается в буфер и уйдет при следующей проверке
+                logger.error(f"❌ Ошибка отправки дайджеста в чат {chat_id}: {e}")
+                self._restore(digest)
+                continue
+            self.stats['digests'] += 1
+            sent += 1
+        return sent
+
+    def _restore(self, digest: ChatDigest):
+        """Возврат неотправленного дайджеста с объединением новых алертов"""
+        newer = self.chats.get(digest.chat_id)
+        self.chats[digest.chat_id] = digest
+        if newer is None:
+            return
+        digest.total += newer.total
+        digest.last_item_id = max(digest.last_item_id, newer.last_item_id)
+        for module, entry in newer.modules.items():
+            target = digest.modules.setdefault(module, ModuleDigest())
+            target.count += entry.count
+            target.priorities.update(entry.priorities)
+            for template, (count, message) in entry.messages.items():
+                sample = target.messages.get(template)
+                if sample is not None:
+                    sample[0] += count
+                    sample[1] = message
+                elif len(target.messages) < self.max_messages_per_module:
+                    target.messages[template] = [count, message]
+
+    async def start(self):
+        """Восстановление и запуск периодической отправки"""
+        await self.load()
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка; накопленное остается в БД до следующего запуска"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.check_interval)
+            await self.flush()
@@ -0,0 +1,150 @@
+"""
+Периодическая проверка здоровья модулей для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import aiohttp
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# (статус, время ответа в секундах, детали)
+ProbeResult = Tuple[str, Optional[float], Optional[str]]
+
+class HealthChecker:
+    """Параллельные проверки health-эндпоинтов через одну общую ClientSession.
+
+    Циклы запускаются по монотонным часам с фиксированным шагом ``interval``
+    (без накопления дрейфа), старт каждой проверки внутри цикла смещается на
+    случайный jitter, число одновременных запросов ограничено ``concurrency``.
+    """
+
+    def __init__(self, endpoints: Dict[str, str],
+                 on_result: Callable[[str, str, Optional[float], Optional[str]], Awaitable[Any]],
+                 interval: float = 60, timeout: float = 10, concurrency: int = 50,
+                 jitter: float = 0.1):
+        self.endpoints = dict(endpoints)
+        self.on_result = on_result
+        self.interval = interval
+        self.timeout = aiohttp.ClientTimeout(total=timeout)
+        self.concurrency = max(concurrency, 1)
+        self.jitter = jitter
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._semaphore = asyncio.Semaphore(self.concurrency)
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {'cycles': 0, 'probes': 0, 'failures': 0, 'skipped_cycles': 0,
+                      'last_cycle_duration': 0.0}
+
+    async def start(self):
+        """Запуск периодических проверок"""
+        if self._task is not None or not self.endpoints or self.interval <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"🩺 Проверка модулей запущена: {len(self.endpoints)} эндпоинтов, "
+                    f"каждые {self.interval}с")
+
+    async def stop(self):
+        """Остановка проверок и закрытие сессии"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+
+    def _get_session(self) -> aiohttp.ClientSession:
+        """Общая сессия с пулом keep-alive соединений и кэшем DNS"""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.concurrency,
+                ttl_dns_cache=300,
+                keepalive_timeout=max(self.interval * 2, 30)
+            )
+            self._session = aiohttp.ClientSession(connector=connector, timeout=self.timeout)
+        return self._session
+
+    async def probe(self, health_url: str) -> ProbeResult:
+        """Один запрос к health-эндпоинту"""
+        async with self._semaphore:
+            started = time.monotonic()
+            try:
+                async with self._get_session().get(health_url) as response:
+                    await response.read()
+                    response_time = time.monotonic() - started
+                    if response.status == 200:
+                        return "online", response_time, None
+                    return "error", response_time, f"HTTP {response.status}"
+
+            except asyncio.TimeoutError:
+                return "timeout", None, "Timeout"
+            except aiohttp.ClientError as e:
+                return "error", None, str(e) or type(e).__name__
+
+    async def check(self, module_name: str, health_url: str, delay: float = 0) -> ProbeResult:
+        """Проверка модуля с передачей результата в on_result"""
+        if delay:
+            await asyncio.sleep(delay)
+
+        result = await self.probe(health_url)
+        self.stats['probes'] += 1
+        if result[0] != "online":
+            self.stats['failures'] += 1
+
+        try:
+            await self.on_result(module_name, *result)
+        except Exception as e:
+            logger.error(f"❌ Ошибка обработки проверки модуля {module_name}: {e}")
+        return result
+
+    async def check_all(self, spread: float = 0) -> Dict[str, ProbeResult]:
+        """Проверка всех модулей параллельно (spread - максимальное смещение старта)"""
+        names = list(self.endpoints)
+        results = await asyncio.gather(*(
+            self.check(name, self.endpoints[name], random.uniform(0, spread) if spread else 0)
+            for name in names
+        ), return_exceptions=True)
+
+        checked = {}
+        for name, result in zip(names, results):
+            if isinstance(result, Exception):
+                logger.error(f"❌ Ошибка проверки модуля {name}: {result}")
+                result = ("error", None, str(result))
+            checked[name] = result
+        return checked
+
+    async def _run(self):
+        """Циклы проверок с фиксированным шагом по монотонным часам"""
+        next_run = time.monotonic()
+        while True:
+            started = time.monotonic()
+            try:
+                await self.check_all(spread=self.interval * self.jitter)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка цикла проверки модулей: {e}")
+
+            now = time.monotonic()
+            self.stats['cycles'] += 1
+            self.stats['last_cycle_duration'] = round(now - started, 3)
+
+            next_run += self.interval
+            if next_run <= now:
+                # Цикл не уложился в интервал - пропускаем просроченные запуски
+                missed = int((now - next_run) // self.interval) + 1
+                self.stats['skipped_cycles'] += missed
+                next_run += missed * self.interval
+                logger.warning(f"⚠️ Проверка модулей заняла {now - started:.1f}с, "
+                               f"пропущено циклов: {missed}")
+
+            await asyncio.sleep(next_run - now)
@@ -0,0 +1,150 @@
+"""
+Машина состояний здоровья модулей для TeBium Alert Bot
+"""
+
+import logging
+import time
+from collections import deque
+from typing import Any, Deque, Dict, Optional
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+ONLINE = "online"
+DEGRADED = "degraded"
+DOWN = "down"
+UNKNOWN = "unknown"
+
+class ModuleHealth:
+    """Состояние одного модуля: окно последних проверок и история переходов"""
+
+    __slots__ = ('state', 'results', 'consecutive_ok', 'transitions', 'flapping',
+                 'last_check', 'last_status', 'response_time', 'details', 'changed_at')
+
+    def __init__(self, window: int):
+        self.state = UNKNOWN
+        self.results: Deque[bool] = deque(maxlen=window)
+        self.consecutive_ok = 0
+        self.transitions: Deque[float] = deque()
+        self.flapping = False
+        self.last_check: Optional[float] = None
+        self.last_status: Optional[str] = None
+        self.response_time: Optional[float] = None
+        self.details: Optional[str] = None
+        self.changed_at: Optional[float] = None
+
+class HealthTransition:
+    """Смена состояния модуля"""
+
+    __slots__ = ('module', 'old_state', 'new_state', 'notify', 'flapping')
+
+    def __init__(self, module: str, old_state: str, new_state: str, notify: bool, flapping: bool):
+        self.module = module
+        self.old_state = old_state
+        self.new_state = new_state
+        self.notify = notify
+        self.flapping = flapping
+
+class HealthStateMachine:
+    """online -> degraded -> down с подтверждением N из M и подавлением флаппинга.
+
+    Из последних ``window`` проверок ``degraded_after`` неудачных переводят модуль
+    в degraded, ``down_after`` - в down. Возврат в online - после
+    ``recover_after`` успешных проверок подряд. Если за ``flap_interval`` секунд
+    было ``flap_threshold`` переходов, модуль считается флапающим: уведомления о
+    переходах не отправляются, пока состояние не стабилизируется.
+    """
+
+    def __init__(self, window: int = 5, degraded_after: int = 2, down_after: int = 3,
+                 recover_after: int = 3, flap_threshold: int = 4, flap_interval: float = 900):
+        self.window = max(window, 1)
+        self.degraded_after = degraded_after
+        self.down_after = max(down_after, degraded_after)
+        self.recover_after = recover_after
+        self.flap_threshold = flap_threshold
+        self.flap_interval = flap_interval
+
+        self.modules: Dict[str, ModuleHealth] = {}
+
+    def observe(self, module: str, status: str, response_time: Optional[float] = None,
+                details: Optional[str] = None) -> Optional[HealthTransition]:
+        """Учет результата проверки; возвращает переход, если состояние изменилось"""
+        health = self.modules.get(module)
+        if health is None:
+            health = self.modules[module] = ModuleHealth(self.window)
+
+        now = time.time()
+        ok = status == ONLINE
+        health.results.append(ok)
+        health.consecutive_ok = health.consecutive_ok + 1 if ok else 0
+        health.last_check = now
+        health.last_status = status
+        health.response_time = response_time
+        health.details = details
+
+        new_state = self._target_state(health)
+        was_flapping = health.flapping
+        self._expire_transitions(health, now)
+        health.flapping = len(health.transitions) >= self.flap_threshold
+
+        if new_state == health.state:
+            if was_flapping and not health.flapping:
+                # Флаппинг закончился - сообщаем итоговое состояние
+                return HealthTransition(module, health.state, health.state, True, False)
+            return None
+
+        old_state = health.state
+        health.state = new_state
+        health.changed_at = now
+        if new_state == ONLINE:
+            # Восстановление подтверждено - старые ошибки больше не учитываются
+            health.results.clear()
+            health.results.extend([True] * health.consecutive_ok)
+
+        # Первое наблюдение online после старта - не событие
+        if old_state == UNKNOWN and new_state == ONLINE:
+            return HealthTransition(module, old_state, new_state, False, False)
+
+        health.transitions.append(now)
+        health.flapping = len(health.transitions) >= self.flap_threshold
+        notify = not health.flapping or not was_flapping
+        return HealthTransition(module, old_state, new_state, notify, health.flapping)
+
+    def _target_state(self, health: ModuleHealth) -> str:
+        """Состояние по окну последних проверок"""
+        if health.state in (DEGRADED, DOWN) and health.consecutive_ok >= self.recover_after:
+            return ONLINE
+
+        failures = sum(1 for ok in health.results if not ok)
+        if failures >= self.down_after:
+            return DOWN
+        if failures >= self.degraded_after:
+            return DOWN if health.state == DOWN else DEGRADED
+        if health.state == UNKNOWN and health.consecutive_ok:
+            return ONLINE
+        return health.state
+
+    def _expire_transitions(self, health: ModuleHealth, now: float):
+        while health.transitions and now - health.transitions[0] > self.flap_interval:
+            health.transitions.popleft()
+
+    def restore(self, module: str, state: str):
+        """Восстановление состояния из БД после перезапуска"""
+        health = self.modules.get(module)
+        if health is None:
+            health = self.modules[module] = ModuleHealth(self.window)
+        if state in (ONLINE, DEGRADED, DOWN):
+            health.state = state
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        """Текущее состояние модулей для отображения"""
+        return {
+            module: {
+                'status': health.state,
+                'last_status': health.last_status,
+                'last_check': health.last_check,
+                'response_time': health.response_time,
+                'details': health.details,
+                'flapping': health.flapping
+            }
+            for module, health in self.modules.items()
+        }
@@ -0,0 +1,80 @@
+"""
+Генерация идентификаторов алертов для TeBium Alert Bot
+"""
+
+import random
+import time
+from datetime import datetime
+from typing import Optional, Tuple
+
+# Алфавит Crockford Base32 (без I, L, O, U)
+ENCODING = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+DECODING = {char: index for index, char in enumerate(ENCODING)}
+
+ID_LENGTH = 26
+TIMESTAMP_BITS = 48
+NODE_BITS = 10
+COUNTER_BITS = 70
+
+def _encode(value: int, length: int) -> str:
+    """Кодирование числа в Crockford Base32 фиксированной длины"""
+    chars = []
+    for _ in range(length):
+        value, index = divmod(value, 32)
+        chars.append(ENCODING[index])
+    return ''.join(reversed(chars))
+
+def _to_ms(moment) -> int:
+    """Время (datetime или unix timestamp) в миллисекундах"""
+    if isinstance(moment, datetime):
+        moment = moment.timestamp()
+    return int(moment * 1000)
+
+class AlertIdGenerator:
+    """Монотонные идентификаторы в формате ULID (26 символов Crockford Base32).
+
+    Раскладка 128 бит: 48 бит времени в мс, 10 бит номера узла, 70 бит счетчика.
+    В пределах одной миллисекунды счетчик увеличивается, поэтому идентификаторы
+    одного узла не совпадают и строго возрастают, а разные узлы (NODE_ID) не
+    пересекаются. Сортировка строк совпадает с порядком создания, поэтому
+    выборка за интервал времени - это диапазон по индексу alert_id.
+    """
+
+    def __init__(self, node_id: int = 0):
+        if not 0 <= node_id < 2 ** NODE_BITS:
+            raise ValueError(f"node_id должен быть в диапазоне 0..{2 ** NODE_BITS - 1}")
+        self.node_id = node_id
+        self._last_ms = 0
+        self._counter = 0
+
+    def new_id(self) -> str:
+        """Следующий идентификатор"""
+        now = int(time.time() * 1000)
+        if now > self._last_ms:
+            self._last_ms = now
+            # Случайное начало счетчика с запасом на инкременты внутри миллисекунды
+            self._counter = random.getrandbits(COUNTER_BITS - 1)
+        else:
+            # Та же миллисекунда или часы ушли назад - продолжаем счетчик
+            self._counter += 1
+            if self._counter >= 2 ** COUNTER_BITS:
+                self._last_ms += 1
+                self._counter = 0
+
+        value = (self._last_ms << (NODE_BITS + COUNTER_BITS)) | (self.node_id << COUNTER_BITS) | self._counter
+        return _encode(value, ID_LENGTH)
+
+def id_range(start, end: Optional[object] = None) -> Tuple[str, str]:
+    """Границы alert_id для интервала [start, end) (datetime или unix timestamp)"""
+    end_ms = _to_ms(end) if end is not None else 2 ** TIMESTAMP_BITS - 1
+    shift = NODE_BITS + COUNTER_BITS
+    return _encode(_to_ms(start) << shift, ID_LENGTH), _encode(end_ms << shift, ID_LENGTH)
+
+def id_timestamp(alert_id: str) -> Optional[float]:
+    """Время создания из идентификатора (None для идентификаторов старого формата)"""
+    if len(alert_id) != ID_LENGTH or any(char not in DECODING for char in alert_id[:10]):
+        return None
+    value = 0
+    for char in alert_id[:10]:
+        value = value * 32 + DECODING[char]
+    return value / 1000
@@ -0,0 +1,217 @@
+"""
+Гистограммы времени ответа модулей для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import struct
+import time
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+SUB_BUCKET_BITS = 4  # 16 корзин на каждую степень двойки (погрешность ~6%)
+SUB_BUCKETS = 1 << SUB_BUCKET_BITS
+MAX_VALUE = (1 << 32) - 1  # микросекунды (~71 минута)
+
+_HEADER = struct.Struct('<BII')  # версия, число корзин, максимум (мкс)
+_BUCKET = struct.Struct('<HI')  # индекс корзины, количество
+_VERSION = 1
+
+def bucket_index(value: int) -> int:
+    """Индекс лог-линейной корзины для значения в микросекундах"""
+    if value < SUB_BUCKETS:
+        return value
+    shift = value.bit_length() - SUB_BUCKET_BITS - 1
+    return (shift + 1) * SUB_BUCKETS + (value >> shift) - SUB_BUCKETS
+
+def bucket_upper_bound(index: int) -> int:
+    """Наибольшее значение, попадающее в корзину"""
+    if index < SUB_BUCKETS:
+        return index
+    shift = index // SUB_BUCKETS - 1
+    mantissa = index % SUB_BUCKETS + SUB_BUCKETS
+    return ((mantissa + 1) << shift) - 1
+
+class LatencyHistogram:
+    """Гистограмма с фиксированными лог-линейными корзинами (в духе HDR Histogram).
+
+    Хранятся только непустые корзины, поэтому минута с парой проверок
+    занимает несколько десятков байт. Перцентили возвращаются как верхняя
+    граница корзины, но не больше реального максимума.
+    """
+
+    __slots__ = ('counts', 'total', 'max_value')
+
+    def __init__(self):
+        self.counts: Dict[int, int] = {}
+        self.total = 0
+        self.max_value = 0
+
+    def record(self, seconds: float, count: int = 1):
+        """Учет времени ответа (в секундах)"""
+        value = min(max(int(seconds * 1_000_000), 0), MAX_VALUE)
+        index = bucket_index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.total += count
+        if value > self.max_value:
+            self.max_value = value
+
+    def merge(self, other: "LatencyHistogram"):
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.total += other.total
+        self.max_value = max(self.max_value, other.max_value)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """Перцентиль в миллисекундах (None - нет данных)"""
+        if not self.total:
+            return None
+        rank = max(int(self.total * percent / 100 + 0.999999), 1)
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper_bound(index), self.max_value) / 1000
+        return self.max_value / 1000
+
+    def to_bytes(self) -> bytes:
+        """Упаковка в blob: заголовок и пары (корзина, количество)"""
+        parts = [_HEADER.pack(_VERSION, len(self.counts), self.max_value)]
+        parts.extend(_BUCKET.pack(index, count) for index, count in sorted(self.counts.items()))
+        return b''.join(parts)
+
+    @classmethod
+    def from_bytes(cls, blob: bytes) -> "LatencyHistogram":
+        histogram = cls()
+        version, size, histogram.max_value = _HEADER.unpack_from(blob)
+        if version != _VERSION:
+            raise ValueError(f"Неизвестная версия гистограммы: {version}")
+        for index, count in _BUCKET.iter_unpack(blob[_HEADER.size:_HEADER.size + size * _BUCKET.size]):
+            histogram.counts[index] = count
+            histogram.total += count
+        return histogram
+
+    @classmethod
+    def merged(cls, histograms: Iterable["LatencyHistogram"]) -> "LatencyHistogram":
+        result = cls()
+        for histogram in histograms:
+            result.merge(histogram)
+        return result
+
+class LatencyTracker:
+    """Поминутные гистограммы времени ответа по модулям.
+
+    В памяти держатся последние ``memory_minutes`` минут; измененные минуты
+    периодически сохраняются в таблицу module_latency упакованными blob.
+    """
+
+    PERCENTILES = (50, 95, 99)
+
+    def __init__(self, memory_minutes: int = 24 * 60):
+        self.memory_minutes = memory_minutes
+        self.buckets: Dict[str, Dict[int, LatencyHistogram]] = {}
+        self._dirty: Set[Tuple[str, int]] = set()
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def _minute(now: Optional[float] = None) -> int:
+        return int((now if now is not None else time.time()) // 60)
+
+    def record(self, module: str, seconds: float, now: Optional[float] = None):
+        """Учет времени ответа модуля"""
+        minute = self._minute(now)
+        module_buckets = self.buckets.setdefault(module, {})
+        histogram = module_buckets.get(minute)
+        if histogram is None:
+            histogram = module_buckets[minute] = LatencyHistogram()
+            self._evict(module, minute)
+        histogram.record(seconds)
+        self._dirty.add((module, minute))
+
+    def _evict(self, module: str, minute: int):
+        """Удаление сохраненных минут, вышедших за окно памяти"""
+        oldest = minute - self.memory_minutes
+        module_buckets = self.buckets[module]
+        for expired in [m for m in module_buckets if m <= oldest and (module, m) not in self._dirty]:
+            del module_buckets[expired]
+
+    def histogram(self, module: str, minutes: int = 60,
+                  now: Optional[float] = None) -> LatencyHistogram:
+        """Сводная гистограмма модуля за последние minutes минут"""
+        since = self._minute(now) - minutes + 1
+        module_buckets = self.buckets.get(module, {})
+        return LatencyHistogram.merged(h for m, h in module_buckets.items() if m >= since)
+
+    def summary(self, module: str, minutes: int = 60,
+                now: Optional[float] = None) -> Dict[str, Any]:
+        """Перцентили (мс) и число проверок за окно"""
+        histogram = self.histogram(module, minutes, now)
+        result: Dict[str, Any] = {f'p{p}': histogram.percentile(p) for p in self.PERCENTILES}
+        result['max'] = histogram.max_value / 1000 if histogram.total else None
+        result['count'] = histogram.total
+        return result
+
+    def modules(self) -> List[str]:
+        return sorted(self.buckets)
+
+    async def load(self, database_manager):
+        """Загрузка гистограмм за окно памяти из module_latency"""
+        since = self._minute() - self.memory_minutes + 1
+        loaded = 0
+        for row in await database_manager.get_latency_histograms(since):
+            try:
+                histogram = LatencyHistogram.from_bytes(row['histogram'])
+            except (ValueError, struct.error) as e:
+                logger.warning(f"⚠️ Пропущена поврежденная гистограмма {row['module']}: {e}")
+                continue
+            self.buckets.setdefault(row['module'], {})[row['minute']] = histogram
+            loaded += 1
+        if loaded:
+            logger.info(f"⏱️ Гистограммы времени ответа загружены: {loaded}")
+
+    async def flush(self, database_manager):
+        """Сохранение измененных минут"""
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [
+            (module, minute, self.buckets[module][minute].to_bytes())
+            for module, minute in sorted(dirty)
+            if minute in self.buckets.get(module, {})
+        ]
+        try:
+            await database_manager.save_latency_histograms(rows)
+        except Exception:
+            self._dirty |= dirty
+            raise
+
+    async def start(self, database_manager, interval: float = 60):
+        """Загрузка гистограмм и запуск периодического сохранения"""
+        if self._task is not None:
+            return
+        await self.load(database_manager)
+        self._task = asyncio.create_task(self._run(database_manager, interval))
+
+    async def stop(self, database_manager):
+        """Остановка с сохранением несохраненных минут"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        try:
+            await self.flush(database_manager)
+        except Exception as e:
+            logger.error(f"❌ Ошибка сохранения гистограмм времени ответа: {e}")
+
+    async def _run(self, database_manager, interval: float):
+        """Периодическое сохранение гистограмм"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.flush(database_manager)
+            except Exception as e:
+                logger.error(f"❌ Ошибка сохранения гистограмм времени ответа: {e}")
@@ -0,0 +1,100 @@
+"""
+Обновление уже отправленных сообщений алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Callable, Dict, Optional
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class MessageEditor:
+    """Правка сообщений открытого инцидента вместо отправки новых.
+
+    Запоминает сообщения, в которых алерт доставлен подписчикам, и по запросу
+    ``request`` передает в ``submit_edit`` новый текст для каждого из них. Правки
+    одного алерта объединяются: не чаще одной за ``interval`` секунд, текст
+    формируется в момент отправки по последнему запросу.
+    """
+
+    def __init__(self, submit_edit: Callable[[str, str, int, str], None],
+                 interval: float = 10, max_alerts: int = 10000):
+        self.submit_edit = submit_edit
+        self.interval = interval
+        self.max_alerts = max(max_alerts, 1)
+
+        self.messages: "OrderedDict[str, Dict[str, int]]" = OrderedDict()  # alert_id -> чат -> сообщение
+        self._renders: Dict[str, Callable[[], str]] = {}
+        self._last_edit: Dict[str, float] = {}
+        self._timers: Dict[str, asyncio.TimerHandle] = {}
+        self.stats = {'requested': 0, 'edits': 0, 'coalesced': 0}
+
+    def remember(self, alert_id: str, chat_id: str, message_id: int):
+        """Сообщение, в котором алерт доставлен в чат"""
+        self.messages.setdefault(alert_id, {})[str(chat_id)] = message_id
+        self.messages.move_to_end(alert_id)
+        while len(self.messages) > self.max_alerts:
+            evicted, _ = self.messages.popitem(last=False)
+            self._drop(evicted)
+
+    def has_messages(self, alert_id: str) -> bool:
+        return bool(self.messages.get(alert_id))
+
+    def forget(self, alert_id: str, chat_id: Optional[str] = None):
+        """Сообщение больше нельзя править (удалено, бот исключен из чата)"""
+        chats = self.messages.get(alert_id)
+        if chats is None:
+            return
+        if chat_id is not None:
+            chats.pop(str(chat_id), None)
+        if chat_id is None or not chats:
+            self.messages.pop(alert_id, None)
+            self._drop(alert_id)
+
+    def request(self, alert_id: str, render: Callable[[], str], delay: Optional[float] = None):
+        """Запрос правки; ``render`` вызывается один раз при отправке"""
+        self.stats['requested'] += 1
+        self._renders[alert_id] = render
+        if alert_id in self._timers:
+            self.stats['coalesced'] += 1
+            return
+
+        if delay is None:
+            delay = self._last_edit.get(alert_id, float('-inf')) + self.interval - time.monotonic()
+        if delay <= 0:
+            self._flush(alert_id)
+        else:
+            self._timers[alert_id] = asyncio.get_running_loop().call_later(delay, self._flush, alert_id)
+
+    def flush_all(self):
+        """Немедленная отправка всех отложенных правок"""
+        for alert_id in list(self._timers):
+            self._timers.pop(alert_id).cancel()
+            self._flush(alert_id)
+
+    def _flush(self, alert_id: str):
+        self._timers.pop(alert_id, None)
+        render = self._renders.pop(alert_id, None)
+        chats = self.messages.get(alert_id)
+        if render is None or not chats:
+            return
+
+        try:
+            text = render()
+        except Exception as e:
+            logger.error(f"❌ Ошибка формирования правки алерта {alert_id}: {e}")
+            return
+
+        self._last_edit[alert_id] = time.monotonic()
+        for chat_id, message_id in chats.items():
+            self.submit_edit(alert_id, chat_id, message_id, text)
+            self.stats['edits'] += 1
+
+    def _drop(self, alert_id: str):
+        timer = self._timers.pop(alert_id, None)
+        if timer is not None:
+            timer.cancel()
+        self._renders.pop(alert_id, None)
+        self._last_edit.pop(alert_id, None)
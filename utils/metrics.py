@@ -0,0 +1,141 @@
+"""
+Метрики Prometheus для TeBium Alert Bot
+"""
+
+import functools
+import inspect
+import logging
+import time
+from typing import Optional
+
+from aiohttp import web
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Границы корзин: от миллисекунд (SQLite, прием webhook) до секунд (Telegram)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+WEBHOOK_REQUESTS = Counter(
+    'tebium_webhook_requests_total', 'HTTP-запросы к API бота', ['endpoint', 'status']
+)
+WEBHOOK_LATENCY = Histogram(
+    'tebium_webhook_request_duration_seconds', 'Время обработки HTTP-запроса',
+    ['endpoint'], buckets=LATENCY_BUCKETS
+)
+DB_LATENCY = Histogram(
+    'tebium_db_operation_duration_seconds', 'Время операций DatabaseManager',
+    ['method'], buckets=LATENCY_BUCKETS
+)
+DB_ERRORS = Counter(
+    'tebium_db_operation_errors_total', 'Ошибки операций DatabaseManager', ['method']
+)
+TELEGRAM_SEND_LATENCY = Histogram(
+    'tebium_telegram_send_duration_seconds', 'Время запроса sendMessage к Telegram',
+    buckets=LATENCY_BUCKETS
+)
+TELEGRAM_SEND_ERRORS = Counter(
+    'tebium_telegram_send_errors_total', 'Ошибки отправки в Telegram', ['error']
+)
+ALERTS_ACCEPTED = Counter(
+    'tebium_alerts_accepted_total', 'Алерты, принятые в очередь'
+)
+ALERTS_REJECTED = Counter(
+    'tebium_alerts_rejected_total', 'Отклоненные алерты (rate limit, cooldown и т.д.)', ['reason']
+)
+LANE_WAIT = Histogram(
+    'tebium_lane_wait_seconds', 'Время от приема алерта до выборки из полосы очереди',
+    ['lane'], buckets=LATENCY_BUCKETS + (30, 60, 300)
+)
+
+def instrument_database(database_manager):
+    """Замер времени публичных async-методов DatabaseManager (на уровне экземпляра).
+
+    Вызывается до передачи менеджера другим компонентам, чтобы они получили
+    уже обернутые методы.
+    """
+    for name, method in inspect.getmembers(database_manager, inspect.iscoroutinefunction):
+        if name.startswith('_'):
+            continue
+        setattr(database_manager, name, _timed(name, method))
+    return database_manager
+
+def _timed(name: str, method):
+    histogram = DB_LATENCY.labels(name)
+    errors = DB_ERRORS.labels(name)
+
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        started = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            errors.inc()
+            raise
+        finally:
+            histogram.observe(time.perf_counter() - started)
+
+    return wrapper
+
+class AlertPipelineCollector:
+    """Глубина очередей конвейера, снимаемая в момент запроса /metrics"""
+
+    def __init__(self, alert_manager):
+        self.alert_manager = alert_manager
+
+    def collect(self):
+        manager = self.alert_manager
+        queue = GaugeMetricFamily('tebium_queue_depth', 'Глубина очередей конвейера алертов',
+                                  labels=['queue'])
+        queue.add_metric(['alerts_pending'], manager.alert_queue.pending)
+        queue.add_metric(['alerts_memory'], manager.alert_queue.memory_depth())
+        queue.add_metric(['ingest_buffer'], len(manager._ingest_buffer))
+        queue.add_metric(['deliveries'], manager.delivery.pending())
+        queue.add_metric(['retries'], manager.retry_scheduler.pending())
+        queue.add_metric(['digests'], manager.digests.pending())
+        yield queue
+
+        lanes = GaugeMetricFamily('tebium_lane_depth', 'Необработанные алерты по полосам приоритета',
+                                  labels=['lane'])
+        for lane, depth in manager.alert_queue.lane_pending.items():
+            lanes.add_metric([lane], depth)
+        yield lanes
+
+        health = GaugeMetricFamily('tebium_module_up', 'Модуль online (1) или нет (0)',
+                                   labels=['module', 'state'])
+        for module_name, module_health in manager.health_states.snapshot().items():
+            state = module_health['status']
+            health.add_metric([module_name, state], 1 if state == 'online' else 0)
+        yield health
+
+_pipeline_collector: Optional[AlertPipelineCollector] = None
+
+def register_pipeline_collector(alert_manager):
+    """Регистрация (или замена) коллектора очередей в реестре по умолчанию"""
+    global _pipeline_collector
+    if _pipeline_collector is not None:
+        REGISTRY.unregister(_pipeline_collector)
+    _pipeline_collector = AlertPipelineCollector(alert_manager)
+    REGISTRY.register(_pipeline_collector)
+
+def render_latest():
+    """Тело ответа /metrics и его Content-Type"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+@web.middleware
+async def metrics_middleware(request: web.Request, handler):
+    """Счетчик и время обработки HTTP-запросов по имени маршрута"""
+    endpoint = request.match_info.route.name or 'other'
+    started = time.perf_counter()
+    status = 500
+    try:
+        response = await handler(request)
+        status = response.status
+        return response
+    except web.HTTPException as e:
+        status = e.status
+        raise
+    finally:
+        WEBHOOK_REQUESTS.labels(endpoint, str(status)).inc()
+        WEBHOOK_LATENCY.labels(endpoint).observe(time.perf_counter() - started)
@@ -0,0 +1,194 @@
+"""
+Rate limit и cooldown алертов для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class LimitState:
+    """Состояние ключа (модуль, тип): GCRA и время последнего алерта"""
+
+    __slots__ = ('tat', 'last_alert', 'dirty')
+
+    def __init__(self, tat: float = 0.0, last_alert: Optional[float] = None):
+        self.tat = tat  # Theoretical arrival time (monotonic)
+        self.last_alert = last_alert
+        self.dirty = False
+
+class RateLimiter:
+    """Проверки rate limit (GCRA) и cooldown за O(1) без обращений к БД.
+
+    Лимиты задаются правилами вида ``{"module=X": {"per_hour": 10, "cooldown": 0}}``
+    для ключей ``module=``, ``type=`` и ``priority=``. Приоритет правил:
+    модуль, затем тип, затем приоритет алерта, затем значения по умолчанию.
+    """
+
+    def __init__(self, max_per_hour: int = 100, cooldown: float = 60,
+                 rules: Optional[Dict[str, Dict[str, Any]]] = None,
+                 max_keys: int = 10000):
+        self.default_rule = {'per_hour': max_per_hour, 'cooldown': cooldown}
+        self.rules = rules or {}
+        self.max_keys = max_keys
+
+        self.states: "OrderedDict[Tuple[str, str], LimitState]" = OrderedDict()
+        self._rule_cache: Dict[Tuple[str, str, str], Tuple[float, float, float]] = {}
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {'rate_limited': 0, 'cooldown': 0, 'evicted': 0}
+
+    def set_rule(self, key: str, **limits):
+        """Добавление или изменение правила (например, cooldown из module_settings)"""
+        self.rules.setdefault(key, {}).update(limits)
+        self._rule_cache.clear()
+
+    def _rule(self, module: str, alert_type: str, priority: str) -> Tuple[float, float, float]:
+        """Лимиты для алерта: (интервал GCRA, допуск всплеска, cooldown)"""
+        cache_key = (module, alert_type, priority)
+        rule = self._rule_cache.get(cache_key)
+        if rule is not None:
+            return rule
+
+        merged = dict(self.default_rule)
+        for key in (f"priority={priority}", f"type={alert_type}", f"module={module}"):
+            merged.update(self.rules.get(key, {}))
+
+        per_hour = merged.get('per_hour') or 0
+        interval = 3600 / per_hour if per_hour > 0 else 0.0
+        tolerance = 3600 - interval if per_hour > 0 else 0.0
+        rule = (interval, tolerance, float(merged.get('cooldown') or 0))
+
+        if len(self._rule_cache) > self.max_keys:
+            self._rule_cache.clear()
+        self._rule_cache[cache_key] = rule
+        return rule
+
+    def _state(self, module: str, alert_type: str, create: bool = False) -> Optional[LimitState]:
+        """Состояние ключа с обновлением порядка LRU"""
+        key = (module, alert_type)
+        state = self.states.get(key)
+        if state is not None:
+            self.states.move_to_end(key)
+        elif create:
+            state = self.states[key] = LimitState()
+            while len(self.states) > self.max_keys:
+                self.states.popitem(last=False)
+                self.stats['evicted'] += 1
+        return state
+
+    def is_cooling_down(self, module: str, alert_type: str, priority: str = "info") -> bool:
+        """Алерт того же типа от модуля был недавно"""
+        state = self._state(module, alert_type)
+        if state is None or state.last_alert is None:
+            return False
+
+        cooldown = self._rule(module, alert_type, priority)[2]
+        if time.monotonic() - state.last_alert < cooldown:
+            self.stats['cooldown'] += 1
+            return True
+        return False
+
+    def is_rate_limited(self, module: str, alert_type: str, priority: str = "info") -> bool:
+        """Превышен лимит алертов в час"""
+        interval, tolerance, _ = self._rule(module, alert_type, priority)
+        if not interval:
+            return False
+
+        state = self._state(module, alert_type)
+        if state is None:
+            return False
+
+        if state.tat - time.monotonic() > tolerance:
+            self.stats['rate_limited'] += 1
+            return True
+        return False
+
+    def record(self, module: str, alert_type: str, priority: str = "info"):
+        """Учет принятого алерта"""
+        interval = self._rule(module, alert_type, priority)[0]
+        now = time.monotonic()
+
+        state = self._state(module, alert_type, create=True)
+        state.tat = max(state.tat, now) + interval
+        state.last_alert = now
+        state.dirty = True
+
+    def evict_idle(self, idle_ttl: float = 3600) -> int:
+        """Удаление ключей, неактивных дольше idle_ttl (с начала LRU)"""
+        now = time.monotonic()
+        evicted = 0
+        while self.states:
+            key, state = next(iter(self.states.items()))
+            last = state.last_alert if state.last_alert is not None else 0
+            if now - last < idle_ttl or state.tat > now:
+                break
+            self.states.popitem(last=False)
+            evicted += 1
+
+        self.stats['evicted'] += evicted
+        return evicted
+
+    async def load(self, database_manager):
+        """Загрузка снимка состояния и cooldown модулей из БД"""
+        for module, cooldown in (await database_manager.get_module_cooldowns()).items():
+            self.set_rule(f"module={module}", cooldown=cooldown)
+
+        # Снимок хранится во wall-clock времени, в памяти - monotonic
+        offset = time.monotonic() - time.time()
+        for row in await database_manager.get_rate_limit_state():
+            state = self._state(row['module'], row['alert_type'], create=True)
+            state.tat = row['tat'] + offset
+            state.last_alert = row['last_alert'] + offset if row['last_alert'] else None
+
+        if self.states:
+            logger.info(f"🚦 Восстановлено состояние rate limit: {len(self.states)} ключей")
+
+    async def snapshot(self, database_manager):
+        """Сохранение измененных ключей в БД"""
+        offset = time.time() - time.monotonic()
+        rows = []
+        for (module, alert_type), state in self.states.items():
+            if not state.dirty:
+                continue
+            rows.append((
+                module,
+                alert_type,
+                state.tat + offset,
+                state.last_alert + offset if state.last_alert is not None else None
+            ))
+            state.dirty = False
+
+        if rows:
+            await database_manager.save_rate_limit_state(rows)
+
+    async def start(self, database_manager, interval: float = 30, idle_ttl: float = 3600):
+        """Загрузка состояния и запуск периодического снимка"""
+        if self._task is not None:
+            return
+        await self.load(database_manager)
+        self._task = asyncio.create_task(self._run(database_manager, interval, idle_ttl))
+
+    async def stop(self, database_manager):
+        """Остановка с сохранением финального снимка"""
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.snapshot(database_manager)
+
+    async def _run(self, database_manager, interval: float, idle_ttl: float):
+        """Периодический снимок состояния и очистка неактивных ключей"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.snapshot(database_manager)
+                self.evict_idle(idle_ttl)
+            except Exception as e:
+                logger.error(f"❌ Ошибка снимка rate limit: {e}")
@@ -0,0 +1,100 @@
+"""
+Кэш форматирования алертов для TeBium Alert Bot
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config.alert_templates import AlertTemplates
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class RenderedAlert:
+    """Готовое сообщение алерта: одно на всех получателей"""
+
+    __slots__ = ('text', 'reply_markup')
+
+    def __init__(self, text: str, reply_markup: Optional[Any]):
+        self.text = text
+        self.reply_markup = reply_markup
+
+class AlertRenderer:
+    """Форматирование алерта один раз на (алерт, формат).
+
+    Текст и клавиатура кэшируются по идентификатору алерта, поэтому рассылка
+    подписчикам, повторные отправки и правки сообщения используют одни и те же
+    объекты. Хранится не больше ``cache_size`` последних алертов.
+    """
+
+    def __init__(self, cache_size: int = 1000,
+                 formatter: Callable[[Dict[str, Any]], str] = AlertTemplates.format_alert):
+        self.cache_size = max(cache_size, 1)
+        self.formatters: Dict[str, Callable[[Dict[str, Any]], str]] = {'markdown': formatter}
+
+        self._rendered: "OrderedDict[Tuple[str, str], RenderedAlert]" = OrderedDict()
+        self._keyboards: "OrderedDict[str, Any]" = OrderedDict()
+        self.stats = {'hits': 0, 'misses': 0}
+
+    def render(self, alert_id: str, alert_data: Dict[str, Any], fmt: str = 'markdown') -> RenderedAlert:
+        """Текст и клавиатура алерта (из кэша, если алерт уже форматировался)"""
+        key = (alert_id, fmt)
+        rendered = self._rendered.get(key)
+        if rendered is not None:
+            self.stats['hits'] += 1
+            self._rendered.move_to_end(key)
+            return rendered
+
+        self.stats['misses'] += 1
+        rendered = RenderedAlert(self.formatters[fmt](alert_data), self.keyboard(alert_id))
+        self._rendered[key] = rendered
+        if len(self._rendered) > self.cache_size:
+            self._rendered.popitem(last=False)
+        return rendered
+
+    def keyboard(self, alert_id: str) -> Optional[Any]:
+        """Клавиатура действий с алертом (общая для всех сообщений алерта)"""
+        keyboard = self._keyboards.get(alert_id)
+        if keyboard is not None:
+            self._keyboards.move_to_end(alert_id)
+            return keyboard
+
+        keyboard = self.build_keyboard(alert_id)
+        if keyboard is not None:
+            self._keyboards[alert_id] = keyboard
+            if len(self._keyboards) > self.cache_size:
+                self._keyboards.popitem(last=False)
+        return keyboard
+
+    @staticmethod
+    def build_keyboard(alert_id: str) -> Optional[Any]:
+        """Создание клавиатуры для алерта"""
+        try:
+            from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton
+
+            return InlineKeyboardMarkup(inline_keyboard=[
+                [
+                    InlineKeyboardButton(
+                        text="✅ Подтвердить",
+                        callback_data=f"confirm_{alert_id}"
+                    ),
+                    InlineKeyboardButton(
+                        text="⏰ Отложить",
+                        callback_data=f"delay_{alert_id}"
+                    )
+                ],
+                [
+                    InlineKeyboardButton(
+                        text="📊 Детали",
+                        callback_data=f"details_{alert_id}"
+                    ),
+                    InlineKeyboardButton(
+                        text="🔕 Отключить",
+                        callback_data=f"mute_{alert_id}"
+                    )
+                ]
+            ])
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка создания клавиатуры: {e}")
+            return None
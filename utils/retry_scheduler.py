@@ -0,0 +1,199 @@
+"""
+Планировщик повторных отправок для TeBium Alert Bot
+"""
+
+import asyncio
+import heapq
+import logging
+import random
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from aiogram.exceptions import (
+    TelegramBadRequest,
+    TelegramForbiddenError,
+    TelegramNotFound,
+    TelegramRetryAfter,
+    TelegramUnauthorizedError,
+)
+
+from .delivery import Delivery
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+# Ошибки, при которых повтор бессмысленен (бот заблокирован, чат не найден и т.п.)
+PERMANENT_ERRORS = (
+    TelegramForbiddenError,
+    TelegramBadRequest,
+    TelegramNotFound,
+    TelegramUnauthorizedError,
+)
+
+class RetryScheduler:
+    """Повторные отправки с учетом RetryAfter, экспоненциальной задержкой и dead letters"""
+
+    def __init__(self, database_manager, resubmit: Callable[[Delivery], Any],
+                 max_retries: int = 3, base_delay: float = 5, max_delay: float = 300,
+                 pause_chat: Optional[Callable[[str, float], Any]] = None):
+        self.db = database_manager
+        self.resubmit = resubmit
+        self.pause_chat = pause_chat
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+        # Куча (время отправки по wall-clock, id записи) и данные записей
+        self._heap: List[Tuple[float, int]] = []
+        self._retries: Dict[int, Dict[str, Any]] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+        self.stats = {
+            'scheduled': 0,
+            'retried': 0,
+            'succeeded': 0,
+            'dead_letters': 0,
+            'flood_waits': 0
+        }
+
+    async def start(self):
+        """Загрузка сохраненных повторов и запуск планировщика"""
+        if self._task is not None:
+            return
+
+        for row in await self.db.get_pending_retries():
+            self._push(row)
+
+        if self._retries:
+            logger.info(f"🔁 Восстановлено повторных отправок: {len(self._retries)}")
+
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Остановка планировщика (повторы остаются в БД)"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+
+    def pending(self) -> int:
+        """Количество запланированных повторов"""
+        return len(self._retries)
+
+    async def handle_success(self, delivery: Delivery):
+        """Удаление записи о повторе после успешной отправки"""
+        retry_id = delivery.payload.get('retry_id')
+        if retry_id is None:
+            return
+        self.stats['succeeded'] += 1
+        await self.db.delete_delivery_retry(retry_id)
+
+    async def handle_failure(self, delivery: Delivery, error: Exception):
+        """Решение о повторе или переносе в dead letters"""
+        attempts = delivery.payload.get('attempts', 0) + 1
+        retry_id = delivery.payload.get('retry_id')
+        error_text = f"{type(error).__name__}: {error}"
+
+        if isinstance(error, TelegramRetryAfter):
+            # Flood-wait: ждем ровно столько, сколько просит Telegram, попытку не засчитываем
+            self.stats['flood_waits'] += 1
+            attempts -= 1
+            delay = error.retry_after + random.uniform(0, 1)
+            if self.pause_chat:
+                self.pause_chat(delivery.chat_id, delay)
+            logger.warning(f"⏳ Flood-wait для чата {delivery.chat_id}: {error.retry_after}с")
+
+        elif isinstance(error, PERMANENT_ERRORS) or attempts > self.max_retries:
+            self.stats['dead_letters'] += 1
+            await self.db.save_dead_letter(
+                delivery.alert_id, delivery.chat_id, delivery.text,
+                attempts, error_text, retry_id
+            )
+            if retry_id is not None:
+                self._retries.pop(retry_id, None)
+            logger.error(
+                f"☠️ Алерт {delivery.alert_id} для чата {delivery.chat_id} "
+                f"перенесен в dead letters после {attempts} попыток"
+            )
+            return
+
+        else:
+            delay = self._backoff(attempts)
+
+        next_attempt_at = time.time() + delay
+
+        if retry_id is None:
+            retry_id = await self.db.save_delivery_retry(
+                delivery.alert_id, delivery.chat_id, delivery.text,
+                attempts, next_attempt_at, error_text
+            )
+        else:
+            await self.db.update_delivery_retry(retry_id, attempts, next_attempt_at, error_text)
+
+        self._push({
+            'id': retry_id,
+            'alert_id': delivery.alert_id,
+            'chat_id': delivery.chat_id,
+            'text': delivery.text,
+            'attempts': attempts,
+            'next_attempt_at': next_attempt_at
+        })
+        self.stats['scheduled'] += 1
+        logger.info(
+            f"🔁 Повтор отправки {delivery.alert_id} в чат {delivery.chat_id} "
+            f"через {delay:.1f}с (попытка {attempts}/{self.max_retries})"
+        )
+
+    def _backoff(self, attempts: int) -> float:
+        """Экспоненциальная задержка с jitter"""
+        delay = min(self.max_delay, self.base_delay * 2 ** (attempts - 1))
+        return random.uniform(delay / 2, delay)
+
+    def _push(self, row: Dict[str, Any]):
+        """Добавление повтора в кучу"""
+        self._retries[row['id']] = row
+        heapq.heappush(self._heap, (row['next_attempt_at'], row['id']))
+        self._wakeup.set()
+
+    async def _run(self):
+        """Цикл: спим до ближайшего повтора, без активного ожидания"""
+        while True:
+            try:
+                self._wakeup.clear()
+
+                timeout = None
+                while self._heap:
+                    due, retry_id = self._heap[0]
+                    row = self._retries.get(retry_id)
+                    if row is None or row['next_attempt_at'] != due:
+                        # Устаревшая запись в куче
+                        heapq.heappop(self._heap)
+                        continue
+
+                    timeout = due - time.time()
+                    if timeout > 0:
+                        break
+
+                    heapq.heappop(self._heap)
+                    del self._retries[retry_id]
+                    self.stats['retried'] += 1
+                    self.resubmit(Delivery(
+                        row['alert_id'], row['chat_id'], row['text'],
+                        payload={'retry_id': retry_id, 'attempts': row['attempts']}
+                    ))
+                    timeout = None
+
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                except asyncio.TimeoutError:
+                    pass
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка планировщика повторов: {e}")
+                await asyncio.sleep(1)
@@ -0,0 +1,120 @@
+"""
+Индекс маршрутизации подписок для TeBium Alert Bot
+"""
+
+import logging
+from typing import Dict, FrozenSet, Iterable, List, Optional, Set, Tuple
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class SubscriptionIndex:
+    """Ответ на вопрос «кто получает алерт» по ключу (модуль, тип, приоритет).
+
+    Для каждого измерения хранится обратный индекс значение -> подписки и
+    множество подписок без фильтра (wildcard). Результаты пересечения
+    кэшируются по ключу, поэтому повторные запросы выполняются за O(1).
+    Подписка может собирать часть приоритетов в дайджест: маршрут хранит для
+    каждого чата период дайджеста (0 - отправка сразу).
+    """
+
+    DIMENSIONS = ('module', 'type', 'priority')
+
+    def __init__(self, max_cached_keys: int = 10000):
+        self.max_cached_keys = max_cached_keys
+        self.chat_ids: Dict[int, str] = {}
+        self.digest_policies: Dict[int, Tuple[FrozenSet[str], int]] = {}
+        self._by_value: Dict[str, Dict[str, Set[int]]] = {}
+        self._wildcard: Dict[str, Set[int]] = {}
+        self._routes: Dict[Tuple[str, str, str], Tuple[Tuple[str, int], ...]] = {}
+        self.is_loaded = False
+        self.clear()
+
+    def clear(self):
+        """Очистка индекса"""
+        self.chat_ids = {}
+        self.digest_policies = {}
+        self._by_value = {dimension: {} for dimension in self.DIMENSIONS}
+        self._wildcard = {dimension: set() for dimension in self.DIMENSIONS}
+        self._routes = {}
+
+    def build(self, subscriptions: Iterable[Dict]):
+        """Построение индекса из подписок вида
+        ``{'id', 'chat_id', 'modules', 'types', 'priorities'}`` (пустой фильтр - все значения)"""
+        self.clear()
+        for subscription in subscriptions:
+            self.add(
+                subscription['id'],
+                subscription['chat_id'],
+                modules=subscription.get('modules'),
+                types=subscription.get('types'),
+                priorities=subscription.get('priorities'),
+                digest_priorities=subscription.get('digest_priorities'),
+                digest_interval=subscription.get('digest_interval', 0)
+            )
+        self.is_loaded = True
+        logger.info(f"🗂️ Индекс подписок построен: {len(self.chat_ids)} подписок")
+
+    def add(self, subscription_id: int, chat_id: str, modules: Optional[Iterable[str]] = None,
+            types: Optional[Iterable[str]] = None, priorities: Optional[Iterable[str]] = None,
+            digest_priorities: Optional[Iterable[str]] = None, digest_interval: int = 0):
+        """Добавление подписки в индекс"""
+        self.chat_ids[subscription_id] = str(chat_id)
+        if digest_priorities and digest_interval > 0:
+            self.digest_policies[subscription_id] = (frozenset(digest_priorities), digest_interval)
+        for dimension, values in zip(self.DIMENSIONS, (modules, types, priorities)):
+            values = set(values or ())
+            if not values:
+                self._wildcard[dimension].add(subscription_id)
+                continue
+            index = self._by_value[dimension]
+            for value in values:
+                index.setdefault(value, set()).add(subscription_id)
+        self._routes = {}
+
+    def invalidate(self):
+        """Сброс индекса после изменения подписок"""
+        self.clear()
+        self.is_loaded = False
+
+    def _match(self, dimension: str, value: Optional[str]) -> Set[int]:
+        """Подписки, подходящие по одному измерению"""
+        wildcard = self._wildcard[dimension]
+        if value is None:
+            # Измерение не задано - подходят все подписки
+            return set(self.chat_ids)
+        return wildcard | self._by_value[dimension].get(value, set())
+
+    def lookup(self, module: Optional[str] = None, alert_type: Optional[str] = None,
+               priority: Optional[str] = None) -> List[str]:
+        """Чаты, которые должны получить алерт"""
+        return [chat_id for chat_id, _ in self.lookup_routes(module, alert_type, priority)]
+
+    def lookup_routes(self, module: Optional[str] = None, alert_type: Optional[str] = None,
+                      priority: Optional[str] = None) -> List[Tuple[str, int]]:
+        """Чаты для алерта с периодом дайджеста в минутах (0 - отправка сразу)"""
+        key = (module, alert_type, priority)
+        route = self._routes.get(key)
+        if route is not None:
+            return list(route)
+
+        matched = self._match('module', module)
+        if matched:
+            matched &= self._match('type', alert_type)
+        if matched:
+            matched &= self._match('priority', priority)
+
+        # Один чат может иметь несколько подходящих подписок: отправка сразу
+        # важнее дайджеста, из нескольких дайджестов выбирается более частый
+        intervals: Dict[str, int] = {}
+        for subscription_id in sorted(matched):
+            chat_id = self.chat_ids[subscription_id]
+            policy = self.digest_policies.get(subscription_id)
+            interval = policy[1] if policy and priority in policy[0] else 0
+            current = intervals.get(chat_id)
+            intervals[chat_id] = interval if current is None else min(current, interval)
+        route = tuple(intervals.items())
+
+        if len(self._routes) >= self.max_cached_keys:
+            self._routes = {}
+        self._routes[key] = route
+        return list(route)
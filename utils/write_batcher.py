@@ -0,0 +1,199 @@
+"""
+Групповая запись (group commit) для TeBium Alert Bot
+"""
+
+import asyncio
+import logging
+from typing import Any, List, Optional, Sequence, Tuple
+
+logger = logging.getLogger('TeBiumAlertBot')
+
+class WriteBatcher:
+    """Накопление операций записи и выполнение их одной транзакцией"""
+
+    def __init__(self, pool, flush_interval: float = 0.02, max_batch_size: int = 200):
+        self.pool = pool
+        self.flush_interval = flush_interval
+        self.max_batch_size = max(max_batch_size, 1)
+
+        self._pending: List[Tuple[str, Sequence[Any], asyncio.Future, bool]] = []
+        self._has_items = asyncio.Event()
+        self._batch_full = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+        self._stopping = False
+
+        self.stats = {
+            'batches': 0,
+            'operations': 0,
+            'failed_operations': 0,
+            'max_batch': 0
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done() and not self._stopping
+
+    async def start(self):
+        """Запуск фоновой задачи записи"""
+        if self.is_running:
+            return
+        self._stopping = False
+        self._task = asyncio.create_task(self._run())
+        logger.info(
+            f"📦 Групповая запись запущена: {self.flush_interval * 1000:.0f}мс / "
+            f"{self.max_batch_size} операций"
+        )
+
+    def submit(self, sql: str, params: Sequence[Any] = (), many: bool = False) -> asyncio.Future:
+        """Постановка операции в очередь; future завершается после COMMIT"""
+        future = asyncio.get_running_loop().create_future()
+
+        if not self.is_running:
+            # Батчер не запущен (или уже остановлен) - пишем напрямую
+            asyncio.ensure_future(self._execute_now(sql, params, future, many))
+            return future
+
+        self._pending.append((sql, params, future, many))
+        self._has_items.set()
+        if len(self._pending) >= self.max_batch_size:
+            self._batch_full.set()
+
+        return future
+
+    async def execute(self, sql: str, params: Sequence[Any] = ()) -> Any:
+        """Постановка операции в очередь с ожиданием фиксации"""
+        return await self.submit(sql, params)
+
+    async def execute_many(self, sql: str, seq_of_params: Sequence[Sequence[Any]]) -> Any:
+        """executemany одной операцией в пачке: все строки фиксируются вместе"""
+        return await self.submit(sql, list(seq_of_params), many=True)
+
+    def execute_later(self, sql: str, params: Sequence[Any] = ()):
+        """Отложенная запись без ожидания (ошибки только логируются)"""
+        self.submit(sql, params).add_done_callback(self._log_failure)
+
+    async def flush(self):
+        """Немедленная запись всех накопленных операций"""
+        while self._pending:
+            await self._flush_batch()
+
+    async def stop(self):
+        """Остановка с записью всех накопленных операций"""
+        if self._task is not None:
+            # Будим цикл, чтобы он дописал очередь и завершился
+            self._stopping = True
+            self._has_items.set()
+            self._batch_full.set()
+            try:
+                await self._task
+            except Exception as e:
+                logger.error(f"❌ Ошибка остановки групповой записи: {e}")
+            self._task = None
+
+        await self.flush()
+        logger.info("📦 Групповая запись остановлена")
+
+    async def _run(self):
+        """Основной цикл: запись каждые N мс или при наборе M операций"""
+        while True:
+            try:
+                await self._has_items.wait()
+
+                if self._stopping and not self._pending:
+                    return
+
+                if len(self._pending) < self.max_batch_size and not self._stopping:
+                    try:
+                        await asyncio.wait_for(self._batch_full.wait(), self.flush_interval)
+                    except asyncio.TimeoutError:
+                        pass
+
+                await self._flush_batch()
+
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"❌ Ошибка групповой записи: {e}")
+                await asyncio.sleep(self.flush_interval)
+
+    async def _flush_batch(self):
+        """Запись одной пачки операций в одной транзакции"""
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+
+        if not self._pending and not self._stopping:
+            self._has_items.clear()
+        if len(self._pending) < self.max_batch_size and not self._stopping:
+            self._batch_full.clear()
+
+        if not batch:
+            return
+
+        results = []
+        try:
+            async with self.pool.writer() as db:
+                await db.execute("BEGIN")
+                for sql, params, _, many in batch:
+                    # Савепоинт изолирует ошибочную операцию от остальных в пачке
+                    await db.execute("SAVEPOINT batch_item")
+                    try:
+                        if many:
+                            cursor = await db.executemany(sql, params)
+                            results.append(cursor.rowcount)
+                        else:
+                            cursor = await db.execute(sql, params)
+                            results.append(cursor.lastrowid)
+                        await db.execute("RELEASE batch_item")
+                    except Exception as e:
+                        await db.execute("ROLLBACK TO batch_item")
+                        await db.execute("RELEASE batch_item")
+                        results.append(e)
+                await db.commit()
+
+        except Exception as e:
+            logger.error(f"❌ Ошибка фиксации пачки из {len(batch)} операций: {e}")
+            for _, _, future, _ in batch:
+                if not future.done():
+                    future.set_exception(e)
+            self.stats['failed_operations'] += len(batch)
+            return
+
+        for (_, _, future, _), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                self.stats['failed_operations'] += 1
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        self.stats['batches'] += 1
+        self.stats['operations'] += len(batch)
+        self.stats['max_batch'] = max(self.stats['max_batch'], len(batch))
+
+    async def _execute_now(self, sql: str, params: Sequence[Any], future: asyncio.Future,
+                           many: bool = False):
+        """Запись одной операции без группировки"""
+        try:
+            async with self.pool.writer() as db:
+                if many:
+                    cursor = await db.executemany(sql, params)
+                    result = cursor.rowcount
+                else:
+                    cursor = await db.execute(sql, params)
+                    result = cursor.lastrowid
+                await db.commit()
+            if not future.done():
+                future.set_result(result)
+        except Exception as e:
+            if not future.done():
+                future.set_exception(e)
+
+    @staticmethod
+    def _log_failure(future: asyncio.Future):
+        """Логирование ошибки отложенной записи"""
+        if future.cancelled():
+            return
+        error = future.exception()
+        if error is not None:
+            logger.error(f"❌ Ошибка отложенной записи: {error}")